@@ -490,6 +490,12 @@ if len(iterative_analysis) == 0 and len(iterative_subproblem_analysis) == 0:
     raise ValueError('No data found to analyze.')
 print(f'Analyzed {len(iterative_analysis)} master entries, {len(iterative_subproblem_analysis)} subproblem entries.')
 
+# Riepilogo dei sottoproblemi non risolti perché identici ad altri già risolti
+cache_hit_rows = [row for row in iterative_subproblem_analysis if 'cache_hit' in row and row['cache_hit']]
+if len(cache_hit_rows) > 0:
+    cache_saved_time = sum(row['cache_saved_time'] for row in cache_hit_rows)
+    print(f'Reused {len(cache_hit_rows)} subproblem results, saving {round(cache_saved_time, 4)}s of solving time.')
+
 # Assegna None per ogni chiave mancante in qualche riga
 key_names = set(key for row in iterative_analysis for key in row.keys())
 for row in iterative_analysis:
@@ -1,16 +1,33 @@
 import pyomo.environ as pyo
 
 
-def get_core_hash(core) -> str:
-    '''Funzione che ritorna un identificativo del core per un primo confronto di
-    disuguaglianza più efficiente.'''
+def get_core_store() -> dict:
+    '''Funzione che ritorna l'archivio vuoto dei core di tutte le iterazioni.
+    Ogni coppia (paziente, servizio) incontrata riceve un bit, in modo che le
+    componenti di un core siano rappresentate da un intero canonico che
+    indicizza direttamente la lista dei giorni in cui il core è valido.'''
 
-    component_number = len(core['components'])
-    patient_number = len(set(c['patient'] for c in core['components']))
-    day_number = len(core['days'])
-    first_day = 'x' if len(core['days']) == 0 else str(core['days'][0])
+    return {
+        'component_bits': {},
+        'days_by_components': {}
+    }
 
-    return f'{component_number}cmp_{patient_number}pat_{day_number}day_{first_day}'
+
+def get_core_bitset(core_store: dict, core) -> int:
+    '''Funzione che ritorna l'intero le cui cifre binarie a uno sono quelle
+    delle componenti del core, assegnando un nuovo bit alle coppie (paziente,
+    servizio) mai incontrate.'''
+
+    component_bits = core_store['component_bits']
+    core_bitset = 0
+
+    for core_component in core['components']:
+        component = (core_component['patient'], core_component['service'])
+        if component not in component_bits:
+            component_bits[component] = len(component_bits)
+        core_bitset |= 1 << component_bits[component]
+
+    return core_bitset
 
 
 def compute_generalist_cores(all_subproblem_results):
@@ -89,6 +106,52 @@ def compute_basic_cores(all_subproblem_results):
     return cores
 
 
+def find_component_root(parents: dict, node):
+    '''Funzione che ritorna il rappresentante dell'insieme di 'node' nella
+    struttura union-find, comprimendo il cammino percorso.'''
+
+    while parents[node] != node:
+        parents[node] = parents[parents[node]]
+        node = parents[node]
+
+    return node
+
+
+def compute_day_connected_components(day_results):
+    '''Funzione che calcola le componenti connesse del grafo bipartito di un
+    giorno, in cui a destra vi sono i pazienti e a sinistra le unità di cura ed
+    ogni richiesta schedulata corrisponde ad un arco (paziente, unità di cura
+    del servizio). Ritorna la coppia (struttura union-find, richieste
+    schedulate di ogni rappresentante).'''
+
+    parents = {}
+
+    for scheduled_service in day_results['scheduled']:
+
+        patient_node = ('patient', scheduled_service['patient'])
+        care_unit_node = ('care_unit', scheduled_service['care_unit'])
+
+        if patient_node not in parents:
+            parents[patient_node] = patient_node
+        if care_unit_node not in parents:
+            parents[care_unit_node] = care_unit_node
+
+        patient_root = find_component_root(parents, patient_node)
+        care_unit_root = find_component_root(parents, care_unit_node)
+        if patient_root != care_unit_root:
+            parents[care_unit_root] = patient_root
+
+    # Ogni arco appartiene alla componente del proprio paziente
+    components_by_root = {}
+    for scheduled_service in day_results['scheduled']:
+        root = find_component_root(parents, ('patient', scheduled_service['patient']))
+        if root not in components_by_root:
+            components_by_root[root] = set()
+        components_by_root[root].add((scheduled_service['patient'], scheduled_service['service']))
+
+    return parents, components_by_root
+
+
 def compute_reduced_cores(all_subproblem_results, master_instance):
     '''Questa funzione calcola la lista dei core generati a partire da ciascuna
     singola richiesta non schedulata. Ciascun core ridotto conterrà una singola
@@ -105,6 +168,13 @@ def compute_reduced_cores(all_subproblem_results, master_instance):
         if len(day_results['rejected']) == 0:
             continue
 
+        # Il processo di aggiunta delle componenti è analogo alla visita di un
+        # grafo bipartito in cui a destra vi sono i pazienti e a sinistra le
+        # unità di cura. Le componenti connesse del grafo delle richieste
+        # schedulate sono le stesse per ogni richiesta non schedulata, quindi
+        # vengono calcolate una sola volta per giorno.
+        parents, components_by_root = compute_day_connected_components(day_results)
+
         # Generazione di un core per ogni singola richiesta non schedulata.
         for rejected_request in day_results['rejected']:
 
@@ -113,158 +183,61 @@ def compute_reduced_cores(all_subproblem_results, master_instance):
             rejected_service = master_instance['services'][rejected_service_name]
             rejected_care_unit_name = rejected_service['care_unit']
 
-            # Componenti del nuovo core (lista di coppie paziente, servizio).
-            core_components = [{
-                'patient': rejected_patient_name,
-                'service': rejected_service_name
-            }]
-
-            # Il processo di aggiunta delle componenti è analogo alla visita di
-            # un grafo bipartito in cui a destra vi sono i pazienti e a sinistra
-            # le unità di cura. Ogni richiesta schedulata corrisponde ad un arco
-            # (paziente, unità di cura del servizio). Si aggiunge l'arco
-            # relativo alla singola richiesta non schedulata e si calcola la
-            # componente connessa, aggiungendo alle componenti del core ogni
-            # arco attraversato.
-
-            # Insiemi utilizzati nella visita del grafo. Il punto di partenza è
-            # quello con il singolo paziente ed unità di cura della richiesta
-            # non schedulata.
-            care_units_to_do = set([rejected_care_unit_name])
-            patients_to_do = set([rejected_patient_name])
-            care_units_done = set()
-            patients_done = set()
-
-            while len(care_units_to_do) > 0 or len(patients_to_do) > 0:
-
-                # Aggiungi tutti i pazienti di una unità di cura toccata.
-                while len(care_units_to_do) > 0:
-
-                    current_care_unit = care_units_to_do.pop()
-
-                    for scheduled_service in day_results['scheduled']:
-
-                        patient_name = scheduled_service['patient']
-                        service_name = scheduled_service['service']
-
-                        if scheduled_service['care_unit'] == current_care_unit:
-                            
-                            core_components.append({
-                                'patient': patient_name,
-                                'service': service_name
-                            })
-
-                            # Se il paziente è nuovo, aggiungilo a quelli da visitare
-                            if patient_name not in patients_done:
-                                patients_to_do.add(patient_name)
-
-                    # Questa unità di cura non verrà più visitata
-                    care_units_done.add(current_care_unit)
-
-                # Aggiungi tutte le unità di cura toccate da qualche paziente.
-                while len(patients_to_do) > 0:
-
-                    current_patient = patients_to_do.pop()
-
-                    for scheduled_service in day_results['scheduled']:
-
-                        patient_name = scheduled_service['patient']
-                        service_name = scheduled_service['service']
-                        care_unit_name = scheduled_service['care_unit']
-
-                        if patient_name == current_patient:
-
-                            core_components.append({
-                                'patient': patient_name,
-                                'service': service_name
-                                })
-                            
-                            # Se è una nuova unità di cura aggiungila a quelle da visitare
-                            if care_unit_name not in care_units_done:
-                                care_units_to_do.add(care_unit_name)
-
-                    # Questo paziente non verrà più visitato
-                    patients_done.add(current_patient)
-
-            # Al termine della visita vengono rimossi eventuali duplicati dalle
-            # componenti appena calcolate. Questa fase non è strettamente
-            # necessaria se la visita è corretta, ma si possono catturare
-            # eventuali bug del codice.
-            unique_core_components = []
-            for core_component in core_components:
-                is_new_component = True
-                for unique_core_component in unique_core_components:
-                    if (unique_core_component['patient'] == core_component['patient'] and
-                        unique_core_component['service'] == core_component['service']):
-                        is_new_component = False
-                        break
-                if is_new_component:
-                    unique_core_components.append(core_component)
-            core_components = unique_core_components
+            # L'arco della richiesta non schedulata unisce la componente del
+            # suo paziente a quella della sua unità di cura.
+            core_components = set([(rejected_patient_name, rejected_service_name)])
+            for node in [('patient', rejected_patient_name), ('care_unit', rejected_care_unit_name)]:
+                if node in parents:
+                    core_components.update(components_by_root[find_component_root(parents, node)])
 
             # Si aggiunge il core così calcolato, valido nel giorno corrente.
             cores.append({
-                'components': sorted(core_components, key=lambda c: (c['patient'], c['service'])),
+                'components': [{
+                    'patient': patient_name,
+                    'service': service_name
+                } for patient_name, service_name in sorted(core_components)],
                 'days': [day_name]
             })
 
     return cores
 
 
-def aggregate_and_remove_duplicate_cores(new_cores, prev_cores):
+def aggregate_and_remove_duplicate_cores(new_cores, core_store: dict):
     '''Questa funzione si occupa della rimozione dalla lista dei nuovi core
     generati da una iterazione quando questi hanno le medesime componenti di un
     qualche core delle iterazioni passate. Se un nuovo core trova una di queste
     corrispondenze, gli eventuali nuovi giorni in cui è valido vengono aggiunti
     a quelli del core già valido. La funzione ritorna una coppia con (1) la
-    lista dei nuovi core senza duplicati e (2) la lista dei core complessivi.'''
+    lista dei nuovi core senza duplicati e (2) l'archivio dei core complessivi
+    (vedi 'get_core_store').'''
 
-    # Ogni core presente in 'new_cores' ma non in 'prev_cores' sarà aggiunto in questa lista.
-    # Per essere considerati uguali i core devono possedere le stesse esatte componenti ground.
+    # Ogni core presente in 'new_cores' ma non nell'archivio sarà aggiunto in questa lista.
+    # Per essere considerati uguali i core devono possedere le stesse esatte componenti ground,
+    # cioè lo stesso intero nell'archivio.
     unique_new_cores = []
 
+    days_by_components = core_store['days_by_components']
+
     for new_core in new_cores:
         
-        prev_found_core = None
-        for prev_core in prev_cores:
+        core_bitset = get_core_bitset(core_store, new_core)
 
-            # Check di ottimizzazione (se i core hanno un diverso numero di componenti saranno sicuramente diversi).
-            if len(new_core['components']) != len(prev_core['components']):
-                continue
-            
-            are_components_exactly_the_same = True
-            for new_core_component in new_core['components']:
-                
-                is_component_present_in_prev = False
-                for prev_core_component in prev_core['components']:
-                    if (new_core_component['patient'] == prev_core_component['patient'] and
-                        new_core_component['service'] == prev_core_component['service']):
-                        is_component_present_in_prev = True
-                        break
-                
-                if not is_component_present_in_prev:
-                    are_components_exactly_the_same = False
-                    break
-            
-            # Se si trova un core con le stesse esatte componenti (a meno di un diverso ordine),
-            # questo viene salvato e la ricerca termina.
-            if are_components_exactly_the_same:
-                prev_found_core = prev_core
-                break
-
-        # Se la ricerca non ha trovato nessun core con uguali componenti, il core viene aggiunto alla lista dei nuovi.
-        # Viene aggiornata anche la lista complessiva dei core validi.
-        if prev_found_core is None:
+        # Se la ricerca non trova nessun core con uguali componenti, il core viene aggiunto alla lista dei nuovi.
+        # L'archivio condivide la lista dei giorni del core, così che eventuali duplicati successivi
+        # nella stessa iterazione estendano anche il core già restituito.
+        if core_bitset not in days_by_components:
             unique_new_cores.append(new_core)
-            prev_cores.append(new_core)
+            days_by_components[core_bitset] = new_core['days']
             continue
 
+        prev_core_days = days_by_components[core_bitset]
+
         # Se il core è già presente bisogna aggiungere (solo) gli eventuali nuovi giorni in cui è valido.
         days_not_in_prev_core = []
         for day_name in new_core['days']:
-            if day_name not in prev_found_core['days']:
+            if day_name not in prev_core_days:
                 days_not_in_prev_core.append(day_name)
-        prev_found_core['days'].extend(days_not_in_prev_core)
+        prev_core_days.extend(days_not_in_prev_core)
         
         # Se il nuovo core non è valido in nessun nuovo giorno, non è necessario
         # aggiungerlo alla lista dei nuovi core in quanto non aggiunge
@@ -277,7 +250,7 @@ def aggregate_and_remove_duplicate_cores(new_cores, prev_cores):
         new_core['days'] = days_not_in_prev_core
         unique_new_cores.append(new_core)
 
-    return unique_new_cores, prev_cores
+    return unique_new_cores, core_store
 
 
 def add_cores_constraint_class_to_master_model(master_model):
@@ -286,6 +259,31 @@ def add_cores_constraint_class_to_master_model(master_model):
     master_model.cores = pyo.ConstraintList()
 
 
+def add_core_constraint_to_master_model(master_model, core_components, day_name):
+    '''Funzione che inserisce nel modello il vincolo del core nel giorno
+    specificato e lo ritorna. Se il giorno non contiene tutte le richieste
+    delle componenti il vincolo non viene creato e si ritorna None.'''
+
+    core_size = len(core_components)
+    expression = 0
+
+    # Se nel giorno corrente non esiste effettivamente l'elenco di richieste
+    # specificate dalle componenti del core il vincolo non viene creato.
+    # Questo controllo è ridondante ma può essere utile per catturare
+    # eventuali bug del codice.
+    for core_component in core_components:
+
+        patient_name = core_component['patient']
+        service_name = core_component['service']
+        
+        if (patient_name, service_name, int(day_name)) not in master_model.do_index:
+            return None
+
+        expression += master_model.do[patient_name, service_name, int(day_name)]
+
+    return master_model.cores.add(expr=(expression <= core_size - 1))
+
+
 def add_cores_constraints_to_master_model(master_model, cores):
     '''Per ogni core nella lista fornita viene creato ed insterito nel modello
     un nuovo vincolo che vieta la comparsa delle sue componenti nei giorni
@@ -304,26 +302,14 @@ def add_cores_constraints_to_master_model(master_model, cores):
             continue
 
         for day_name in core['days']:
+            add_core_constraint_to_master_model(master_model, core['components'], day_name)
 
-            core_size = len(core['components'])
-            expression = 0
-
-            # Variabile che specifica se nel giorno corrente esiste
-            # effettivamente l'elenco di richieste specificate dalla componenti
-            # del core. Questo controllo è ridondante ma può essere utile per
-            # catturare eventiali bug del codice.
-            is_core_valid = True
-
-            for core_component in core['components']:
-
-                patient_name = core_component['patient']
-                service_name = core_component['service']
-                
-                if (patient_name, service_name, int(day_name)) not in master_model.do_index:
-                    is_core_valid = False
-                    break
 
-                expression += master_model.do[patient_name, service_name, int(day_name)]
+def get_cores_constraints_info(master_model) -> dict:
+    '''Funzione che ritorna il numero di vincoli dei core attivi nel modello
+    del master e quello dei vincoli creati in tutte le iterazioni.'''
 
-            if is_core_valid:
-                master_model.cores.add(expr=(expression <= core_size - 1))
\ No newline at end of file
+    return {
+        'active_core_cuts': sum(1 for constraint in master_model.cores.values() if constraint.active),
+        'total_core_cuts': len(master_model.cores)
+    }
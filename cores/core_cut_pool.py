@@ -0,0 +1,133 @@
+import pyomo.environ as pyo
+
+from cores.compute_cores import get_core_bitset, add_core_constraint_to_master_model
+
+
+def get_core_cut_pool() -> dict:
+    '''Funzione che ritorna il pool vuoto dei vincoli dei core inseriti nel
+    master. Per ogni giorno viene tenuta la lista dei tagli ancora utili, sia
+    attivi che disattivati per invecchiamento; i tagli dominati vengono invece
+    disattivati e tolti definitivamente dal pool.'''
+
+    return {
+        'cuts_by_day': {}
+    }
+
+
+def add_cores_constraints_to_cut_pool(master_model, core_cut_pool: dict, core_store: dict, cores) -> dict:
+    '''Funzione analoga a 'add_cores_constraints_to_master_model' che tiene
+    conto dei tagli già presenti nello stesso giorno. Se le componenti di un
+    core contengono quelle di un taglio del pool il nuovo vincolo è ridondante
+    e non viene creato, mentre i tagli del pool che contengono strettamente le
+    componenti del nuovo core vengono disattivati e rimossi. Ritorna il numero
+    di tagli aggiunti, scartati, rimossi e rimasti nel pool.'''
+
+    cuts_info = {
+        'added_core_cuts': 0,
+        'skipped_dominated_core_cuts': 0,
+        'removed_dominated_core_cuts': 0
+    }
+
+    for core in cores:
+
+        # Se il core per qualche motivo non ha componenti si passa oltre.
+        if len(core['components']) == 0:
+            continue
+
+        core_bitset = get_core_bitset(core_store, core)
+
+        for day_name in core['days']:
+
+            day_index = int(day_name)
+            if day_index not in core_cut_pool['cuts_by_day']:
+                core_cut_pool['cuts_by_day'][day_index] = []
+            day_cuts = core_cut_pool['cuts_by_day'][day_index]
+
+            # Un taglio con un sottoinsieme delle componenti implica già il
+            # vincolo del nuovo core
+            if any(cut['bitset'] & ~core_bitset == 0 for cut in day_cuts):
+                cuts_info['skipped_dominated_core_cuts'] += 1
+                continue
+
+            constraint = add_core_constraint_to_master_model(master_model, core['components'], day_name)
+            if constraint is None:
+                continue
+
+            # I tagli che contengono tutte le componenti del nuovo core sono
+            # implicati dal nuovo vincolo
+            remaining_day_cuts = []
+            for cut in day_cuts:
+                if core_bitset & ~cut['bitset'] == 0:
+                    cut['constraint'].deactivate()
+                    cuts_info['removed_dominated_core_cuts'] += 1
+                else:
+                    remaining_day_cuts.append(cut)
+
+            remaining_day_cuts.append({
+                'bitset': core_bitset,
+                'variables': [master_model.do[core_component['patient'], core_component['service'], day_index] for core_component in core['components']],
+                'constraint': constraint,
+                'slack_iterations': 0
+            })
+            core_cut_pool['cuts_by_day'][day_index] = remaining_day_cuts
+
+            cuts_info['added_core_cuts'] += 1
+
+    cuts_info['pooled_core_cuts'] = sum(len(day_cuts) for day_cuts in core_cut_pool['cuts_by_day'].values())
+
+    return cuts_info
+
+
+def get_core_cut_value(cut) -> int:
+    '''Funzione che ritorna il numero di componenti del taglio schedulate
+    nella soluzione corrente del master.'''
+
+    return sum(1 for variable in cut['variables'] if pyo.value(variable) > 0.5)
+
+
+def reactivate_violated_core_cuts(core_cut_pool: dict) -> int:
+    '''Funzione che riattiva i tagli disattivati per invecchiamento che sono
+    violati dalla soluzione corrente del master, cioè in cui tutte le
+    componenti sono schedulate. Ritorna il numero di tagli riattivati.'''
+
+    reactivated_cut_number = 0
+
+    for day_cuts in core_cut_pool['cuts_by_day'].values():
+        for cut in day_cuts:
+
+            if cut['constraint'].active:
+                continue
+
+            if get_core_cut_value(cut) == len(cut['variables']):
+                cut['constraint'].activate()
+                cut['slack_iterations'] = 0
+                reactivated_cut_number += 1
+
+    return reactivated_cut_number
+
+
+def age_core_cuts(core_cut_pool: dict, max_slack_iterations: int) -> int:
+    '''Funzione che conta per ogni taglio attivo il numero di iterazioni
+    consecutive in cui non è stringente nella soluzione del master (almeno due
+    componenti non schedulate). I tagli che raggiungono 'max_slack_iterations'
+    vengono disattivati ma restano nel pool, così da poter essere riattivati se
+    tornano ad essere violati. Ritorna il numero di tagli disattivati.'''
+
+    aged_cut_number = 0
+
+    for day_cuts in core_cut_pool['cuts_by_day'].values():
+        for cut in day_cuts:
+
+            if not cut['constraint'].active:
+                continue
+
+            if get_core_cut_value(cut) < len(cut['variables']) - 1:
+                cut['slack_iterations'] += 1
+            else:
+                cut['slack_iterations'] = 0
+
+            if cut['slack_iterations'] >= max_slack_iterations:
+                cut['constraint'].deactivate()
+                aged_cut_number += 1
+
+    return aged_cut_number
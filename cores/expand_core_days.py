@@ -1,174 +1,210 @@
-def custom_count(value, maxs):
-    '''Passing a list of integers, this function returns the next value in the
-    counting sequence, treating each element as a digit. The maxs list give the
-    maximum value (exclusive) for each digit, after that there is a remainder.'''
-    index = 0
-    while index < len(value):
-        value[index] += 1
-        if value[index] < maxs[index]:
-            return value
-        value[index] = 0
-        index += 1
-    return None
-
-
-def is_contained(small_day, big_day):
-    '''Function that search a match between two set of [start-duration] intervals.
-    Each one of the first group must be contained in one of the second group without
-    intersecting eachother. Some optimization are implemented in order to give
-    a better performance when is not necessary to solve the full problem.'''
+def get_day_signature(day):
+    '''Function that returns the sorted tuple of (start, duration) of the
+    operators of a day, which identifies the day for containment purposes.'''
+    return tuple(sorted((operator['start'], operator['duration']) for operator in day.values()))
+
+
+def get_interval_blocks(small_intervals):
+    '''Function that splits the (start, end) intervals, sorted by start, into
+    maximal blocks of chained overlaps. When a block begins every interval of
+    the previous blocks is already over, so the blocks can be assigned
+    independently.'''
+    blocks = []
+    block_end = None
+    for start, end in small_intervals:
+        if block_end is None or start >= block_end:
+            blocks.append([])
+            block_end = end
+        blocks[-1].append((start, end))
+        block_end = max(block_end, end)
+    return blocks
+
+
+def can_assign_block(block, index, state, failed_states):
+    '''Function that searches an assignment of the block intervals from
+    'index' onwards. The state is the sorted tuple of (start, end, busy_until)
+    of the big intervals, where busy_until is the end of the last interval
+    assigned to it (the current start if it is already free):
+    intervals are processed by start time, so nothing else matters for the
+    rest of the block. Big intervals with the same triple are interchangeable
+    and are tried only once; states known to fail are memoized.'''
+
+    if index == len(block):
+        return True
+
+    start, end = block[index]
+
+    # normalize the state: a big interval whose last interval ends before the
+    # current start is free, no matter when it ended
+    state = tuple(sorted((big_start, big_end, max(busy_until, start)) for big_start, big_end, busy_until in state))
+    if (index, state) in failed_states:
+        return False
+
+    tried_triples = set()
+
+    # try the tightest big intervals first, leaving the wider ones free
+    for position in sorted(range(len(state)), key=lambda p: state[p][1] - state[p][0]):
+        big_start, big_end, busy_until = state[position]
+
+        if busy_until > start or big_start > start or big_end < end:
+            continue
+        if state[position] in tried_triples:
+            continue
+        tried_triples.add(state[position])
+
+        next_state = state[:position] + ((big_start, big_end, end),) + state[position + 1:]
+        if can_assign_block(block, index + 1, next_state, failed_states):
+            return True
+
+    failed_states.add((index, state))
+    return False
+
+
+def is_signature_contained(small_signature, big_signature, containment_memo=None):
+    '''Function that search a match between two set of (start, duration) intervals,
+    given as day signatures. Each one of the first group must be contained in one
+    of the second group without intersecting eachother. The small intervals are
+    split into independent blocks of chained overlaps and each block is assigned
+    with an exact search over the states of the big intervals, memoizing the
+    failing ones. The search is exponential only in the number of big intervals
+    that can host overlapping small ones, which is tiny in practice. Results are
+    memoized by the two signatures in 'containment_memo', if given.'''
 
     # trivial cases
-    if len(small_day) == 0:
+    if len(small_signature) == 0:
         return True
-    if len(big_day) == 0:
+    if len(big_signature) == 0:
         return False
-    
+
+    if containment_memo is not None and (small_signature, big_signature) in containment_memo:
+        return containment_memo[small_signature, big_signature]
+
     # check if the operators are the same; useful if the schedule is periodic
-    if len(small_day) == len(big_day):
-        are_days_equal = True
-        for operator, other_operator in zip(small_day.values(), big_day.values()):
-            if operator['start'] != other_operator['start'] or operator['duration'] != other_operator['duration']:
-                are_days_equal = False
-                break
-        if are_days_equal:
-            return True
+    if small_signature == big_signature:
+        result = True
 
-    # dictionary that contain all the possible choices for the match
-    possible_choices = dict()
-
-    for small_operator_name, small_operator in small_day.items():
-        possible_choices[small_operator_name] = list()
-        for big_operator_name, big_operator in big_day.items():
-
-            # add to the domain all big_operators that can contain the small one
-            if small_operator['start'] >= big_operator['start'] and small_operator['start'] + small_operator['duration'] <= big_operator['start'] + big_operator['duration']:
-                possible_choices[small_operator_name].append(big_operator_name)
-        
-        # if a domain is empty, no match is possible
-        if len(possible_choices[small_operator_name]) == 0:
-            return False
-        
-    # list of all the small_operator that intersect
-    incompatibility = list()
-
-    for small_operator_name, small_operator in small_day.items():
-        for other_small_operator_name, other_small_operator in small_day.items():
-
-            # no self checks
-            if other_small_operator_name == small_operator_name:
-                continue
-
-            # add the couple if the two operator intersect
-            if small_operator['start'] <= other_small_operator['start'] and small_operator['start'] + small_operator['duration'] > other_small_operator['start']:
-                incompatibility.append((small_operator_name, other_small_operator_name))
-
-    # if there are no conflicts, every match is a good one
-    if len(incompatibility) == 0:
-        return True
-    
-    # if a small operator have no conflicts it can be omitted, as every of its choiches is valid
-    for small_operator_name in small_day.keys():
-        is_present = False
-        for couple in incompatibility:
-            if small_operator_name == couple[0] or small_operator_name == couple[1]:
-                is_present = True
-                break
-        if not is_present:
-            del possible_choices[small_operator_name]
-    
-    names = list()
-    value = list()
-    maxs = list()
-    for small_operator_name, domain in possible_choices.items():
-        names.append(small_operator_name)
-        value.append(0)
-        maxs.append(len(domain))
-    
-    # enumerate all the assignable choices
-    while value is not None:
-
-        # test for overlaps in small operators that have chosen the same big operator
-        is_valid_assignment = True
-        for index in range(len(value) - 1):
-            name = names[index]
-
-            for other_index in range(index + 1, len(value)):
-                other_name = names[other_index]
-
-                if possible_choices[name][value[index]] == possible_choices[other_name][value[other_index]]:
-                    if (name, other_name) in incompatibility or (other_name, name) in incompatibility:
-                        is_valid_assignment = False
-                        break
-                if not is_valid_assignment:
+    else:
+        small_intervals = [(start, start + duration) for start, duration in small_signature]
+        big_state = tuple((start, start + duration, start) for start, duration in big_signature)
+
+        # if a small interval is not contained in any big one, no match is possible
+        result = all(any(big_start <= start and end <= big_end for big_start, big_end, _ in big_state) for start, end in small_intervals)
+
+        if result:
+            for block in get_interval_blocks(small_intervals):
+                if not can_assign_block(block, 0, big_state, set()):
+                    result = False
                     break
-        
-        # if no overlaps is found the assignment is valid
-        if is_valid_assignment:
-            return True
 
-        value = custom_count(value, maxs)
+    if containment_memo is not None:
+        containment_memo[small_signature, big_signature] = result
 
-    return False
+    return result
 
 
-def compute_expanded_days(instance):
+def is_contained(small_day, big_day, containment_memo=None):
+    '''Function that checks if the operators of the first day can be matched to
+    the operators of the second one, see 'is_signature_contained'.'''
+    return is_signature_contained(get_day_signature(small_day), get_day_signature(big_day), containment_memo)
 
-    # compute the total operator duration, grouped by day and care unit
-    total_duration = {}
-    for day_name, day in instance['days'].items():
-        total_duration[day_name] = {}
-        for care_unit_name, care_unit in day.items():
-            total_duration[day_name][care_unit_name] = sum([operator['duration'] for operator in care_unit.values()])
+
+def compute_expanded_days(instance):
+    '''Function that computes, for each care unit, the partial order of the days
+    by operator containment. Days with the same operators (same signature) are
+    grouped and containment is only checked between distinct signatures, in
+    increasing order of total duration so that transitivity can be exploited.
+    The returned index has, for each care unit, the signature of every day
+    ('day_signatures') and, for each signature, the sorted list of days whose
+    operators are contained in it, its own days included ('contained_days').'''
 
     # get all care unit names only once
     care_unit_names = set()
     for day in instance['days'].values():
         care_unit_names.update(day.keys())
 
-    subsumptions = {}
+    # results of the containment checks, shared by care units with the same
+    # operators
+    containment_memo = {}
+
+    expanded_days = {
+        'day_signatures': {},
+        'contained_days': {}
+    }
 
     # compute subsumptions for each separate care unit
-    for care_unit_name in care_unit_names:
-        subsumptions[care_unit_name] = {}
+    for care_unit_name in sorted(care_unit_names):
 
+        # group days by signature; a day without the care unit has no operators
+        signature_days = {}
         for day_name, day in instance['days'].items():
+            signature = get_day_signature(day[care_unit_name] if care_unit_name in day else {})
+            if signature not in signature_days:
+                signature_days[signature] = []
+            signature_days[signature].append(day_name)
 
-            # all days that can be contained in the current one
-            smaller_days = set()
+        # signatures sorted by total duration: a signature can only be
+        # contained in signatures that come later or with the same duration
+        signatures = sorted(signature_days.keys(), key=lambda signature: (sum(duration for _, duration in signature), signature))
+        total_durations = [sum(duration for _, duration in signature) for signature in signatures]
 
-            for other_day_name, other_day in instance['days'].items():
+        # indices of the signatures contained in each signature (itself included)
+        smaller_signatures = []
 
-                # no reflexive checks (they are implicitly defined)
-                if other_day_name == day_name:
-                    continue
-                # impossible match if total duration is smaller
-                if total_duration[day_name][care_unit_name] < total_duration[other_day_name][care_unit_name]:
+        for index, signature in enumerate(signatures):
+
+            contained_signatures = {index}
+
+            # candidates are visited from the biggest, so that the ones
+            # already known by transitivity are skipped
+            for other_index in range(len(signatures) - 1, -1, -1):
+
+                if other_index in contained_signatures:
                     continue
-                # jump to next day if current one is already known to be smaller
-                if other_day_name in smaller_days:
+                # impossible match if total duration is bigger
+                if total_durations[other_index] > total_durations[index]:
                     continue
 
-                # add subsumption if other_day is contained in day
-                if is_contained(other_day[care_unit_name], day[care_unit_name]):
-                    smaller_days.add(other_day_name)
+                if is_signature_contained(signatures[other_index], signature, containment_memo):
+                    contained_signatures.add(other_index)
+
+                    # transitivity check for already processed signatures
+                    if other_index < index:
+                        contained_signatures.update(smaller_signatures[other_index])
 
-                    # transitivity check for already processed days
-                    if other_day_name in subsumptions[care_unit_name]:
-                        smaller_days.update(subsumptions[care_unit_name][other_day_name])
-            
-            if day_name in smaller_days:
-                smaller_days.remove(day_name)
-                
-            # do not add empty lists in the output
-            if len(smaller_days) > 0:
-                subsumptions[care_unit_name][day_name] = sorted(smaller_days, key=lambda v: int(v))
-            
+            smaller_signatures.append(contained_signatures)
 
-    return subsumptions
+        expanded_days['day_signatures'][care_unit_name] = {}
+        expanded_days['contained_days'][care_unit_name] = []
+        for index, signature in enumerate(signatures):
+            for day_name in signature_days[signature]:
+                expanded_days['day_signatures'][care_unit_name][day_name] = index
+            contained_days = [day_name for other_index in smaller_signatures[index] for day_name in signature_days[signatures[other_index]]]
+            expanded_days['contained_days'][care_unit_name].append(sorted(contained_days, key=lambda v: int(v)))
 
+    return expanded_days
 
-def expand_core_days(master_instance, cores, subsumptions):
+
+def get_subsumed_days(expanded_days, day_name, care_unit_names):
+    '''Function that returns the set of days, different from the given one,
+    whose operators are contained in the ones of the given day for every
+    care unit in the list.'''
+
+    subsumed_day_names = None
+    for care_unit_name in care_unit_names:
+        signature_index = expanded_days['day_signatures'][care_unit_name][day_name]
+        contained_days = expanded_days['contained_days'][care_unit_name][signature_index]
+        if subsumed_day_names is None:
+            subsumed_day_names = set(contained_days)
+        else:
+            subsumed_day_names.intersection_update(contained_days)
+        if len(subsumed_day_names) <= 1:
+            break
+
+    subsumed_day_names.discard(day_name)
+    return subsumed_day_names
+
+
+def expand_core_days(master_instance, cores, expanded_days):
 
     for core in cores:
 
@@ -182,12 +218,7 @@ def expand_core_days(master_instance, cores, subsumptions):
 
         day_name = core['days'][0]
 
-        first_care_unit_affected = care_unit_affected.pop()
-        subsumed_day_names = set(subsumptions[first_care_unit_affected][day_name])
-        for care_unit_name in care_unit_affected:
-            subsumed_day_names.intersection_update(subsumptions[care_unit_name][day_name])
-            if len(subsumed_day_names) == 0:
-                break
+        subsumed_day_names = get_subsumed_days(expanded_days, day_name, care_unit_affected)
 
         if len(subsumed_day_names) == 0:
             continue
@@ -196,32 +227,25 @@ def expand_core_days(master_instance, cores, subsumptions):
         core['days'] = sorted(set(core['days']))
 
 
-def remove_core_days_without_exact_requests(cores, max_possible_master_requests):
+def remove_core_days_without_exact_requests(cores, request_availability):
+    '''Function that keeps, for each core, only the days in which every
+    component can be requested by the master, using the days of each
+    (patient, service) pair in 'request_availability'. Cores without valid
+    days are removed.'''
     
     valid_cores = []
     for core in cores:
     
-        valid_days = []
-        for day_name in core['days']:
-    
-            is_core_valid_on_this_day = True
-            for core_component in core['components']:
-    
-                is_request_present = False
-                for request in max_possible_master_requests[day_name]:
-                    if request['patient'] == core_component['patient'] and request['service'] == core_component['service']:
-                        is_request_present = True
-                        break
-    
-                if not is_request_present:
-                    is_core_valid_on_this_day = False
-                    break
+        valid_day_names = set(core['days'])
+        for core_component in core['components']:
+            valid_day_names.intersection_update(request_availability['days_by_request'].get((core_component['patient'], core_component['service']), ()))
+            if len(valid_day_names) == 0:
+                break
     
-            if is_core_valid_on_this_day:
-                valid_days.append(day_name)
+        valid_days = [day_name for day_name in core['days'] if day_name in valid_day_names]
     
         if len(valid_days) > 0:
             core['days'] = valid_days
             valid_cores.append(core)
     
-    return valid_cores
\ No newline at end of file
+    return valid_cores
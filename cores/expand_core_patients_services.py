@@ -1,7 +1,18 @@
 import subprocess
+from collections import deque
 from pathlib import Path
 
 
+# Programma ASP per il calcolo dei matching, indipendente dalla cartella di
+# lavoro corrente.
+ASP_PROGRAM_FILE_PATH = Path(__file__).resolve().parent.joinpath('match.lp')
+
+# Codici di uscita di clingo quando la risoluzione termina: soddisfacibile
+# (ricerca interrotta dal limite di soluzioni), non soddisfacibile e
+# soddisfacibile con ricerca esaurita.
+CLINGO_SUCCESS_RETURN_CODES = [10, 20, 30]
+
+
 def get_max_possible_master_requests(master_instance):
     '''Funzione che calcola tutte le richieste che potrebbero essere effettuate
     in ogni giorno. La funzione ritorna un dict[day, list[patient, service]].'''
@@ -25,6 +36,30 @@ def get_max_possible_master_requests(master_instance):
     return max_requests
 
 
+def get_master_request_availability(max_possible_master_requests):
+    '''Funzione che indicizza le richieste possibili di ogni giorno calcolate
+    da 'get_max_possible_master_requests'. Ritorna un dict con l'insieme delle
+    coppie (paziente, servizio) di ogni giorno ('requests_by_day') e l'insieme
+    dei giorni in cui è possibile ogni coppia ('days_by_request').'''
+
+    request_availability = {
+        'requests_by_day': {},
+        'days_by_request': {}
+    }
+
+    for day_name, requests in max_possible_master_requests.items():
+        day_requests = set()
+        for request in requests:
+            patient_service = (request['patient'], request['service'])
+            day_requests.add(patient_service)
+            if patient_service not in request_availability['days_by_request']:
+                request_availability['days_by_request'][patient_service] = set()
+            request_availability['days_by_request'][patient_service].add(day_name)
+        request_availability['requests_by_day'][day_name] = day_requests
+
+    return request_availability
+
+
 def remove_unfeasible_cores(master_instance, cores):
     '''Funzione che rimuove i core quando le loro componenti risultano
     complessivamente non ammissibili nei suoi giorni. La non ammissibilità è
@@ -92,123 +127,323 @@ def remove_unfeasible_cores(master_instance, cores):
     return feasible_cores
 
 
-def expand_core_patients_services(cores, max_possible_master_requests, master_instance,
-                                  expand_patients: bool, expand_services: bool, max_expansions_per_core: int):
-    '''Funzione che ritorna la lista di core con nomi di pazienti e/o servizi
-    anonimizzati.'''
+def get_core_expansion_arcs(core_components, day_name, max_possible_master_requests, master_instance,
+                            expand_patients: bool, expand_services: bool):
+    '''Funzione che ritorna gli archi del grafo bipartito delle espansioni di
+    un core in un giorno: a sinistra vi sono le componenti del core ed a
+    destra le richieste che il master può effettuare nel giorno. La funzione
+    ritorna una lista di coppie (componente, richieste), una per ogni
+    componente del core nel suo ordine, con le richieste ordinate.'''
 
-    # Path utilizzati per i file di input/output di lavoro.
-    asp_input_file_path = Path('asp_input.lp')
-    asp_program_file_path = Path('cores/match.lp')
-    asp_output_file_path = Path('asp_output.txt')
-
-    # Lista contenente i core con nuovi nomi di pazienti e/o servizi.
-    expanded_cores = []
-
-    for core in cores:
-        for day_name in core['days']:
+    arcs = []
 
-            # Lista con le stringhe corrispondenti ai fatti da utilizzare come
-            # input per il programma ASP che effettua i matching.
-            asp_input = []
+    for core_component in core_components:
 
-            for core_component in core['components']:
+        core_patient_name = core_component['patient']
+        core_service_name = core_component['service']
 
-                core_patient_name = core_component['patient']
-                core_service_name = core_component['service']
-                
-                for request in max_possible_master_requests[day_name]:
-
-                    request_patient_name = request['patient']
-                    request_service_name = request['service']
-
-                    # Per ogni componente del core e per ogni possibile
-                    # richiesta del master, guarda se è una possibile espansione
-                    # valida.
-                    is_valid_expansion = True
-                    if not expand_patients and core_patient_name != request_patient_name:
-                        is_valid_expansion = False
-                    if not expand_services and core_service_name != request_service_name:
-                        is_valid_expansion = False
-                    
-                    # Se si anonimizzano i nomi dei servizi è possibile
-                    # aggiungere solo quelli della stessa unità di cura che
-                    # hanno una durata maggiore o uguale a quella della
-                    # componente del core.
-                    if expand_services:
-                        
-                        core_service = master_instance['services'][core_service_name]
-                        core_care_unit = core_service['care_unit']
-                        core_duration = core_service['duration']
-                        
-                        request_service = master_instance['services'][request_service_name]
-                        request_care_unit = request_service['care_unit']
-                        request_duration = request_service['duration']
-                        
-                        if core_care_unit != request_care_unit or core_duration > request_duration:
-                            is_valid_expansion = False
-
-                    # Se l'anonimizzazione è valida aggiungi un arco al grafo.
-                    if is_valid_expansion:
-                        asp_input.append(f'arc({core_patient_name}, {core_service_name}, {request_patient_name}, {request_service_name}).\n')
-
-            # Scrivi il file di input.
-            with open(asp_input_file_path, 'w') as file:
-                file.writelines(asp_input)
-            
-            # Esegui il programma ASP.
-            with open(asp_output_file_path, 'w') as file:
-                subprocess.run([
-                    'clingo', '-n', str(max_expansions_per_core), '--verbose=0',
-                    asp_input_file_path, asp_program_file_path],
-                    stdout=file)
-            
-            # Leggi l'ouput con i matching.
-            with open(asp_output_file_path, 'r') as file:
-                lines = file.readlines()
+        requests = []
+        
+        for request in max_possible_master_requests[day_name]:
+
+            request_patient_name = request['patient']
+            request_service_name = request['service']
+
+            # Per ogni componente del core e per ogni possibile richiesta del
+            # master, guarda se è una possibile espansione valida.
+            is_valid_expansion = True
+            if not expand_patients and core_patient_name != request_patient_name:
+                is_valid_expansion = False
+            if not expand_services and core_service_name != request_service_name:
+                is_valid_expansion = False
             
-            # Controllo dell'ultima riga dell'output per la non
-            # soddisfacibilità: il core non ha espansioni valide in questo
-            # giorno.
-            if lines[-1] == 'UNSATISFIABLE':
-                continue
-
-            # Decodifica il file di output creando un nuovo core per ogni linea
-            # dell'output (che quindi corrisponde ad una differente soluzione).
-            # Ogni linea dell'output (a parte l'ultima) ha la forma:
-            # take(p,s,p,s) take(p,s,p,s) take(p,s,p,s) take(p,s,p,s)\n
-            for line in lines[:-1]:
-
-                # Lista di 'p,s,p,s) ' e 'p,s,p,s)\n' per l'ultimo fatto.
-                splitted_line = line.split('take(')[1:]
+            # Se si anonimizzano i nomi dei servizi è possibile aggiungere solo
+            # quelli della stessa unità di cura che hanno una durata maggiore o
+            # uguale a quella della componente del core.
+            if expand_services:
+                
+                core_service = master_instance['services'][core_service_name]
+                core_care_unit = core_service['care_unit']
+                core_duration = core_service['duration']
                 
-                expanded_components = []
+                request_service = master_instance['services'][request_service_name]
+                request_care_unit = request_service['care_unit']
+                request_duration = request_service['duration']
+                
+                if core_care_unit != request_care_unit or core_duration > request_duration:
+                    is_valid_expansion = False
+
+            # Se l'anonimizzazione è valida aggiungi un arco al grafo.
+            if is_valid_expansion:
+                requests.append((request_patient_name, request_service_name))
+
+        arcs.append(((core_patient_name, core_service_name), sorted(requests)))
+
+    return arcs
+
+
+def get_clingo_expansions(arcs, max_expansions_per_core: int):
+    '''Funzione che calcola le espansioni di un core con il programma ASP
+    'match.lp', eseguito dal binario esterno 'clingo'. Ritorna la lista delle
+    espansioni, ognuna come lista di coppie (paziente, servizio). Se clingo non
+    può essere avviato, termina con un errore o non produce output viene
+    sollevato un RuntimeError con lo standard error di clingo.'''
+
+    # Una componente senza archi non compare nei fatti del programma ASP, che
+    # troverebbe matching privi di quella componente: il core non ha
+    # espansioni valide in questo giorno.
+    if any(len(requests) == 0 for _, requests in arcs):
+        return []
+
+    # Lista con le stringhe corrispondenti ai fatti da utilizzare come input
+    # per il programma ASP che effettua i matching.
+    asp_input = []
+    for (core_patient_name, core_service_name), requests in arcs:
+        for request_patient_name, request_service_name in requests:
+            asp_input.append(f'arc({core_patient_name}, {core_service_name}, {request_patient_name}, {request_service_name}).\n')
+
+    # Esegui il programma ASP passando i fatti sullo standard input ('-') e
+    # leggendo i matching dallo standard output, senza file di lavoro condivisi
+    # fra esecuzioni diverse.
+    try:
+        asp_process = subprocess.run([
+            'clingo', '-n', str(max_expansions_per_core), '--verbose=0',
+            ASP_PROGRAM_FILE_PATH, '-'],
+            input=''.join(asp_input), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError as error:
+        raise RuntimeError(f'clingo could not be started: {error}') from error
+
+    if asp_process.returncode not in CLINGO_SUCCESS_RETURN_CODES:
+        raise RuntimeError(f'clingo exited with code {asp_process.returncode}: {asp_process.stderr.strip()}')
+
+    lines = asp_process.stdout.splitlines(keepends=True)
+
+    # Anche con un codice di uscita valido l'output deve contenere almeno la
+    # riga finale con l'esito.
+    if len(lines) == 0:
+        raise RuntimeError(f'clingo did not produce any output: {asp_process.stderr.strip()}')
+
+    # Controllo dell'ultima riga dell'output per la non soddisfacibilità: il
+    # core non ha espansioni valide in questo giorno.
+    if lines[-1].strip() == 'UNSATISFIABLE':
+        return []
+
+    expansions = []
+
+    # Decodifica il file di output creando una nuova espansione per ogni linea
+    # dell'output (che quindi corrisponde ad una differente soluzione). Ogni
+    # linea dell'output (a parte l'ultima) ha la forma:
+    # take(p,s,p,s) take(p,s,p,s) take(p,s,p,s) take(p,s,p,s)\n
+    for line in lines[:-1]:
+
+        # Lista di 'p,s,p,s) ' e 'p,s,p,s)\n' per l'ultimo fatto.
+        splitted_line = line.split('take(')[1:]
+        
+        expanded_components = []
+
+        for token in splitted_line:
+
+            # Rimpozione dei caratteri di spaziatura.
+            token = token.removesuffix('\n')
+            token = token.removesuffix(' ')
+            token = token.removesuffix(')')
+
+            # Lista di 4 stringhe [pat1, srv1, pat2, srv2]
+            patient_service_names = token.split(',')
+
+            # La nuova componente riguarda solo i nomi dei vertici di destra
+            # del grafo bipartito.
+            expanded_components.append((patient_service_names[2], patient_service_names[3]))
+
+        expansions.append(expanded_components)
+
+    return expansions
+
+
+def get_maximum_matching_size(adjacency, left_vertices, used_right_vertices) -> int:
+    '''Funzione che calcola con l'algoritmo di Hopcroft-Karp la dimensione
+    del matching massimo fra i vertici di sinistra specificati ed i vertici di
+    destra non ancora utilizzati. 'adjacency' contiene per ogni vertice di
+    sinistra la lista degli indici dei vertici di destra adiacenti.'''
+
+    left_matches = {left_vertex: None for left_vertex in left_vertices}
+    right_matches = {}
+    matching_size = 0
+
+    while True:
+
+        # Visita in ampiezza a partire dai vertici di sinistra liberi per
+        # calcolare i livelli dei cammini aumentanti più corti
+        levels = {}
+        queue = deque()
+        for left_vertex in left_vertices:
+            if left_matches[left_vertex] is None:
+                levels[left_vertex] = 0
+                queue.append(left_vertex)
 
-                for token in splitted_line:
+        is_augmenting_path_found = False
+        while len(queue) > 0:
+            left_vertex = queue.popleft()
+            for right_vertex in adjacency[left_vertex]:
+                if right_vertex in used_right_vertices:
+                    continue
+                matched_left_vertex = right_matches.get(right_vertex)
+                if matched_left_vertex is None:
+                    is_augmenting_path_found = True
+                elif matched_left_vertex not in levels:
+                    levels[matched_left_vertex] = levels[left_vertex] + 1
+                    queue.append(matched_left_vertex)
 
-                    # Rimpozione dei caratteri di spaziatura.
-                    token = token.removesuffix('\n')
-                    token = token.removesuffix(' ')
-                    token = token.removesuffix(')')
+        if not is_augmenting_path_found:
+            return matching_size
 
-                    # Lista di 4 stringhe [pat1, srv1, pat2, srv2]
-                    patient_service_names = token.split(',')
+        # Visita in profondità lungo i livelli per aumentare il matching con
+        # cammini disgiunti
+        for left_vertex in left_vertices:
+            if left_matches[left_vertex] is None and augment_matching(adjacency, left_vertex, levels, left_matches, right_matches, used_right_vertices):
+                matching_size += 1
 
-                    # La nuova componente riguarda solo i nomi dei vertici di
-                    # destra del grafo bipartito.
-                    expanded_components.append({
-                        'patient': patient_service_names[2],
-                        'service': patient_service_names[3]
-                    })
 
-                expanded_cores.append({
-                    'components': expanded_components,
-                    'days': day_name
-                })
-    
-    # Elimina i file di lavoro.
-    asp_input_file_path.unlink()
-    asp_output_file_path.unlink()
+def augment_matching(adjacency, left_vertex, levels, left_matches, right_matches, used_right_vertices) -> bool:
+    '''Funzione che cerca un cammino aumentante a partire dal vertice di
+    sinistra seguendo i livelli calcolati da 'get_maximum_matching_size' e, se
+    lo trova, aggiorna il matching.'''
+
+    for right_vertex in adjacency[left_vertex]:
+        if right_vertex in used_right_vertices:
+            continue
+        matched_left_vertex = right_matches.get(right_vertex)
+        if matched_left_vertex is None or (levels.get(matched_left_vertex) == levels[left_vertex] + 1 and
+                                           augment_matching(adjacency, matched_left_vertex, levels, left_matches, right_matches, used_right_vertices)):
+            left_matches[left_vertex] = right_vertex
+            right_matches[right_vertex] = left_vertex
+            return True
+
+    # Il vertice non porta a cammini aumentanti in questa fase
+    levels[left_vertex] = None
+    return False
+
+
+def enumerate_left_perfect_matchings(adjacency, max_matchings: int):
+    '''Funzione che enumera i matching in cui ogni vertice di sinistra
+    sceglie un vertice di destra distinto, fino a 'max_matchings' (0 per
+    enumerarli tutti). La ricerca assegna i vertici di sinistra in ordine e
+    scarta ogni scelta dopo la quale i vertici rimanenti non possono più essere
+    accoppiati (verifica con Hopcroft-Karp), quindi ogni ramo della ricerca
+    produce almeno un matching. Ritorna la lista dei matching come liste degli
+    indici di destra scelti.'''
+
+    left_number = len(adjacency)
+
+    if left_number == 0:
+        return [[]]
+    if get_maximum_matching_size(adjacency, list(range(left_number)), set()) < left_number:
+        return []
+
+    matchings = []
+    assignment = []
+    used_right_vertices = set()
+
+    # Pila delle scelte ancora da provare per ogni vertice di sinistra a
+    # partire dal primo
+    choices = [iter(adjacency[0])]
+
+    while len(choices) > 0:
+
+        left_vertex = len(choices) - 1
+
+        if len(assignment) > left_vertex:
+            used_right_vertices.remove(assignment.pop())
+
+        right_vertex = next((right_vertex for right_vertex in choices[-1] if right_vertex not in used_right_vertices), None)
+        if right_vertex is None:
+            choices.pop()
+            continue
+
+        assignment.append(right_vertex)
+        used_right_vertices.add(right_vertex)
+
+        remaining_left_vertices = list(range(left_vertex + 1, left_number))
+        if get_maximum_matching_size(adjacency, remaining_left_vertices, used_right_vertices) < len(remaining_left_vertices):
+            continue
+
+        if len(assignment) == left_number:
+            matchings.append(assignment.copy())
+            if max_matchings > 0 and len(matchings) >= max_matchings:
+                break
+            continue
+
+        choices.append(iter(adjacency[left_vertex + 1]))
+
+    return matchings
+
+
+def get_matching_expansions(arcs, max_expansions_per_core: int):
+    '''Funzione che calcola le espansioni di un core enumerando direttamente
+    i matching del grafo bipartito, senza processi esterni. Ritorna la lista
+    delle espansioni, ognuna come lista di coppie (paziente, servizio) nello
+    stesso ordine delle componenti del core.'''
+
+    right_vertices = sorted(set(request for _, requests in arcs for request in requests))
+    right_indices = {request: right_index for right_index, request in enumerate(right_vertices)}
+
+    adjacency = [[right_indices[request] for request in requests] for _, requests in arcs]
+
+    return [[right_vertices[right_index] for right_index in matching] for matching in enumerate_left_perfect_matchings(adjacency, max_expansions_per_core)]
+
+
+def get_core_day_expansions(arcs, max_expansions_per_core: int, core_expansion_engine: str):
+    '''Funzione che calcola le espansioni di un core in un giorno con il
+    motore richiesto. È eseguita dai processi del pool delle espansioni.'''
+
+    if core_expansion_engine == 'clingo':
+        return get_clingo_expansions(arcs, max_expansions_per_core)
+    return get_matching_expansions(arcs, max_expansions_per_core)
+
+
+def expand_core_patients_services(cores, max_possible_master_requests, master_instance,
+                                  expand_patients: bool, expand_services: bool, max_expansions_per_core: int,
+                                  core_expansion_engine: str = 'matching', expansion_executor=None, expansion_workers: int = 1):
+    '''Funzione che ritorna la lista di core con nomi di pazienti e/o servizi
+    anonimizzati. Le espansioni sono i matching del grafo bipartito fra le
+    componenti del core e le richieste possibili nel giorno, calcolati in
+    memoria ('matching') oppure con il programma ASP esterno ('clingo'). Se è
+    fornito un pool di 'expansion_workers' processi le espansioni di ogni
+    coppia (core, giorno) vengono calcolate in parallelo; i risultati sono
+    comunque uniti nell'ordine dei core e dei giorni.'''
+
+    # Grafi da espandere, uno per ogni coppia (core, giorno) nell'ordine dei
+    # core.
+    expansion_days = []
+    expansion_arcs = []
+    for core in cores:
+        for day_name in core['days']:
+            expansion_days.append(day_name)
+            expansion_arcs.append(get_core_expansion_arcs(core['components'], day_name, max_possible_master_requests, master_instance, expand_patients, expand_services))
+
+    job_number = len(expansion_arcs)
+    if expansion_executor is None or job_number <= 1:
+        all_expansions = map(get_core_day_expansions, expansion_arcs, [max_expansions_per_core] * job_number, [core_expansion_engine] * job_number)
+    else:
+        # I grafi sono inviati ai processi a blocchi per limitare il costo di
+        # comunicazione dei grafi più piccoli; 'map' ritorna i risultati
+        # nell'ordine di invio.
+        chunk_size = max(1, job_number // (4 * expansion_workers))
+        all_expansions = expansion_executor.map(get_core_day_expansions, expansion_arcs, [max_expansions_per_core] * job_number, [core_expansion_engine] * job_number, chunksize=chunk_size)
+
+    # Lista contenente i core con nuovi nomi di pazienti e/o servizi.
+    expanded_cores = []
+
+    # Un nuovo core per ogni espansione, valido nel giorno corrispondente
+    for day_name, expansions in zip(expansion_days, all_expansions):
+        for expanded_components in expansions:
+            expanded_cores.append({
+                'components': [{
+                    'patient': patient_name,
+                    'service': service_name
+                } for patient_name, service_name in expanded_components],
+                'days': [day_name]
+            })
 
     # Se si anonimizzano i nomi dei servizi potrebbero essere stati generati
     # nuovi core con durata totale per unità di cura non ammissibile; vengono
@@ -216,4 +451,4 @@ def expand_core_patients_services(cores, max_possible_master_requests, master_in
     if expand_services:
         expanded_cores = remove_unfeasible_cores(master_instance, expanded_cores)
     
-    return expanded_cores
\ No newline at end of file
+    return expanded_cores
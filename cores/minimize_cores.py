@@ -0,0 +1,295 @@
+import copy
+import math
+import tempfile
+import time
+from pathlib import Path
+
+
+def get_core_subproblem_instance(master_instance, day_name, components) -> dict:
+    '''Funzione che ritorna l'istanza del sottoproblema del giorno contenente
+    solamente le richieste fornite (coppie paziente, servizio).'''
+
+    patients = {}
+    for patient_name, service_name in components:
+        if patient_name not in patients:
+            patients[patient_name] = {
+                'priority': master_instance['patients'][patient_name]['priority'],
+                'requests': []
+            }
+        patients[patient_name]['requests'].append(service_name)
+
+    for patient in patients.values():
+        patient['requests'] = sorted(patient['requests'])
+
+    return {
+        'patients': patients,
+        'day': master_instance['days'][day_name],
+        'services': master_instance['services']
+    }
+
+
+def is_trivially_infeasible(master_instance, day_name, components) -> bool:
+    '''Funzione che verifica delle condizioni sufficienti perché le richieste
+    non possano essere schedulate tutte nel giorno: un servizio più lungo del
+    turno di ogni operatore della sua unità di cura, un'unità di cura in cui la
+    somma delle durate supera quella dei turni oppure un paziente le cui
+    richieste non entrano nell'intervallo coperto dai turni delle unità di cura
+    coinvolte.'''
+
+    day = master_instance['days'][day_name]
+
+    care_unit_durations = {}
+    patient_durations = {}
+    patient_care_units = {}
+
+    for patient_name, service_name in components:
+
+        service = master_instance['services'][service_name]
+        care_unit_name = service['care_unit']
+
+        if care_unit_name not in day:
+            return True
+        if all(operator['duration'] < service['duration'] for operator in day[care_unit_name].values()):
+            return True
+
+        care_unit_durations[care_unit_name] = care_unit_durations.get(care_unit_name, 0) + service['duration']
+        patient_durations[patient_name] = patient_durations.get(patient_name, 0) + service['duration']
+        patient_care_units.setdefault(patient_name, set()).add(care_unit_name)
+
+    for care_unit_name, total_duration in care_unit_durations.items():
+        if total_duration > sum(operator['duration'] for operator in day[care_unit_name].values()):
+            return True
+
+    for patient_name, total_duration in patient_durations.items():
+        operators = [operator for care_unit_name in patient_care_units[patient_name] for operator in day[care_unit_name].values()]
+        first_start = min(operator['start'] for operator in operators)
+        last_end = max(operator['start'] + operator['duration'] for operator in operators)
+        if total_duration > last_end - first_start:
+            return True
+
+    return False
+
+
+def get_minimization_context(cores, master_instance, all_subproblem_results, config: dict, solve_subproblem, log_file_path: Path) -> dict:
+    '''Funzione che ritorna lo stato condiviso dalle verifiche di
+    realizzabilità di una iterazione: gli insiemi di richieste di cui è nota
+    la realizzabilità in ogni giorno, la configurazione delle risoluzioni ed i
+    contatori. Inizialmente sono realizzabili le soluzioni dei sottoproblemi
+    ed irrealizzabili i core forniti, che verrebbero comunque aggiunti come
+    tagli al master.'''
+
+    # Le verifiche usano sempre il modello con assegnazione degli operatori:
+    # un insieme irrealizzabile con operatori liberi lo è anche per ogni
+    # assegnazione fissata dal master
+    check_config = copy.deepcopy(config)
+    check_config['subproblem_config']['model'] = 'fat-subproblem'
+
+    minimization_context = {
+        'master_instance': master_instance,
+        'check_config': check_config,
+        'solve_subproblem': solve_subproblem,
+        'log_file_path': log_file_path,
+        'feasible_components': {},
+        'infeasible_components': {},
+        'info': {
+            'minimized_cores': 0,
+            'removed_core_components': 0,
+            'minimization_solver_calls': 0,
+            'skipped_minimization_checks': 0
+        }
+    }
+
+    for day_name, day_results in all_subproblem_results.items():
+        minimization_context['feasible_components'][day_name] = [frozenset((schedule['patient'], schedule['service']) for schedule in day_results['scheduled'])]
+        minimization_context['infeasible_components'][day_name] = []
+
+    for core in cores:
+        minimization_context['infeasible_components'][core['days'][0]].append(frozenset((component['patient'], component['service']) for component in core['components']))
+
+    return minimization_context
+
+
+def is_core_infeasible(components: frozenset, day_name, minimization_context: dict, deadline: float) -> bool:
+    '''Funzione che ritorna True se le richieste non possono essere
+    schedulate tutte nel giorno e False se sono realizzabili oppure se la
+    verifica non ha avuto esito. Si usano prima gli insiemi di cui la
+    realizzabilità è già nota, poi i controlli combinatori ed infine il
+    modello del sottoproblema con il tempo rimasto fino a 'deadline' (infinito
+    se non c'è un budget di tempo).'''
+
+    master_instance = minimization_context['master_instance']
+    feasible_components = minimization_context['feasible_components'][day_name]
+    infeasible_components = minimization_context['infeasible_components'][day_name]
+
+    if any(components <= feasible for feasible in feasible_components):
+        return False
+    if any(infeasible <= components for infeasible in infeasible_components):
+        return True
+    if is_trivially_infeasible(master_instance, day_name, components):
+        infeasible_components.append(components)
+        return True
+
+    remaining_time = deadline - time.perf_counter()
+    if remaining_time <= 0:
+        minimization_context['info']['skipped_minimization_checks'] += 1
+        return False
+
+    subproblem_config = copy.deepcopy(minimization_context['check_config'])
+    if 'time_limit' in subproblem_config['subproblem_config']:
+        remaining_time = min(remaining_time, subproblem_config['subproblem_config']['time_limit'])
+    if remaining_time < math.inf:
+        subproblem_config['subproblem_config']['time_limit'] = remaining_time
+
+    subproblem_instance = get_core_subproblem_instance(master_instance, day_name, components)
+    subproblem_results, subproblem_info = minimization_context['solve_subproblem'](subproblem_instance, subproblem_config, minimization_context['log_file_path'])
+    minimization_context['info']['minimization_solver_calls'] += 1
+
+    # Ogni soluzione trovata è un insieme realizzabile
+    scheduled_components = frozenset((schedule['patient'], schedule['service']) for schedule in subproblem_results['scheduled'])
+    feasible_components.append(scheduled_components)
+
+    if len(subproblem_results['rejected']) == 0:
+        return False
+    if subproblem_info['status'] == 'optimal':
+        infeasible_components.append(components)
+        return True
+
+    return False
+
+
+def get_minimal_infeasible_components(components: frozenset, day_name, minimization_context: dict, deadline: float) -> frozenset:
+    '''Funzione che applica il filtro di eliminazione ad un insieme di
+    richieste irrealizzabile: per ogni componente si verifica se l'insieme
+    senza di essa è ancora irrealizzabile e in tal caso la si elimina. Una
+    verifica senza esito mantiene la componente, quindi l'insieme restituito
+    è sempre irrealizzabile.'''
+
+    for component in sorted(components):
+        reduced_components = components - {component}
+        if len(reduced_components) == 0:
+            continue
+        if is_core_infeasible(reduced_components, day_name, minimization_context, deadline):
+            components = reduced_components
+
+    return components
+
+
+def get_core_from_components(components, day_name) -> dict:
+    '''Funzione che ritorna il core con le componenti fornite (coppie
+    paziente, servizio) ordinate, valido nel giorno specificato.'''
+
+    return {
+        'components': [{
+            'patient': patient_name,
+            'service': service_name
+        } for patient_name, service_name in sorted(components)],
+        'days': [day_name]
+    }
+
+
+def minimize_cores(cores, master_instance, all_subproblem_results, config: dict, solve_subproblem):
+    '''Funzione che riduce ogni core ad un sottoinsieme minimale di richieste
+    che non possono essere schedulate tutte nel giorno con il filtro di
+    eliminazione. Ogni core ha a disposizione 'core_minimization_time_budget'
+    secondi per le risoluzioni del sottoproblema (senza limite se la chiave
+    non è presente), effettuate con la funzione 'solve_subproblem'. Ritorna
+    la coppia (core minimizzati, informazioni).'''
+
+    time_budget = config.get('core_minimization_time_budget', math.inf)
+
+    minimized_cores = []
+
+    with tempfile.TemporaryDirectory() as log_directory_name:
+
+        log_file_path = Path(log_directory_name).joinpath('core_minimization_log.log')
+        minimization_context = get_minimization_context(cores, master_instance, all_subproblem_results, config, solve_subproblem, log_file_path)
+        minimization_info = minimization_context['info']
+
+        for core in cores:
+
+            day_name = core['days'][0]
+            deadline = time.perf_counter() + time_budget
+
+            core_components = frozenset((component['patient'], component['service']) for component in core['components'])
+
+            # Se il core non risulta irrealizzabile con le verifiche disponibili
+            # viene mantenuto com'è
+            if not is_core_infeasible(core_components, day_name, minimization_context, deadline):
+                minimized_cores.append(core)
+                continue
+
+            core_components = get_minimal_infeasible_components(core_components, day_name, minimization_context, deadline)
+
+            if len(core_components) < len(core['components']):
+                minimization_info['minimized_cores'] += 1
+                minimization_info['removed_core_components'] += len(core['components']) - len(core_components)
+
+            minimized_cores.append(get_core_from_components(core_components, day_name))
+
+    return minimized_cores, minimization_info
+
+
+def enumerate_disjoint_cores(cores, master_instance, all_subproblem_results, config: dict, solve_subproblem):
+    '''Funzione che estrae da ogni giorno più conflitti disgiunti a partire
+    dai core del giorno (calcolati con il tipo di core configurato), dal più
+    piccolo al più grande: dalle componenti di ogni core si tolgono quelle dei
+    conflitti già trovati e, se le rimanenti sono ancora irrealizzabili,
+    vengono ridotte ad un sottoinsieme minimale che diventa un nuovo core.
+    Vengono estratti al più 'max_cores_per_day' core per giorno, ognuno con
+    'core_minimization_time_budget' secondi di risoluzione; se le chiavi non
+    sono presenti non ci sono limiti al numero di core ed al tempo. Se in un
+    giorno non viene trovato alcun conflitto si mantengono i core originali.
+    Ritorna la coppia (core, informazioni).'''
+
+    time_budget = config.get('core_minimization_time_budget', math.inf)
+    max_cores_per_day = config.get('max_cores_per_day', math.inf)
+
+    cores_by_day = {}
+    for core in cores:
+        day_name = core['days'][0]
+        if day_name not in cores_by_day:
+            cores_by_day[day_name] = []
+        cores_by_day[day_name].append(core)
+
+    enumerated_cores = []
+
+    with tempfile.TemporaryDirectory() as log_directory_name:
+
+        log_file_path = Path(log_directory_name).joinpath('core_enumeration_log.log')
+        minimization_context = get_minimization_context(cores, master_instance, all_subproblem_results, config, solve_subproblem, log_file_path)
+        enumeration_info = minimization_context['info']
+        enumeration_info['enumerated_cores'] = 0
+
+        for day_name, day_cores in cores_by_day.items():
+
+            day_cores_components = sorted((frozenset((component['patient'], component['service']) for component in core['components']) for core in day_cores), key=lambda components: (len(components), sorted(components)))
+
+            used_components = frozenset()
+            day_enumerated_cores = []
+
+            for core_components in day_cores_components:
+
+                if len(day_enumerated_cores) >= max_cores_per_day:
+                    break
+
+                remaining_components = core_components - used_components
+                if len(remaining_components) == 0:
+                    continue
+
+                deadline = time.perf_counter() + time_budget
+
+                if not is_core_infeasible(remaining_components, day_name, minimization_context, deadline):
+                    continue
+
+                remaining_components = get_minimal_infeasible_components(remaining_components, day_name, minimization_context, deadline)
+                day_enumerated_cores.append(get_core_from_components(remaining_components, day_name))
+
+                used_components = used_components | remaining_components
+
+            if len(day_enumerated_cores) == 0:
+                enumerated_cores.extend(day_cores)
+            else:
+                enumerated_cores.extend(day_enumerated_cores)
+                enumeration_info['enumerated_cores'] += len(day_enumerated_cores)
+
+    return enumerated_cores, enumeration_info
@@ -0,0 +1,110 @@
+def get_requested_components(subproblem_instance) -> frozenset:
+    '''Funzione che ritorna l'insieme delle coppie (paziente, servizio)
+    richieste nell'istanza del sottoproblema.'''
+
+    return frozenset((patient_name, service_name) for patient_name, patient in subproblem_instance['patients'].items() for service_name in patient['requests'])
+
+
+def add_fully_scheduled_day(feasibility_knowledge: dict, day_name, subproblem_results, iteration_index: int):
+    '''Funzione che aggiunge alla base di conoscenza la soluzione di un giorno
+    in cui tutte le richieste sono state schedulate. Le soluzioni dello stesso
+    giorno le cui richieste sono un sottoinsieme di quelle nuove vengono
+    rimosse, dato che non potranno più essere le uniche testimoni di niente.'''
+
+    if len(subproblem_results['rejected']) > 0:
+        return
+
+    components = frozenset((schedule['patient'], schedule['service']) for schedule in subproblem_results['scheduled'])
+
+    if day_name not in feasibility_knowledge:
+        feasibility_knowledge[day_name] = []
+
+    for entry in feasibility_knowledge[day_name]:
+        if components <= entry['components']:
+            return
+
+    feasibility_knowledge[day_name] = [entry for entry in feasibility_knowledge[day_name] if not entry['components'] <= components]
+    feasibility_knowledge[day_name].append({
+        'components': components,
+        'scheduled': subproblem_results['scheduled'],
+        'iteration': iteration_index
+    })
+
+
+def find_feasibility_witness(feasibility_knowledge: dict, master_instance, day_name, subproblem_instance):
+    '''Funzione che cerca una soluzione già calcolata che schedula un
+    sovrainsieme delle richieste dell'istanza del sottoproblema. Sono valide le
+    soluzioni dello stesso giorno e quelle dei giorni in cui le unità di cura
+    toccate dalle richieste hanno esattamente gli stessi operatori, dato che la
+    schedulazione rimane ammissibile senza alcuna modifica. Ritorna la coppia
+    (giorno testimone, risultati ristretti alle richieste) oppure None.'''
+
+    components = get_requested_components(subproblem_instance)
+
+    care_unit_names = set(master_instance['services'][service_name]['care_unit'] for _, service_name in components)
+    day = master_instance['days'][day_name]
+
+    for witness_day_name, entries in feasibility_knowledge.items():
+
+        # Le unità di cura coinvolte devono avere gli stessi operatori
+        if witness_day_name != day_name:
+            witness_day = master_instance['days'][witness_day_name]
+            if any(care_unit_name not in witness_day or witness_day[care_unit_name] != day[care_unit_name] for care_unit_name in care_unit_names):
+                continue
+
+        for entry in entries:
+            if components <= entry['components']:
+
+                scheduled_requests = [schedule.copy() for schedule in entry['scheduled'] if (schedule['patient'], schedule['service']) in components]
+
+                return witness_day_name, {
+                    'scheduled': scheduled_requests,
+                    'rejected': []
+                }
+
+    return None
+
+
+def get_subproblem_results_objective_value(subproblem_instance, subproblem_results) -> float:
+    '''Funzione che ritorna il valore della funzione obiettivo del
+    sottoproblema corrispondente ai risultati forniti.'''
+
+    objective_value = 0
+    for schedule in subproblem_results['scheduled']:
+        service_duration = subproblem_instance['services'][schedule['service']]['duration']
+        patient_priority = subproblem_instance['patients'][schedule['patient']]['priority']
+        objective_value += service_duration * patient_priority
+
+    return float(objective_value)
+
+
+def get_closed_subproblem_solver_info(subproblem_instance, subproblem_results, model_name: str, witness_day_name=None):
+    '''Funzione che ritorna le informazioni di un sottoproblema chiuso senza
+    chiamare il solver (da un testimone, dall'euristica o dalla soluzione
+    dell'iterazione precedente), con le stesse chiavi prodotte dal solver.
+    Dato che tutte le richieste sono schedulate la soluzione è ottima. Se il
+    sottoproblema è chiuso da un testimone viene indicato il suo giorno.'''
+
+    objective_value = get_subproblem_results_objective_value(subproblem_instance, subproblem_results)
+
+    solver_info = {
+        'objective_function_value': objective_value,
+        'solver_status': 'ok',
+        'status': 'optimal',
+        'time': 0.0,
+        'gap_ratio': 0.0,
+        'lower_bound': objective_value,
+        'upper_bound': objective_value,
+        'gap': 0.0,
+        'model': model_name,
+        'root_relax': objective_value,
+        'best_sol_time': -1,
+        'best_obj_ratio_root_relax': 1.0,
+        'subproblem_model_creation_time': 0.0,
+        'subproblem_external_solving_time': 0.0
+    }
+
+    if witness_day_name is not None:
+        solver_info['feasibility_witness'] = str(witness_day_name)
+
+    return solver_info
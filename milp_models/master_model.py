@@ -1,33 +1,15 @@
 import pyomo.environ as pyo
+import numpy as np
 
+from milp_models.matrix_backend import get_matrix_model, add_matrix_variables, get_matrix_columns
+from milp_models.matrix_backend import add_matrix_constraints, add_matrix_sum_constraints, add_matrix_objective_terms
 
-def get_slim_master_model(instance, additional_info: list[str]):
-    '''Funzione che ritorna il modello MILP del problema master senza
-    assegnazione dell'operatore.'''
-
-    model = pyo.ConcreteModel()
-
-    # INSIEMI ##################################################################
-    
-    # Insieme di giorni (casting ad intero)
-    model.days = pyo.Set(initialize=sorted([int(d) for d in instance['days'].keys()]), domain=pyo.NonNegativeIntegers)
 
-    # Tutte le coppie (day, care_unit)
-    model.care_units = pyo.Set(initialize=sorted([(int(d), c) for d, day in instance['days'].items() for c in day.keys()]))
-
-    # PARAMETRI ################################################################
-
-    # capacity[d, c] è la somma delle durate degli operatori in c
-    @model.Param(model.care_units, domain=pyo.NonNegativeIntegers, mutable=False)
-    def capacity(model, d, c):
-        return sum([o['duration'] for o in instance['days'][str(d)][c].values()])
-
-    # max_time[d, c] è il massimo tempo di fine degli operatori in d
-    @model.Param(model.days, domain=pyo.NonNegativeIntegers, mutable=False)
-    def max_time(model, d):
-        return max([o['start'] + o['duration'] for c in instance['days'][str(d)].keys() for o in instance['days'][str(d)][c].values()])
-
-    # INDICI ###################################################################
+def get_slim_master_model_indices(instance) -> dict:
+    '''Funzione che ritorna gli indici ordinati del master senza assegnazione
+    dell'operatore ed i raggruppamenti delle terne (p, s, d) usati dai
+    vincoli. Gli indici sono condivisi dal modello Pyomo e da quello
+    matriciale.'''
 
     # Insieme di quadruple (p, s, start, end) per ogni finestra
     window_index = set()
@@ -71,11 +53,76 @@ def get_slim_master_model(instance, additional_info: list[str]):
                         (we2 >= ws1 and we2 <= we1)):
                         window_overlap_index.add((patient_name, service_name, ws1, we1, ws2, we2))
 
-    model.window_index = pyo.Set(initialize=sorted(window_index))
-    model.do_index = pyo.Set(initialize=sorted(do_index))
-    model.window_overlap_index = pyo.Set(initialize=sorted(window_overlap_index))
-    model.pat_days_index = pyo.Set(initialize=sorted(pat_days_index))
-    del window_index, do_index, window_overlap_index, pat_days_index
+    window_index = sorted(window_index)
+    do_index = sorted(do_index)
+
+    # Raggruppamenti delle terne (p, s, d) usati dai vincoli, in modo che
+    # ciascuno di essi non debba scorrere tutto 'do_index'. L'ordine interno
+    # dei gruppi è quello di 'do_index', per cui i vincoli generati sono
+    # identici a quelli ottenuti filtrando l'intero indice.
+    days_by_request = {}
+    requests_by_care_unit = {}
+    services_by_patient_day = {}
+    requests_by_day = {}
+    for p, s, d in do_index:
+        c = instance['services'][s]['care_unit']
+        days_by_request.setdefault((p, s), []).append(d)
+        requests_by_care_unit.setdefault((d, c), []).append((p, s))
+        services_by_patient_day.setdefault((p, d), []).append(s)
+        requests_by_day.setdefault(d, []).append((p, s))
+
+    return {
+        'window_index': window_index,
+        'do_index': do_index,
+        'window_overlap_index': sorted(window_overlap_index),
+        'pat_days_index': sorted(pat_days_index),
+        'days_by_request': days_by_request,
+        'requests_by_care_unit': requests_by_care_unit,
+        'services_by_patient_day': services_by_patient_day,
+        'requests_by_day': requests_by_day
+    }
+
+
+def get_slim_master_model(instance, additional_info: list[str]):
+    '''Funzione che ritorna il modello MILP del problema master senza
+    assegnazione dell'operatore.'''
+
+    model = pyo.ConcreteModel()
+
+    # INSIEMI ##################################################################
+    
+    # Insieme di giorni (casting ad intero)
+    model.days = pyo.Set(initialize=sorted([int(d) for d in instance['days'].keys()]), domain=pyo.NonNegativeIntegers)
+
+    # Tutte le coppie (day, care_unit)
+    model.care_units = pyo.Set(initialize=sorted([(int(d), c) for d, day in instance['days'].items() for c in day.keys()]))
+
+    # PARAMETRI ################################################################
+
+    # capacity[d, c] è la somma delle durate degli operatori in c
+    @model.Param(model.care_units, domain=pyo.NonNegativeIntegers, mutable=False)
+    def capacity(model, d, c):
+        return sum([o['duration'] for o in instance['days'][str(d)][c].values()])
+
+    # max_time[d, c] è il massimo tempo di fine degli operatori in d
+    @model.Param(model.days, domain=pyo.NonNegativeIntegers, mutable=False)
+    def max_time(model, d):
+        return max([o['start'] + o['duration'] for c in instance['days'][str(d)].keys() for o in instance['days'][str(d)][c].values()])
+
+    # INDICI ###################################################################
+
+    indices = get_slim_master_model_indices(instance)
+
+    model.window_index = pyo.Set(initialize=indices['window_index'])
+    model.do_index = pyo.Set(initialize=indices['do_index'])
+    model.window_overlap_index = pyo.Set(initialize=indices['window_overlap_index'])
+    model.pat_days_index = pyo.Set(initialize=indices['pat_days_index'])
+
+    days_by_request = indices['days_by_request']
+    requests_by_care_unit = indices['requests_by_care_unit']
+    services_by_patient_day = indices['services_by_patient_day']
+    requests_by_day = indices['requests_by_day']
+    del indices
 
     # VARIABILI ################################################################
 
@@ -104,14 +151,14 @@ def get_slim_master_model(instance, additional_info: list[str]):
     # alla sua finestra
     @model.Constraint(model.window_index)
     def link_window_to_do_variables(model, p, s, ws, we):
-        return model.window[p, s, ws, we] == pyo.quicksum([model.do[pp, ss, d] for pp, ss, d in model.do_index if p == pp and s == ss and d >= ws and d <= we])
+        return model.window[p, s, ws, we] == pyo.quicksum([model.do[p, s, d] for d in days_by_request[p, s] if d >= ws and d <= we])
 
     # La durata totale dei servizi programmati per ogni unità di cura non può
     # superare la capacità di quest'ultima
     @model.Constraint(model.care_units)
     def respect_care_unit_capacity(model, d, c):
         
-        tuples_affected = [(p, s) for p, s, dd in model.do_index if d == dd and c == instance['services'][s]['care_unit']]
+        tuples_affected = requests_by_care_unit.get((d, c), [])
         
         if len(tuples_affected) == 0:
             return pyo.Constraint.Skip
@@ -127,7 +174,7 @@ def get_slim_master_model(instance, additional_info: list[str]):
         min_ws = min(ws, wws)
         max_we = max(we, wwe)
         
-        tuples_affected = [d for d in range(min_ws, max_we + 1) for pp, ss, dd in model.do_index if p == pp and s == ss and d == dd]
+        tuples_affected = [d for d in days_by_request[p, s] if d >= min_ws and d <= max_we]
         
         return pyo.quicksum(model.do[p, s, d] for d in tuples_affected) <= 1 + model.window_overlap[p, s, ws, we, wws, wwe]
 
@@ -136,7 +183,7 @@ def get_slim_master_model(instance, additional_info: list[str]):
     @model.Constraint(model.pat_days_index)
     def patient_total_duration(model, p, d):
         
-        tuples_affected = [s for pp, s, dd in model.do_index if pp == p and dd == d]
+        tuples_affected = services_by_patient_day[p, d]
         
         if sum(instance['services'][s]['duration'] for s in tuples_affected) <= model.max_time[d]:
             return pyo.Constraint.Skip
@@ -153,14 +200,14 @@ def get_slim_master_model(instance, additional_info: list[str]):
     # Vincoli che eliminano le possibili programmazioni che non sono inseribili
     # negli operatori senza avere qualche servizio a metà fra due
     if 'use_bin_packing' in additional_info:
-        add_bin_packing_cuts_to_master_model(model, instance)
+        add_bin_packing_cuts_to_master_model(model, instance, requests_by_care_unit)
 
     # Vincoli di ottimalità
     if 'use_optimality_constraints' in additional_info:
         @model.Constraint(model.days)
         def link_objective_component(model, d):
             
-            tuples_affected = [(p, s) for p, s, dd in model.do_index if d == dd]
+            tuples_affected = requests_by_day.get(d, [])
             
             if len(tuples_affected) == 0:
                 return model.objective_function_day_component[d] == 0
@@ -192,7 +239,116 @@ def get_slim_master_model(instance, additional_info: list[str]):
     return model
 
 
-def add_bin_packing_cuts_to_master_model(model, instance):
+def get_slim_master_matrix_model(instance, additional_info: list[str]):
+    '''Funzione che ritorna il modello matriciale del problema master senza
+    assegnazione dell'operatore, con la stessa formulazione del modello Pyomo
+    ma costruito direttamente per colonne e righe.'''
+
+    if 'use_bin_packing' in additional_info:
+        raise ValueError('Bin packing cuts are not supported by the matrix backend.')
+
+    indices = get_slim_master_model_indices(instance)
+
+    days = sorted([int(d) for d in instance['days'].keys()])
+    care_units = sorted([(int(d), c) for d, day in instance['days'].items() for c in day.keys()])
+
+    capacity = {(d, c): sum([o['duration'] for o in instance['days'][str(d)][c].values()]) for d, c in care_units}
+    max_time = {d: max([o['start'] + o['duration'] for c in instance['days'][str(d)].keys() for o in instance['days'][str(d)][c].values()]) for d in days}
+
+    duration = {s: service['duration'] for s, service in instance['services'].items()}
+    priority = {p: patient['priority'] for p, patient in instance['patients'].items()}
+
+    model = get_matrix_model()
+
+    # VARIABILI ################################################################
+
+    add_matrix_variables(model, 'window', indices['window_index'], 0, 1, True)
+    add_matrix_variables(model, 'do', indices['do_index'], 0, 1, True)
+    add_matrix_variables(model, 'window_overlap', indices['window_overlap_index'], 0, 1, True)
+    if 'minimize_hospital_accesses' in additional_info:
+        add_matrix_variables(model, 'pat_use_day', indices['pat_days_index'], 0, 1, True)
+    if 'use_optimality_constraints' in additional_info:
+        add_matrix_variables(model, 'objective_function_day_component', days, 0, np.inf, True)
+
+    window_columns = model['variables']['window']['columns']
+    do_columns = model['variables']['do']['columns']
+    window_overlap_columns = model['variables']['window_overlap']['columns']
+
+    # VINCOLI ##################################################################
+
+    # Se una finestra è soddisfatta, è soddisfatta in un unico giorno interno
+    # alla sua finestra
+    rows = []
+    for p, s, ws, we in indices['window_index']:
+        columns = [window_columns[p, s, ws, we]] + [do_columns[p, s, d] for d in indices['days_by_request'][p, s] if d >= ws and d <= we]
+        rows.append((columns, [1.0] + [-1.0] * (len(columns) - 1)))
+    add_matrix_sum_constraints(model, rows, 0.0, 0.0)
+
+    # La durata totale dei servizi programmati per ogni unità di cura non può
+    # superare la capacità di quest'ultima
+    rows = []
+    upper_bounds = []
+    for d, c in care_units:
+        tuples_affected = indices['requests_by_care_unit'].get((d, c), [])
+        if len(tuples_affected) == 0 or sum(duration[s] for _, s in tuples_affected) <= capacity[d, c]:
+            continue
+        rows.append(([do_columns[p, s, d] for p, s in tuples_affected], [duration[s] for _, s in tuples_affected]))
+        upper_bounds.append(capacity[d, c])
+    add_matrix_sum_constraints(model, rows, -np.inf, upper_bounds)
+
+    # Vincolo che lega le variabili 'window_overlap' alle variabili 'do'
+    rows = []
+    for p, s, ws, we, wws, wwe in indices['window_overlap_index']:
+        min_ws = min(ws, wws)
+        max_we = max(we, wwe)
+        columns = [do_columns[p, s, d] for d in indices['days_by_request'][p, s] if d >= min_ws and d <= max_we]
+        rows.append((columns + [window_overlap_columns[p, s, ws, we, wws, wwe]], [1.0] * len(columns) + [-1.0]))
+    add_matrix_sum_constraints(model, rows, -np.inf, 1.0)
+
+    # Non è possibile inserire richieste dello stesso paziente la cui durata
+    # totale eccede gli slot temporali di quel giorno
+    rows = []
+    upper_bounds = []
+    for p, d in indices['pat_days_index']:
+        tuples_affected = indices['services_by_patient_day'][p, d]
+        if sum(duration[s] for s in tuples_affected) <= max_time[d]:
+            continue
+        rows.append(([do_columns[p, s, d] for s in tuples_affected], [duration[s] for s in tuples_affected]))
+        upper_bounds.append(max_time[d])
+    add_matrix_sum_constraints(model, rows, -np.inf, upper_bounds)
+
+    # Vincolo che forza 'pat_use_day' ad 1 se è presente almeno una richiesta
+    # del paziente in quel giorno
+    if 'minimize_hospital_accesses' in additional_info:
+        add_matrix_constraints(model, [
+            (get_matrix_columns(model, 'do', indices['do_index']), 1.0),
+            (get_matrix_columns(model, 'pat_use_day', [(p, d) for p, _, d in indices['do_index']]), -1.0)
+        ], -np.inf, 0.0)
+
+    # Vincoli di ottimalità
+    if 'use_optimality_constraints' in additional_info:
+        rows = []
+        for d in days:
+            tuples_affected = indices['requests_by_day'].get(d, [])
+            columns = [do_columns[p, s, d] for p, s in tuples_affected]
+            coefficients = [duration[s] * priority[p] for p, s in tuples_affected]
+            rows.append((columns + [model['variables']['objective_function_day_component']['columns'][d]], coefficients + [-1.0]))
+        add_matrix_sum_constraints(model, rows, 0.0, 0.0)
+
+    # FUNZIONE OBIETTIVO #######################################################
+
+    add_matrix_objective_terms(model, get_matrix_columns(model, 'do', indices['do_index']), [duration[s] * priority[p] for p, s, _ in indices['do_index']])
+    add_matrix_objective_terms(model, get_matrix_columns(model, 'window_overlap', indices['window_overlap_index']), -1e6)
+    if 'minimize_hospital_accesses' in additional_info:
+        add_matrix_objective_terms(model, get_matrix_columns(model, 'pat_use_day', indices['pat_days_index']), -1.0 / len(indices['pat_days_index']))
+
+    return model
+
+
+def add_bin_packing_cuts_to_master_model(model, instance, requests_by_care_unit):
+    '''Funzione che aggiunge i tagli di bin packing al master senza operatori.
+    'requests_by_care_unit' contiene per ogni coppia (d, c) la lista delle
+    coppie (p, s) di 'do_index' in quel giorno ed unità di cura.'''
 
     # il numero di servizi lunghi più della metà dello shift non può essere
     # maggiore al numero di operatori
@@ -201,7 +357,7 @@ def add_bin_packing_cuts_to_master_model(model, instance):
         day_name = str(d)
         operator_number = len(instance['days'][day_name][c])
         operator_duration = instance['days'][day_name][c]['op00']['duration']
-        tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] >= (operator_duration * 0.5 + 1)]
+        tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] >= (operator_duration * 0.5 + 1)]
         if len(tuple_list) == 0:
             return pyo.Constraint.Skip
         return pyo.quicksum([model.do[p, s, d] for p, s in tuple_list]) <= operator_number
@@ -211,8 +367,8 @@ def add_bin_packing_cuts_to_master_model(model, instance):
         day_name = str(d)
         operator_number = len(instance['days'][day_name][c])
         operator_duration = instance['days'][day_name][c]['op00']['duration']
-        tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] == int(operator_duration * 0.5)]
-        greater_tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] >= int(operator_duration * 0.5 + 1)]
+        tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] == int(operator_duration * 0.5)]
+        greater_tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] >= int(operator_duration * 0.5 + 1)]
         if len(tuple_list) == 0 or len(greater_tuple_list) == 0:
             return pyo.Constraint.Skip
         return pyo.quicksum([model.do[p, s, d] for p, s in tuple_list]) <= operator_number * 2.0 - 2.0 * pyo.quicksum([model.do[p, s, d] for p, s in greater_tuple_list])
@@ -222,8 +378,8 @@ def add_bin_packing_cuts_to_master_model(model, instance):
         day_name = str(d)
         operator_number = len(instance['days'][day_name][c])
         operator_duration = instance['days'][day_name][c]['op00']['duration']
-        tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] == int(operator_duration * 0.5 - 1)]
-        greater_tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] == int(operator_duration * 0.5 + 1)]
+        tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] == int(operator_duration * 0.5 - 1)]
+        greater_tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] == int(operator_duration * 0.5 + 1)]
         if len(tuple_list) == 0 or len(greater_tuple_list) == 0:
             return pyo.Constraint.Skip
         return pyo.quicksum([model.do[p, s, d] for p, s in tuple_list]) <= operator_number * 2.0 - pyo.quicksum([model.do[p, s, d] for p, s in greater_tuple_list])
@@ -233,8 +389,8 @@ def add_bin_packing_cuts_to_master_model(model, instance):
         day_name = str(d)
         operator_number = len(instance['days'][day_name][c])
         operator_duration = instance['days'][day_name][c]['op00']['duration']
-        tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] == int(operator_duration * 0.5 - 1)]
-        greater_tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] == int(operator_duration * 0.5 + 2)]
+        tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] == int(operator_duration * 0.5 - 1)]
+        greater_tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] == int(operator_duration * 0.5 + 2)]
         if len(tuple_list) == 0 or len(greater_tuple_list) == 0:
             return pyo.Constraint.Skip
         return pyo.quicksum([model.do[p, s, d] for p, s in tuple_list]) <= operator_number * 2.0 - 2.0 * pyo.quicksum([model.do[p, s, d] for p, s in greater_tuple_list])
@@ -244,8 +400,8 @@ def add_bin_packing_cuts_to_master_model(model, instance):
         day_name = str(d)
         operator_number = len(instance['days'][day_name][c])
         operator_duration = instance['days'][day_name][c]['op00']['duration']
-        tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] == int(operator_duration * 0.25)]
-        greater_tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] >= int(operator_duration * 0.5 + 1)]
+        tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] == int(operator_duration * 0.25)]
+        greater_tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] >= int(operator_duration * 0.5 + 1)]
         if len(tuple_list) == 0 or len(greater_tuple_list) == 0:
             return pyo.Constraint.Skip
         return pyo.quicksum([model.do[p, s, d] for p, s in tuple_list]) <= operator_number * 4.0 - 3.0 * pyo.quicksum([model.do[p, s, d] for p, s in greater_tuple_list])
@@ -255,14 +411,14 @@ def add_bin_packing_cuts_to_master_model(model, instance):
         day_name = str(d)
         operator_number = len(instance['days'][day_name][c])
         operator_duration = instance['days'][day_name][c]['op00']['duration']
-        tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] == int(operator_duration * 0.25)]
-        greater_tuple_list = [(p, s) for p, s, dd in model.do_index if d == dd and instance['services'][s]['care_unit'] == c and instance['services'][s]['duration'] == int(operator_duration * 0.5)]
+        tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] == int(operator_duration * 0.25)]
+        greater_tuple_list = [(p, s) for p, s in requests_by_care_unit.get((d, c), []) if instance['services'][s]['duration'] == int(operator_duration * 0.5)]
         if len(tuple_list) == 0:
             return pyo.Constraint.Skip
         return pyo.quicksum([model.do[p, s, d] for p, s in tuple_list]) <= operator_number * 4.0 - 2.0 * pyo.quicksum([model.do[p, s, d] for p, s in greater_tuple_list])
 
 
-def add_optimality_constraints(model, instance, all_subproblem_results, max_possible_master_requests):
+def add_optimality_constraints(model, instance, all_subproblem_results, request_availability):
     '''Funzione che aggiunge i due vincoli di ottimalità ad ogni iterazione.'''
 
     # Per ogni giorno salva il valore della funzione obiettivo del sottoproblema
@@ -314,25 +470,11 @@ def add_optimality_constraints(model, instance, all_subproblem_results, max_poss
     for day_name, day_results in all_subproblem_results.items():
         day_index = int(day_name)
             
-        tuple_list = []
-        for possible_request in max_possible_master_requests[day_name]:
-        
-            patient_name = possible_request['patient']
-            service_name = possible_request['service']
-        
-            was_proposed_to_subproblem = False
-            for rejected_request in day_results['rejected']:
-                if rejected_request['patient'] == patient_name and rejected_request['service'] == service_name:
-                    was_proposed_to_subproblem = True
-                    break
-            if not was_proposed_to_subproblem:
-                for scheduled_request in day_results['scheduled']:
-                    if scheduled_request['patient'] == patient_name and scheduled_request['service'] == service_name:
-                        was_proposed_to_subproblem = True
-                        break
-            
-            if not was_proposed_to_subproblem:
-                tuple_list.append((patient_name, service_name, day_index))
+        proposed_requests = set()
+        for request in day_results['rejected'] + day_results['scheduled']:
+            proposed_requests.add((request['patient'], request['service']))
+
+        tuple_list = [(patient_name, service_name, day_index) for patient_name, service_name in sorted(request_availability['requests_by_day'][day_name] - proposed_requests)]
 
         model.objective_value_constraints.add(expr=(model.objective_function_day_component[day_index] <= solution_values[day_name] + solution_values[day_name] * 100 * pyo.quicksum([model.do[p, s, d] for p, s, d in tuple_list])))
 
@@ -376,28 +518,11 @@ def get_results_from_slim_master_model(model):
     }
 
 
-def get_fat_master_model(instance, additional_info: list[str]):
-    '''Funzione che ritorna il modello MILP del problema master con
-    assegnazione dell'operatore.'''
-
-    model = pyo.ConcreteModel()
-
-    # INSIEMI ##################################################################
-    
-    # Insieme di giorni (casting ad intero)
-    model.days = pyo.Set(initialize=sorted([int(d) for d in instance['days'].keys()]), domain=pyo.NonNegativeIntegers)
-
-    # Tutte le coppie (day, care_unit)
-    model.operators = pyo.Set(initialize=sorted([(int(d), cn, o) for d, day in instance['days'].items() for cn, c in day.items() for o in c.keys()]))
-
-    # PARAMETRI ################################################################
-
-    # max_time[d, c] è il massimo tempo di fine degli operatori in d
-    @model.Param(model.days, domain=pyo.NonNegativeIntegers, mutable=False)
-    def max_time(model, d):
-        return max([o['start'] + o['duration'] for c in instance['days'][str(d)].keys() for o in instance['days'][str(d)][c].values()])
-
-    # INDICI ###################################################################
+def get_fat_master_model_indices(instance) -> dict:
+    '''Funzione che ritorna gli indici ordinati del master con assegnazione
+    dell'operatore ed i raggruppamenti delle tuple (p, s, d, c, o) usati dai
+    vincoli. Gli indici sono condivisi dal modello Pyomo e da quello
+    matriciale.'''
 
     # Insieme di quadruple (p, s, start, end) per ogni finestra
     window_index = set()
@@ -443,11 +568,70 @@ def get_fat_master_model(instance, additional_info: list[str]):
                         (we2 >= ws1 and we2 <= we1)):
                         window_overlap_index.add((p, s, ws1, we1, ws2, we2))
 
-    model.window_index = pyo.Set(initialize=sorted(window_index))
-    model.do_index = pyo.Set(initialize=sorted(do_index))
-    model.window_overlap_index = pyo.Set(initialize=sorted(window_overlap_index))
-    model.pat_days_index = pyo.Set(initialize=sorted(pat_days_index))
-    del window_index, do_index, window_overlap_index, pat_days_index
+    window_index = sorted(window_index)
+    do_index = sorted(do_index)
+
+    # Raggruppamenti delle tuple (p, s, d, c, o) usati dai vincoli, in modo
+    # che ciascuno di essi non debba scorrere tutto 'do_index'. L'ordine
+    # interno dei gruppi è quello di 'do_index', per cui i vincoli generati
+    # sono identici a quelli ottenuti filtrando l'intero indice.
+    assignments_by_request = {}
+    requests_by_operator = {}
+    assignments_by_patient_day = {}
+    assignments_by_day = {}
+    for p, s, d, c, o in do_index:
+        assignments_by_request.setdefault((p, s), []).append((d, c, o))
+        requests_by_operator.setdefault((d, c, o), []).append((p, s))
+        assignments_by_patient_day.setdefault((p, d), []).append((s, c, o))
+        assignments_by_day.setdefault(d, []).append((p, s, c, o))
+
+    return {
+        'window_index': window_index,
+        'do_index': do_index,
+        'window_overlap_index': sorted(window_overlap_index),
+        'pat_days_index': sorted(pat_days_index),
+        'assignments_by_request': assignments_by_request,
+        'requests_by_operator': requests_by_operator,
+        'assignments_by_patient_day': assignments_by_patient_day,
+        'assignments_by_day': assignments_by_day
+    }
+
+
+def get_fat_master_model(instance, additional_info: list[str]):
+    '''Funzione che ritorna il modello MILP del problema master con
+    assegnazione dell'operatore.'''
+
+    model = pyo.ConcreteModel()
+
+    # INSIEMI ##################################################################
+    
+    # Insieme di giorni (casting ad intero)
+    model.days = pyo.Set(initialize=sorted([int(d) for d in instance['days'].keys()]), domain=pyo.NonNegativeIntegers)
+
+    # Tutte le coppie (day, care_unit)
+    model.operators = pyo.Set(initialize=sorted([(int(d), cn, o) for d, day in instance['days'].items() for cn, c in day.items() for o in c.keys()]))
+
+    # PARAMETRI ################################################################
+
+    # max_time[d, c] è il massimo tempo di fine degli operatori in d
+    @model.Param(model.days, domain=pyo.NonNegativeIntegers, mutable=False)
+    def max_time(model, d):
+        return max([o['start'] + o['duration'] for c in instance['days'][str(d)].keys() for o in instance['days'][str(d)][c].values()])
+
+    # INDICI ###################################################################
+
+    indices = get_fat_master_model_indices(instance)
+
+    model.window_index = pyo.Set(initialize=indices['window_index'])
+    model.do_index = pyo.Set(initialize=indices['do_index'])
+    model.window_overlap_index = pyo.Set(initialize=indices['window_overlap_index'])
+    model.pat_days_index = pyo.Set(initialize=indices['pat_days_index'])
+
+    assignments_by_request = indices['assignments_by_request']
+    requests_by_operator = indices['requests_by_operator']
+    assignments_by_patient_day = indices['assignments_by_patient_day']
+    assignments_by_day = indices['assignments_by_day']
+    del indices
 
     # VARIABILI ################################################################
 
@@ -476,14 +660,14 @@ def get_fat_master_model(instance, additional_info: list[str]):
     # alla sua finestra
     @model.Constraint(model.window_index)
     def link_window_to_do_variables(model, p, s, ws, we):
-        return model.window[p, s, ws, we] == pyo.quicksum([model.do[pp, ss, d, c, o] for pp, ss, d, c, o in model.do_index if p == pp and s == ss and d >= ws and d <= we])
+        return model.window[p, s, ws, we] == pyo.quicksum([model.do[p, s, d, c, o] for d, c, o in assignments_by_request[p, s] if d >= ws and d <= we])
 
     # La durata totale dei servizi programmati per ogni operatore non può
     # superare la sua durata
     @model.Constraint(model.operators)
     def respect_operator_duration(model, d, c, o):
         
-        tuples_affected = [(p, s) for p, s, dd, cc, oo in model.do_index if d == dd and c == cc and o == oo]
+        tuples_affected = requests_by_operator.get((d, c, o), [])
         operator_duration = instance['days'][str(d)][c][o]['duration']
         
         if len(tuples_affected) == 0:
@@ -500,7 +684,7 @@ def get_fat_master_model(instance, additional_info: list[str]):
         min_ws = min(ws, wws)
         max_we = max(we, wwe)
         
-        tuples_affected = [(d, c, o) for d in range(min_ws, max_we + 1) for pp, ss, dd, c, o in model.do_index if p == pp and s == ss and d == dd]
+        tuples_affected = [(d, c, o) for d, c, o in assignments_by_request[p, s] if d >= min_ws and d <= max_we]
         
         return pyo.quicksum(model.do[p, s, d, c, o] for d, c, o in tuples_affected) <= 1 + model.window_overlap[p, s, ws, we, wws, wwe]
 
@@ -509,7 +693,7 @@ def get_fat_master_model(instance, additional_info: list[str]):
     @model.Constraint(model.pat_days_index)
     def patient_total_duration(model, p, d):
         
-        tuples_affected = [(s, c, o) for pp, s, dd, c, o in model.do_index if pp == p and dd == d]
+        tuples_affected = assignments_by_patient_day[p, d]
         
         if sum(instance['services'][s]['duration'] for s, c, o in tuples_affected) <= model.max_time[d]:
             return pyo.Constraint.Skip
@@ -533,7 +717,7 @@ def get_fat_master_model(instance, additional_info: list[str]):
         @model.Constraint(model.days)
         def link_objective_component(model, d):
             
-            tuples_affected = [(p, s, c, o) for p, s, dd, c, o in model.do_index if d == dd]
+            tuples_affected = assignments_by_day.get(d, [])
             
             if len(tuples_affected) == 0:
                 return model.objective_function_day_component[d] == 0
@@ -565,6 +749,112 @@ def get_fat_master_model(instance, additional_info: list[str]):
     return model
 
 
+def get_fat_master_matrix_model(instance, additional_info: list[str]):
+    '''Funzione che ritorna il modello matriciale del problema master con
+    assegnazione dell'operatore, con la stessa formulazione del modello Pyomo
+    ma costruito direttamente per colonne e righe.'''
+
+    if 'use_bin_packing' in additional_info:
+        raise ValueError('Bin packing cuts are not supported by the matrix backend.')
+
+    indices = get_fat_master_model_indices(instance)
+
+    days = sorted([int(d) for d in instance['days'].keys()])
+    operators = sorted([(int(d), cn, o) for d, day in instance['days'].items() for cn, c in day.items() for o in c.keys()])
+
+    max_time = {d: max([o['start'] + o['duration'] for c in instance['days'][str(d)].keys() for o in instance['days'][str(d)][c].values()]) for d in days}
+
+    duration = {s: service['duration'] for s, service in instance['services'].items()}
+    priority = {p: patient['priority'] for p, patient in instance['patients'].items()}
+
+    model = get_matrix_model()
+
+    # VARIABILI ################################################################
+
+    add_matrix_variables(model, 'window', indices['window_index'], 0, 1, True)
+    add_matrix_variables(model, 'do', indices['do_index'], 0, 1, True)
+    add_matrix_variables(model, 'window_overlap', indices['window_overlap_index'], 0, 1, True)
+    if 'minimize_hospital_accesses' in additional_info:
+        add_matrix_variables(model, 'pat_use_day', indices['pat_days_index'], 0, 1, True)
+    if 'use_optimality_constraints' in additional_info:
+        add_matrix_variables(model, 'objective_function_day_component', days, 0, np.inf, True)
+
+    window_columns = model['variables']['window']['columns']
+    do_columns = model['variables']['do']['columns']
+    window_overlap_columns = model['variables']['window_overlap']['columns']
+
+    # VINCOLI ##################################################################
+
+    # Se una finestra è soddisfatta, è soddisfatta in un unico giorno interno
+    # alla sua finestra
+    rows = []
+    for p, s, ws, we in indices['window_index']:
+        columns = [window_columns[p, s, ws, we]] + [do_columns[p, s, d, c, o] for d, c, o in indices['assignments_by_request'][p, s] if d >= ws and d <= we]
+        rows.append((columns, [1.0] + [-1.0] * (len(columns) - 1)))
+    add_matrix_sum_constraints(model, rows, 0.0, 0.0)
+
+    # La durata totale dei servizi programmati per ogni operatore non può
+    # superare la sua durata
+    rows = []
+    upper_bounds = []
+    for d, c, o in operators:
+        tuples_affected = indices['requests_by_operator'].get((d, c, o), [])
+        operator_duration = instance['days'][str(d)][c][o]['duration']
+        if len(tuples_affected) == 0 or sum(duration[s] for _, s in tuples_affected) <= operator_duration:
+            continue
+        rows.append(([do_columns[p, s, d, c, o] for p, s in tuples_affected], [duration[s] for _, s in tuples_affected]))
+        upper_bounds.append(operator_duration)
+    add_matrix_sum_constraints(model, rows, -np.inf, upper_bounds)
+
+    # Vincolo che lega le variabili 'window_overlap' alle variabili 'do'
+    rows = []
+    for p, s, ws, we, wws, wwe in indices['window_overlap_index']:
+        min_ws = min(ws, wws)
+        max_we = max(we, wwe)
+        columns = [do_columns[p, s, d, c, o] for d, c, o in indices['assignments_by_request'][p, s] if d >= min_ws and d <= max_we]
+        rows.append((columns + [window_overlap_columns[p, s, ws, we, wws, wwe]], [1.0] * len(columns) + [-1.0]))
+    add_matrix_sum_constraints(model, rows, -np.inf, 1.0)
+
+    # Non è possibile inserire richieste dello stesso paziente la cui durata
+    # totale eccede gli slot temporali di quel giorno
+    rows = []
+    upper_bounds = []
+    for p, d in indices['pat_days_index']:
+        tuples_affected = indices['assignments_by_patient_day'][p, d]
+        if sum(duration[s] for s, _, _ in tuples_affected) <= max_time[d]:
+            continue
+        rows.append(([do_columns[p, s, d, c, o] for s, c, o in tuples_affected], [duration[s] for s, _, _ in tuples_affected]))
+        upper_bounds.append(max_time[d])
+    add_matrix_sum_constraints(model, rows, -np.inf, upper_bounds)
+
+    # Vincolo che forza 'pat_use_day' ad 1 se è presente almeno una richiesta
+    # del paziente in quel giorno
+    if 'minimize_hospital_accesses' in additional_info:
+        add_matrix_constraints(model, [
+            (get_matrix_columns(model, 'do', indices['do_index']), 1.0),
+            (get_matrix_columns(model, 'pat_use_day', [(p, d) for p, _, d, _, _ in indices['do_index']]), -1.0)
+        ], -np.inf, 0.0)
+
+    # Vincoli di ottimalità
+    if 'use_optimality_constraints' in additional_info:
+        rows = []
+        for d in days:
+            tuples_affected = indices['assignments_by_day'].get(d, [])
+            columns = [do_columns[p, s, d, c, o] for p, s, c, o in tuples_affected]
+            coefficients = [duration[s] * priority[p] for p, s, _, _ in tuples_affected]
+            rows.append((columns + [model['variables']['objective_function_day_component']['columns'][d]], coefficients + [-1.0]))
+        add_matrix_sum_constraints(model, rows, 0.0, 0.0)
+
+    # FUNZIONE OBIETTIVO #######################################################
+
+    add_matrix_objective_terms(model, get_matrix_columns(model, 'do', indices['do_index']), [duration[s] * priority[p] for p, s, _, _, _ in indices['do_index']])
+    add_matrix_objective_terms(model, get_matrix_columns(model, 'window_overlap', indices['window_overlap_index']), -1e6)
+    if 'minimize_hospital_accesses' in additional_info:
+        add_matrix_objective_terms(model, get_matrix_columns(model, 'pat_use_day', indices['pat_days_index']), -1.0 / len(indices['pat_days_index']))
+
+    return model
+
+
 def get_results_from_fat_master_model(model):
     '''Funzione che ritorna i risultati (inseriti e rigettati) contenuti nel
     modello master risolto.'''
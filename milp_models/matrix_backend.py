@@ -0,0 +1,336 @@
+from pathlib import Path
+from types import SimpleNamespace
+import time
+import numpy as np
+
+
+def get_matrix_model() -> dict:
+    '''Funzione che ritorna un modello matriciale vuoto di massimizzazione. Il
+    modello contiene le colonne (variabili) con i loro limiti, le righe
+    (vincoli) con i loro limiti ed i coefficienti non nulli in forma COO, che
+    vengono compattati solo al momento della risoluzione.'''
+
+    return {
+        'variables': {},
+        'column_number': 0,
+        'column_lower': [],
+        'column_upper': [],
+        'column_is_integer': [],
+        'objective_columns': [],
+        'objective_coefficients': [],
+        'row_number': 0,
+        'row_lower': [],
+        'row_upper': [],
+        'entry_rows': [],
+        'entry_columns': [],
+        'entry_coefficients': [],
+        'start_columns': [],
+        'start_values': []
+    }
+
+
+def add_matrix_variables(matrix_model: dict, name: str, index: list, lower, upper, is_integer: bool):
+    '''Funzione che aggiunge al modello una colonna per ogni elemento
+    dell'indice (già ordinato). I limiti possono essere scalari oppure liste
+    allineate all'indice.'''
+
+    column_number = len(index)
+    first_column = matrix_model['column_number']
+
+    matrix_model['variables'][name] = {
+        'index': index,
+        'columns': dict(zip(index, range(first_column, first_column + column_number)))
+    }
+    matrix_model['column_number'] += column_number
+
+    matrix_model['column_lower'].append(np.broadcast_to(np.asarray(lower, dtype=np.float64), (column_number,)))
+    matrix_model['column_upper'].append(np.broadcast_to(np.asarray(upper, dtype=np.float64), (column_number,)))
+    matrix_model['column_is_integer'].append(np.full(column_number, is_integer))
+
+
+def get_matrix_columns(matrix_model: dict, name: str, keys) -> np.ndarray:
+    '''Funzione che ritorna il vettore delle colonne della variabile 'name'
+    corrispondenti alle chiavi fornite.'''
+
+    columns = matrix_model['variables'][name]['columns']
+
+    return np.fromiter((columns[key] for key in keys), dtype=np.int64)
+
+
+def add_matrix_constraints(matrix_model: dict, terms: list, lower, upper):
+    '''Funzione che aggiunge un blocco di vincoli con la stessa struttura, uno
+    per riga. Ogni termine è una coppia (colonne, coefficienti) in cui le
+    colonne sono un vettore con un elemento per vincolo ed i coefficienti sono
+    uno scalare oppure un vettore della stessa lunghezza.'''
+
+    if len(terms) == 0:
+        return
+
+    row_number = len(terms[0][0])
+    if row_number == 0:
+        return
+
+    rows = np.arange(matrix_model['row_number'], matrix_model['row_number'] + row_number)
+    matrix_model['row_number'] += row_number
+
+    for columns, coefficients in terms:
+        matrix_model['entry_rows'].append(rows)
+        matrix_model['entry_columns'].append(np.asarray(columns, dtype=np.int64))
+        matrix_model['entry_coefficients'].append(np.broadcast_to(np.asarray(coefficients, dtype=np.float64), (row_number,)))
+
+    matrix_model['row_lower'].append(np.broadcast_to(np.asarray(lower, dtype=np.float64), (row_number,)))
+    matrix_model['row_upper'].append(np.broadcast_to(np.asarray(upper, dtype=np.float64), (row_number,)))
+
+
+def add_matrix_sum_constraints(matrix_model: dict, rows: list, lower, upper):
+    '''Funzione che aggiunge un blocco di vincoli con un numero di termini
+    variabile, come le sommatorie. Ogni riga è una coppia (colonne,
+    coefficienti) di liste della stessa lunghezza.'''
+
+    row_number = len(rows)
+    if row_number == 0:
+        return
+
+    row_lengths = np.fromiter((len(columns) for columns, _ in rows), dtype=np.int64, count=row_number)
+    first_row = matrix_model['row_number']
+    matrix_model['row_number'] += row_number
+
+    matrix_model['entry_rows'].append(np.repeat(np.arange(first_row, first_row + row_number), row_lengths))
+    matrix_model['entry_columns'].append(np.fromiter((column for columns, _ in rows for column in columns), dtype=np.int64, count=int(row_lengths.sum())))
+    matrix_model['entry_coefficients'].append(np.fromiter((coefficient for _, coefficients in rows for coefficient in coefficients), dtype=np.float64, count=int(row_lengths.sum())))
+
+    matrix_model['row_lower'].append(np.broadcast_to(np.asarray(lower, dtype=np.float64), (row_number,)))
+    matrix_model['row_upper'].append(np.broadcast_to(np.asarray(upper, dtype=np.float64), (row_number,)))
+
+
+def add_matrix_objective_terms(matrix_model: dict, columns, coefficients):
+    '''Funzione che somma alla funzione obiettivo i termini forniti.'''
+
+    columns = np.asarray(columns, dtype=np.int64)
+
+    matrix_model['objective_columns'].append(columns)
+    matrix_model['objective_coefficients'].append(np.broadcast_to(np.asarray(coefficients, dtype=np.float64), columns.shape))
+
+
+def add_matrix_objective_lower_bound(matrix_model: dict, lower_bound: float):
+    '''Funzione che aggiunge il vincolo che impone alla funzione obiettivo di
+    valere almeno 'lower_bound'.'''
+
+    if len(matrix_model['objective_columns']) == 0:
+        return
+
+    columns = np.concatenate(matrix_model['objective_columns'])
+    coefficients = np.concatenate(matrix_model['objective_coefficients'])
+
+    add_matrix_sum_constraints(matrix_model, [(columns, coefficients)], lower_bound, np.inf)
+
+
+def set_matrix_start_values(matrix_model: dict, start_values: dict) -> bool:
+    '''Funzione che imposta la soluzione iniziale del modello, fornita nella
+    forma {nome della variabile: {chiave: valore}}. Le chiavi non presenti nel
+    modello vengono ignorate. Se un valore è fuori dai limiti della sua
+    colonna la soluzione non viene impostata e la funzione ritorna False.'''
+
+    column_lower = np.concatenate(matrix_model['column_lower']) if matrix_model['column_number'] > 0 else np.empty(0)
+    column_upper = np.concatenate(matrix_model['column_upper']) if matrix_model['column_number'] > 0 else np.empty(0)
+
+    start_columns = []
+    start_column_values = []
+
+    for name, values in start_values.items():
+
+        if name not in matrix_model['variables']:
+            continue
+
+        columns = matrix_model['variables'][name]['columns']
+        for key, value in values.items():
+            if key in columns:
+                if value < column_lower[columns[key]] or value > column_upper[columns[key]]:
+                    return False
+                start_columns.append(columns[key])
+                start_column_values.append(value)
+
+    matrix_model['start_columns'].extend(start_columns)
+    matrix_model['start_values'].extend(start_column_values)
+
+    return True
+
+
+def get_compressed_matrix_model(matrix_model: dict) -> dict:
+    '''Funzione che ritorna i vettori del modello in forma compressa per
+    colonne (CSC). I coefficienti della stessa coppia (riga, colonna) vengono
+    sommati e quelli nulli eliminati.'''
+
+    column_number = matrix_model['column_number']
+    row_number = matrix_model['row_number']
+
+    def concatenate(arrays, dtype):
+        if len(arrays) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.concatenate(arrays).astype(dtype, copy=False)
+
+    objective = np.zeros(column_number, dtype=np.float64)
+    np.add.at(objective, concatenate(matrix_model['objective_columns'], np.int64), concatenate(matrix_model['objective_coefficients'], np.float64))
+
+    entry_rows = concatenate(matrix_model['entry_rows'], np.int64)
+    entry_columns = concatenate(matrix_model['entry_columns'], np.int64)
+    entry_coefficients = concatenate(matrix_model['entry_coefficients'], np.float64)
+
+    # Ordinamento per colonna e riga con unione dei duplicati
+    order = np.lexsort((entry_rows, entry_columns))
+    entry_rows = entry_rows[order]
+    entry_columns = entry_columns[order]
+    entry_coefficients = entry_coefficients[order]
+
+    if len(order) > 0:
+        is_first = np.empty(len(order), dtype=bool)
+        is_first[0] = True
+        is_first[1:] = (entry_rows[1:] != entry_rows[:-1]) | (entry_columns[1:] != entry_columns[:-1])
+        group_starts = np.flatnonzero(is_first)
+        entry_coefficients = np.add.reduceat(entry_coefficients, group_starts)
+        entry_rows = entry_rows[group_starts]
+        entry_columns = entry_columns[group_starts]
+
+    is_non_zero = entry_coefficients != 0.0
+    entry_rows = entry_rows[is_non_zero]
+    entry_columns = entry_columns[is_non_zero]
+    entry_coefficients = entry_coefficients[is_non_zero]
+
+    column_starts = np.zeros(column_number + 1, dtype=np.int32)
+    np.cumsum(np.bincount(entry_columns, minlength=column_number), out=column_starts[1:])
+
+    return {
+        'column_number': column_number,
+        'row_number': row_number,
+        'objective': objective,
+        'column_lower': concatenate(matrix_model['column_lower'], np.float64),
+        'column_upper': concatenate(matrix_model['column_upper'], np.float64),
+        'column_is_integer': concatenate(matrix_model['column_is_integer'], bool),
+        'row_lower': concatenate(matrix_model['row_lower'], np.float64),
+        'row_upper': concatenate(matrix_model['row_upper'], np.float64),
+        'column_starts': column_starts,
+        'entry_rows': entry_rows.astype(np.int32),
+        'entry_coefficients': entry_coefficients
+    }
+
+
+def get_highs_solver(matrix_model: dict):
+    '''Funzione che crea un'istanza di HiGHS contenente il modello. Il modulo
+    'highspy' viene importato solo quando il backend matriciale è in uso.'''
+
+    import highspy
+
+    compressed_model = get_compressed_matrix_model(matrix_model)
+
+    lp = highspy.HighsLp()
+    lp.num_col_ = compressed_model['column_number']
+    lp.num_row_ = compressed_model['row_number']
+    lp.sense_ = highspy.ObjSense.kMaximize
+    lp.col_cost_ = compressed_model['objective']
+    lp.col_lower_ = compressed_model['column_lower']
+    lp.col_upper_ = compressed_model['column_upper']
+    lp.row_lower_ = compressed_model['row_lower']
+    lp.row_upper_ = compressed_model['row_upper']
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.num_col_ = compressed_model['column_number']
+    lp.a_matrix_.num_row_ = compressed_model['row_number']
+    lp.a_matrix_.start_ = compressed_model['column_starts']
+    lp.a_matrix_.index_ = compressed_model['entry_rows']
+    lp.a_matrix_.value_ = compressed_model['entry_coefficients']
+    lp.integrality_ = [highspy.HighsVarType.kInteger if is_integer else highspy.HighsVarType.kContinuous for is_integer in compressed_model['column_is_integer']]
+
+    highs = highspy.Highs()
+    highs.setOptionValue('output_flag', False)
+    highs.passModel(lp)
+
+    return highs
+
+
+def get_matrix_column_names(matrix_model: dict) -> list[str]:
+    '''Funzione che ritorna i nomi delle colonne nello stesso formato usato da
+    Pyomo, ad esempio 'do[pat00,srv00,3]'.'''
+
+    column_names = [None] * matrix_model['column_number']
+
+    for name, variable in matrix_model['variables'].items():
+        for key, column in variable['columns'].items():
+            if type(key) is tuple:
+                column_names[column] = f'{name}[{",".join(str(k) for k in key)}]'
+            else:
+                column_names[column] = f'{name}[{key}]'
+
+    return column_names
+
+
+def write_matrix_model(matrix_model: dict, file_path: Path):
+    '''Funzione che scrive il modello su file. Il formato (MPS o LP) dipende
+    dall'estensione del file.'''
+
+    highs = get_highs_solver(matrix_model)
+
+    for column, column_name in enumerate(get_matrix_column_names(matrix_model)):
+        highs.passColName(column, column_name)
+
+    highs.writeModel(str(file_path))
+
+
+def solve_matrix_model(matrix_model: dict, solver_config: dict, log_file_path: Path):
+    '''Funzione che risolve il modello con HiGHS. Ritorna la coppia (modello
+    risolto, esito), dove il modello risolto contiene gli indici ed i valori
+    delle variabili con gli stessi nomi del modello Pyomo, in modo da poter
+    essere letto dalle funzioni 'get_results_from_*'. Le variabili intere
+    sono arrotondate all'intero più vicino.'''
+
+    import highspy
+
+    highs = get_highs_solver(matrix_model)
+
+    highs.setOptionValue('output_flag', True)
+    highs.setOptionValue('log_to_console', False)
+    highs.setOptionValue('log_file', str(log_file_path))
+    if 'time_limit' in solver_config:
+        highs.setOptionValue('time_limit', float(solver_config['time_limit']))
+    if 'threads' in solver_config:
+        highs.setOptionValue('threads', int(solver_config['threads']))
+
+    # Soluzione iniziale (anche parziale, viene completata da HiGHS)
+    if len(matrix_model['start_columns']) > 0:
+        highs.setSolution(len(matrix_model['start_columns']), np.array(matrix_model['start_columns'], dtype=np.int32), np.array(matrix_model['start_values'], dtype=np.float64))
+
+    solving_start_time = time.perf_counter()
+    highs.run()
+    solving_end_time = time.perf_counter()
+
+    model_status = highs.getModelStatus()
+    highs_info = highs.getInfo()
+
+    # Nomi degli stati uguali a quelli delle condizioni di terminazione di
+    # Pyomo
+    if model_status == highspy.HighsModelStatus.kOptimal:
+        termination_condition = 'optimal'
+    elif model_status == highspy.HighsModelStatus.kTimeLimit:
+        termination_condition = 'maxTimeLimit'
+    elif model_status == highspy.HighsModelStatus.kInfeasible:
+        termination_condition = 'infeasible'
+    else:
+        termination_condition = highs.modelStatusToString(model_status)
+
+    column_values = np.zeros(matrix_model['column_number'], dtype=np.float64)
+    if highs_info.primal_solution_status != 0:
+        column_values = np.array(highs.getSolution().col_value, dtype=np.float64)
+    column_is_integer = np.concatenate(matrix_model['column_is_integer']) if len(matrix_model['column_is_integer']) > 0 else np.zeros(0, dtype=bool)
+    column_values[column_is_integer] = np.round(column_values[column_is_integer])
+
+    solved_model = {}
+    for name, variable in matrix_model['variables'].items():
+        solved_model[f'{name}_index'] = variable['index']
+        solved_model[name] = {key: float(column_values[column]) for key, column in variable['columns'].items()}
+
+    solving_outcome = {
+        'termination_condition': termination_condition,
+        'objective_value': float(highs_info.objective_function_value),
+        'objective_bound': float(highs_info.mip_dual_bound),
+        'time': solving_end_time - solving_start_time
+    }
+
+    return SimpleNamespace(**solved_model), solving_outcome
@@ -1,8 +1,14 @@
 import pyomo.environ as pyo
+import numpy as np
 
+from milp_models.matrix_backend import get_matrix_model, add_matrix_variables, get_matrix_columns
+from milp_models.matrix_backend import add_matrix_constraints, add_matrix_sum_constraints, add_matrix_objective_terms
 
-def get_monolithic_model(instance, additional_info):
-    '''Funzione che ritorna il modello MILP monolitico del problema'''
+
+def get_monolithic_model_indices(instance) -> dict:
+    '''Funzione che ritorna gli indici ordinati del modello monolitico ed i
+    raggruppamenti delle tuple (p, s, d, c, o) usati dai vincoli. Gli indici
+    sono condivisi dal modello Pyomo e da quello matriciale.'''
 
     # Controllo sull'uguaglianza degli operatori per una maggiore efficienza
     # nella scrittura dei vincoli
@@ -23,32 +29,6 @@ def get_monolithic_model(instance, additional_info):
         if not are_all_operators_equal:
             break
     
-    model = pyo.ConcreteModel()
-
-    # INSIEMI ##################################################################
-
-    # Insieme di giorni (casting ad intero)
-    model.days = pyo.Set(initialize=sorted([int(d) for d in instance['days'].keys()]), domain=pyo.NonNegativeIntegers)
-
-    # Tutte le coppie (day, care_unit)
-    model.care_units = pyo.Set(initialize=sorted([(int(d), c) for d, day in instance['days'].items() for c in day.keys()]))
-
-    # Triple (day, care_unit, operator) per ogni operatore presente
-    model.operators = pyo.Set(initialize=sorted([(int(d), c, o)
-        for d, day in instance['days'].items()
-        for c, cu in day.items()
-        for o in cu.keys()]))
-
-    # PARAMETRI ################################################################
-
-    # max_time[d, c] è il massimo tempo di fine degli operatori in d, c
-    @model.Param(model.care_units, domain=pyo.NonNegativeIntegers, mutable=False)
-    def max_time(model, d, c):
-        return max([o['start'] + o['duration'] for o in instance['days'][str(d)][c].values()]) + 1
-
-    # INDICI ###################################################################
-
-
     # Insieme di quadruple (p, s, start, end) per ogni finestra
     window_index = set()
 
@@ -89,26 +69,42 @@ def get_monolithic_model(instance, additional_info):
                 if not are_all_operators_equal:
                     schedulable_tuples_with_operators_and_windows.add((p, s, d, c, o, ws, we))
 
-    for p1, s1, d1, c1, o1 in do_index:
-        for p2, s2, d2, c2, o2 in do_index:
-            
-            # Solo giorni uguali
-            if d1 != d2:
-                continue
-            
-            # Il paziente o l'operatore deve essere lo stesso
-            if p1 != p2 and (o1 != o2 or c1 != c2):
-                continue
+    # Le tuple vengono raggruppate per giorno e, all'interno del giorno, per
+    # paziente e per operatore: i possibili conflitti sono solo fra tuple dello
+    # stesso gruppo
+    assignments_by_patient = {}
+    assignments_by_operator = {}
+    for p, s, d, c, o in do_index:
+        assignments_by_patient.setdefault((d, p), []).append((p, s, c, o))
+        assignments_by_operator.setdefault((d, c, o), []).append((p, s, c, o))
+
+    def add_overlap_pairs(d, assignments, must_be_same_patient):
+        for i in range(len(assignments) - 1):
+            for j in range(i + 1, len(assignments)):
+                
+                p1, s1, c1, o1 = assignments[i]
+                p2, s2, c2, o2 = assignments[j]
 
-            # Non la stessa richiesta
-            if p1 == p2 and s1 == s2:
-                continue
-            
-            # Controllo sulla simmetria
-            if s1 > s2 or (p1 > p2 and s1 == s2) or (o1 >= o2 and p1 == p2 and s1 == s2):
-                continue
+                # Non la stessa richiesta (nel gruppo del paziente) e non lo
+                # stesso paziente (nel gruppo dell'operatore, in quanto coppia
+                # già presente nel gruppo del paziente)
+                if must_be_same_patient and s1 == s2:
+                    continue
+                if not must_be_same_patient and p1 == p2:
+                    continue
 
-            overlap_index.add((p1, s1, p2, s2, d1, c1, o1, c2, o2))
+                # Controllo sulla simmetria: la prima richiesta è quella con
+                # servizio minore o, a parità di servizio, paziente minore
+                if (s1, p1) > (s2, p2):
+                    p1, s1, c1, o1, p2, s2, c2, o2 = p2, s2, c2, o2, p1, s1, c1, o1
+
+                overlap_index.add((p1, s1, p2, s2, d, c1, o1, c2, o2))
+
+    for (d, _), assignments in assignments_by_patient.items():
+        add_overlap_pairs(d, assignments, True)
+    for (d, _, _), assignments in assignments_by_operator.items():
+        add_overlap_pairs(d, assignments, False)
+    del assignments_by_patient, assignments_by_operator
 
     for p, patient in instance['patients'].items():
         for s, windows in patient['requests'].items():
@@ -129,26 +125,100 @@ def get_monolithic_model(instance, additional_info):
                         (we2 >= ws1 and we2 <= we1)):
                         window_overlap_index.add((p, s, ws1, we1, ws2, we2))
 
+    # Per ogni conflitto si considerano solo le finestre delle due richieste
+    # che contengono il giorno del conflitto
+    windows_by_request = {}
+    for p, s, ws, we in window_index:
+        windows_by_request.setdefault((p, s), []).append((ws, we))
+
     for p, s, pp, ss, d, c, o, cc, oo in overlap_index:
-        for ppp, sss, ws, we in window_index:
-            if p != ppp or s != sss or we < d or ws > d:
+        for ws, we in windows_by_request[p, s]:
+            if we < d or ws > d:
                 continue
-            for pppp, ssss, wws, wwe in window_index:
-                if pp != pppp or ss != ssss or wwe < d or wws > d:
+            for wws, wwe in windows_by_request[pp, ss]:
+                if wwe < d or wws > d:
                     continue
                 overlap_constraint_index.add((p, s, pp, ss, d, c, o, cc, oo, ws, we, wws, wwe))
+    del windows_by_request
+
+    do_index = sorted(do_index)
+
+    # Raggruppamenti delle tuple (p, s, d, c, o) nell'ordine di 'do_index',
+    # usati dai vincoli al posto di scorrere tutto l'indice
+    assignments_by_request = {}
+    assignments_by_patient_day = {}
+    requests_by_operator = {}
+    for p, s, d, c, o in do_index:
+        assignments_by_request.setdefault((p, s), []).append((d, c, o))
+        assignments_by_patient_day.setdefault((p, d), []).append((s, c, o))
+        requests_by_operator.setdefault((d, c, o), []).append((p, s))
+
+    indices = {
+        'are_all_operators_equal': are_all_operators_equal,
+        'window_index': sorted(window_index),
+        'do_index': do_index,
+        'overlap_index': sorted(overlap_index),
+        'window_overlap_index': sorted(window_overlap_index),
+        'pat_days_index': sorted(pat_days_index),
+        'overlap_constraint_index': sorted(overlap_constraint_index),
+        'assignments_by_request': assignments_by_request,
+        'assignments_by_patient_day': assignments_by_patient_day,
+        'requests_by_operator': requests_by_operator
+    }
 
-    model.window_index = pyo.Set(initialize=sorted(window_index))
-    model.do_index = pyo.Set(initialize=sorted(do_index))
-    model.overlap_index = pyo.Set(initialize=sorted(overlap_index))
-    model.window_overlap_index = pyo.Set(initialize=sorted(window_overlap_index))
-    model.pat_days_index = pyo.Set(initialize=sorted(pat_days_index))
-    model.overlap_constraint_index = pyo.Set(initialize=sorted(overlap_constraint_index))
-    del window_index, do_index, overlap_index, window_overlap_index, overlap_constraint_index
+    if not are_all_operators_equal:
+        indices['duration_index'] = sorted(schedulable_tuples_with_operators_and_windows)
+
+    return indices
+
+
+def get_monolithic_model(instance, additional_info):
+    '''Funzione che ritorna il modello MILP monolitico del problema'''
+
+    # Gli indici comprendono il controllo sull'uguaglianza degli operatori,
+    # usato per una maggiore efficienza nella scrittura dei vincoli
+    indices = get_monolithic_model_indices(instance)
+    are_all_operators_equal = indices['are_all_operators_equal']
+    
+    model = pyo.ConcreteModel()
+
+    # INSIEMI ##################################################################
+
+    # Insieme di giorni (casting ad intero)
+    model.days = pyo.Set(initialize=sorted([int(d) for d in instance['days'].keys()]), domain=pyo.NonNegativeIntegers)
+
+    # Tutte le coppie (day, care_unit)
+    model.care_units = pyo.Set(initialize=sorted([(int(d), c) for d, day in instance['days'].items() for c in day.keys()]))
+
+    # Triple (day, care_unit, operator) per ogni operatore presente
+    model.operators = pyo.Set(initialize=sorted([(int(d), c, o)
+        for d, day in instance['days'].items()
+        for c, cu in day.items()
+        for o in cu.keys()]))
+
+    # PARAMETRI ################################################################
+
+    # max_time[d, c] è il massimo tempo di fine degli operatori in d, c
+    @model.Param(model.care_units, domain=pyo.NonNegativeIntegers, mutable=False)
+    def max_time(model, d, c):
+        return max([o['start'] + o['duration'] for o in instance['days'][str(d)][c].values()]) + 1
+
+    # INDICI ###################################################################
+
+    model.window_index = pyo.Set(initialize=indices['window_index'])
+    model.do_index = pyo.Set(initialize=indices['do_index'])
+    model.overlap_index = pyo.Set(initialize=indices['overlap_index'])
+    model.window_overlap_index = pyo.Set(initialize=indices['window_overlap_index'])
+    model.pat_days_index = pyo.Set(initialize=indices['pat_days_index'])
+    model.overlap_constraint_index = pyo.Set(initialize=indices['overlap_constraint_index'])
     
     if not are_all_operators_equal:
-        model.duration_index = pyo.Set(initialize=sorted(schedulable_tuples_with_operators_and_windows))
-        del schedulable_tuples_with_operators_and_windows
+        model.duration_index = pyo.Set(initialize=indices['duration_index'])
+
+    assignments_by_request = indices['assignments_by_request']
+    assignments_by_patient_day = indices['assignments_by_patient_day']
+    requests_by_operator = indices['requests_by_operator']
+    del indices
 
     def get_time_bounds(model, p: str, s: str, ws: int, we: int) -> tuple[int, int]:
         '''Ritorna (0, T) dove T è l'ultimo slot temporale utile per svolgere
@@ -193,7 +263,7 @@ def get_monolithic_model(instance, additional_info):
     # alla sua finestra
     @model.Constraint(model.window_index)
     def link_window_to_do_variables(model, p, s, ws, we):
-        return pyo.quicksum([model.do[pp, ss, d, c, o] for pp, ss, d, c, o in model.do_index if p == pp and s == ss and d >= ws and d <= we and c == instance['services'][s]['care_unit']]) == model.window[p, s, ws, we]
+        return pyo.quicksum([model.do[p, s, d, c, o] for d, c, o in assignments_by_request[p, s] if d >= ws and d <= we]) == model.window[p, s, ws, we]
 
     # Modulazione del dominio di 'time' in funzione di un'effettivo servizio
     # svolto: time>0 se e solo se window=1
@@ -248,7 +318,7 @@ def get_monolithic_model(instance, additional_info):
         @model.Constraint(model.pat_days_index)
         def redundant_patient_cut(model, p, d):
             
-            tuples_affected = [(s, c, o) for pp, s, dd, c, o in model.do_index if p == pp and d == dd]
+            tuples_affected = assignments_by_patient_day.get((p, d), [])
             
             if len(tuples_affected) == 0:
                 return pyo.Constraint.Skip
@@ -264,7 +334,7 @@ def get_monolithic_model(instance, additional_info):
         @model.Constraint(model.operators)
         def redundant_operator_cut(model, d, c, o):
             
-            tuples_affected = [(p, s) for p, s, dd, cc, oo in model.do_index if d == dd and cc == c and oo == o]
+            tuples_affected = requests_by_operator.get((d, c, o), [])
             
             if len(tuples_affected) == 0:
                 return pyo.Constraint.Skip
@@ -283,7 +353,7 @@ def get_monolithic_model(instance, additional_info):
         min_ws = min(ws, wws)
         max_we = max(we, wwe)
         
-        tuples_affected = [(p, s, d, c, o) for d in range(min_ws, max_we + 1) for pp, ss, dd, c, o in model.do_index if p == pp and s == ss and d == dd]
+        tuples_affected = [(p, s, d, c, o) for d, c, o in assignments_by_request[p, s] if d >= min_ws and d <= max_we]
 
         if len(tuples_affected) < 2:
             return pyo.Constraint.Skip
@@ -321,6 +391,164 @@ def get_monolithic_model(instance, additional_info):
     return model
 
 
+def get_monolithic_matrix_model(instance, additional_info):
+    '''Funzione che ritorna il modello matriciale monolitico del problema, con
+    la stessa formulazione del modello Pyomo ma costruito direttamente per
+    colonne e righe.'''
+
+    indices = get_monolithic_model_indices(instance)
+    window_index = indices['window_index']
+    do_index = indices['do_index']
+    overlap_index = indices['overlap_index']
+    window_overlap_index = indices['window_overlap_index']
+    pat_days_index = indices['pat_days_index']
+    overlap_constraint_index = indices['overlap_constraint_index']
+
+    # max_time[d, c] è il massimo tempo di fine degli operatori in d, c
+    max_time = {(int(d), c): max([o['start'] + o['duration'] for o in cu.values()]) + 1 for d, day in instance['days'].items() for c, cu in day.items()}
+
+    duration = {s: service['duration'] for s, service in instance['services'].items()}
+    care_unit = {s: service['care_unit'] for s, service in instance['services'].items()}
+
+    model = get_matrix_model()
+
+    # VARIABILI ################################################################
+
+    # L'ultimo slot utile di ogni finestra coincide con il limite superiore di
+    # 'time' del modello Pyomo
+    time_upper_bounds = np.array([max(o['start'] + 1 + o['duration'] for d in range(ws, we + 1) for o in instance['days'][str(d)][care_unit[s]].values()) - duration[s] for _, s, ws, we in window_index], dtype=np.float64)
+
+    add_matrix_variables(model, 'window', window_index, 0, 1, True)
+    add_matrix_variables(model, 'time', window_index, 0, time_upper_bounds, True)
+    add_matrix_variables(model, 'do', do_index, 0, 1, True)
+    add_matrix_variables(model, 'overlap_aux_1', overlap_index, 0, 1, True)
+    add_matrix_variables(model, 'overlap_aux_2', overlap_index, 0, 1, True)
+    add_matrix_variables(model, 'window_overlap', window_overlap_index, 0, 1, True)
+    if 'minimize_hospital_accesses' in additional_info:
+        add_matrix_variables(model, 'pat_use_day', pat_days_index, 0, 1, True)
+
+    window_columns = get_matrix_columns(model, 'window', window_index)
+    time_columns = get_matrix_columns(model, 'time', window_index)
+    do_columns = get_matrix_columns(model, 'do', do_index)
+    do_variable_columns = model['variables']['do']['columns']
+
+    # VINCOLI ##################################################################
+
+    # Se una finestra è soddisfatta, è soddisfatta in un unico giorno interno
+    # alla sua finestra
+    rows = []
+    for p, s, ws, we in window_index:
+        columns = [do_variable_columns[p, s, d, c, o] for d, c, o in indices['assignments_by_request'][p, s] if d >= ws and d <= we]
+        rows.append((columns + [model['variables']['window']['columns'][p, s, ws, we]], [1.0] * len(columns) + [-1.0]))
+    add_matrix_sum_constraints(model, rows, 0.0, 0.0)
+
+    # Modulazione del dominio di 'time' in funzione di un'effettivo servizio
+    # svolto: time>0 se e solo se window=1
+    if indices['are_all_operators_equal']:
+        window_max_times = np.array([max_time[ws, care_unit[s]] - duration[s] for _, s, ws, _ in window_index], dtype=np.float64)
+        add_matrix_constraints(model, [(time_columns, 1.0), (window_columns, -window_max_times)], -np.inf, 0.0)
+        add_matrix_constraints(model, [(window_columns, 1.0), (time_columns, -1.0)], -np.inf, 0.0)
+
+    else:
+        duration_index = indices['duration_index']
+        duration_do_columns = get_matrix_columns(model, 'do', [(p, s, d, c, o) for p, s, d, c, o, _, _ in duration_index])
+        duration_time_columns = get_matrix_columns(model, 'time', [(p, s, ws, we) for p, s, _, _, _, ws, we in duration_index])
+        operator_starts = np.array([instance['days'][str(d)][c][o]['start'] for _, _, d, c, o, _, _ in duration_index], dtype=np.float64)
+        operator_durations = np.array([instance['days'][str(d)][c][o]['duration'] for _, _, d, c, o, _, _ in duration_index], dtype=np.float64)
+        service_durations = np.array([duration[s] for _, s, _, _, _, _, _ in duration_index], dtype=np.float64)
+        duration_max_times = np.array([max_time[d, c] for _, _, d, c, _, _, _ in duration_index], dtype=np.float64)
+
+        add_matrix_constraints(model, [(duration_time_columns, 1.0), (duration_do_columns, duration_max_times)], -np.inf, operator_starts + 1 + operator_durations - service_durations + duration_max_times)
+        add_matrix_constraints(model, [(duration_do_columns, operator_starts), (duration_time_columns, -1.0)], -np.inf, -1.0)
+
+    # Disguinzione dei servizi dello stesso paziente o operatore
+    first_time_columns = get_matrix_columns(model, 'time', [(p, s, ws, we) for p, s, _, _, _, _, _, _, _, ws, we, _, _ in overlap_constraint_index])
+    second_time_columns = get_matrix_columns(model, 'time', [(pp, ss, wws, wwe) for _, _, pp, ss, _, _, _, _, _, _, _, wws, wwe in overlap_constraint_index])
+    first_do_columns = get_matrix_columns(model, 'do', [(p, s, d, c, o) for p, s, _, _, d, c, o, _, _, _, _, _, _ in overlap_constraint_index])
+    second_do_columns = get_matrix_columns(model, 'do', [(pp, ss, d, cc, oo) for _, _, pp, ss, d, _, _, cc, oo, _, _, _, _ in overlap_constraint_index])
+    overlap_aux_keys = [(p, s, pp, ss, d, c, o, cc, oo) for p, s, pp, ss, d, c, o, cc, oo, _, _, _, _ in overlap_constraint_index]
+    first_durations = np.array([duration[s] for _, s, _, _, _, _, _, _, _, _, _, _, _ in overlap_constraint_index], dtype=np.float64)
+    second_durations = np.array([duration[ss] for _, _, _, ss, _, _, _, _, _, _, _, _, _ in overlap_constraint_index], dtype=np.float64)
+    first_max_times = np.array([max_time[d, c] for _, _, _, _, d, c, _, _, _, _, _, _, _ in overlap_constraint_index], dtype=np.float64)
+    second_max_times = np.array([max_time[d, cc] for _, _, _, _, d, _, _, cc, _, _, _, _, _ in overlap_constraint_index], dtype=np.float64)
+
+    add_matrix_constraints(model, [
+        (first_time_columns, 1.0), (first_do_columns, first_durations),
+        (second_time_columns, -1.0), (get_matrix_columns(model, 'overlap_aux_1', overlap_aux_keys), first_max_times)
+    ], -np.inf, first_max_times)
+    add_matrix_constraints(model, [
+        (second_time_columns, 1.0), (second_do_columns, second_durations),
+        (first_time_columns, -1.0), (get_matrix_columns(model, 'overlap_aux_2', overlap_aux_keys), second_max_times)
+    ], -np.inf, second_max_times)
+    del overlap_aux_keys
+
+    # Vincoli ausilari che regolano le variabili 'overlap_aux'
+    first_do_columns = get_matrix_columns(model, 'do', [(p, s, d, c, o) for p, s, _, _, d, c, o, _, _ in overlap_index])
+    second_do_columns = get_matrix_columns(model, 'do', [(pp, ss, d, cc, oo) for _, _, pp, ss, d, _, _, cc, oo in overlap_index])
+    overlap_aux_1_columns = get_matrix_columns(model, 'overlap_aux_1', overlap_index)
+    overlap_aux_2_columns = get_matrix_columns(model, 'overlap_aux_2', overlap_index)
+
+    add_matrix_constraints(model, [(first_do_columns, 1.0), (second_do_columns, 1.0), (overlap_aux_1_columns, -1.0), (overlap_aux_2_columns, -1.0)], -np.inf, 1.0)
+    add_matrix_constraints(model, [(overlap_aux_1_columns, 1.0), (overlap_aux_2_columns, 1.0), (first_do_columns, -1.0)], -np.inf, 0.0)
+    add_matrix_constraints(model, [(overlap_aux_1_columns, 1.0), (overlap_aux_2_columns, 1.0), (second_do_columns, -1.0)], -np.inf, 0.0)
+
+    # Non è possibile inserire richieste dello stesso paziente la cui durata
+    # totale eccede gli slot temporali di quel giorno nelle unità di cura
+    # toccate
+    if 'use_redundant_patient_cut' in additional_info:
+        rows = []
+        upper_bounds = []
+        for p, d in pat_days_index:
+            tuples_affected = indices['assignments_by_patient_day'].get((p, d), [])
+            if len(tuples_affected) == 0:
+                continue
+            rows.append(([do_variable_columns[p, s, d, c, o] for s, c, o in tuples_affected], [duration[s] for s, _, _ in tuples_affected]))
+            upper_bounds.append(max(max_time[d, c] for _, c, _ in tuples_affected))
+        add_matrix_sum_constraints(model, rows, -np.inf, upper_bounds)
+
+    # Non è possibile inserire richieste dello stesso operatore la cui durata
+    # totale eccede i suoi slot temporali
+    if 'use_redundant_operator_cut' in additional_info:
+        rows = []
+        upper_bounds = []
+        for d, c, o in sorted([(int(d), c, o) for d, day in instance['days'].items() for c, cu in day.items() for o in cu.keys()]):
+            tuples_affected = indices['requests_by_operator'].get((d, c, o), [])
+            operator_duration = instance['days'][str(d)][c][o]['duration']
+            if len(tuples_affected) == 0 or sum(duration[s] for _, s in tuples_affected) <= operator_duration:
+                continue
+            rows.append(([do_variable_columns[p, s, d, c, o] for p, s in tuples_affected], [duration[s] for _, s in tuples_affected]))
+            upper_bounds.append(operator_duration)
+        add_matrix_sum_constraints(model, rows, -np.inf, upper_bounds)
+
+    # Vincolo che lega le variabili 'window_overlap' alle variabili 'do'
+    rows = []
+    for p, s, ws, we, wws, wwe in window_overlap_index:
+        min_ws = min(ws, wws)
+        max_we = max(we, wwe)
+        columns = [do_variable_columns[p, s, d, c, o] for d, c, o in indices['assignments_by_request'][p, s] if d >= min_ws and d <= max_we]
+        if len(columns) < 2:
+            continue
+        rows.append((columns + [model['variables']['window_overlap']['columns'][p, s, ws, we, wws, wwe]], [1.0] * len(columns) + [-1.0]))
+    add_matrix_sum_constraints(model, rows, -np.inf, 1.0)
+
+    # Vincolo che forza 'pat_use_day' ad 1 se è presente almeno una richiesta
+    # del paziente in quel giorno
+    if 'minimize_hospital_accesses' in additional_info:
+        add_matrix_constraints(model, [
+            (do_columns, 1.0),
+            (get_matrix_columns(model, 'pat_use_day', [(p, d) for p, _, d, _, _ in do_index]), -1.0)
+        ], -np.inf, 0.0)
+
+    # FUNZIONE OBIETTIVO #######################################################
+
+    add_matrix_objective_terms(model, do_columns, [duration[s] * instance['patients'][p]['priority'] for p, s, _, _, _ in do_index])
+    add_matrix_objective_terms(model, get_matrix_columns(model, 'window_overlap', window_overlap_index), -1e6)
+    if 'minimize_hospital_accesses' in additional_info:
+        add_matrix_objective_terms(model, get_matrix_columns(model, 'pat_use_day', pat_days_index), -1.0 / len(pat_days_index))
+
+    return model
+
+
 def get_results_from_monolithic_model(model):
     '''Funzione che ritorna i risultati (inseriti e rigettati) contenuti nel
     modello monolitico risolto.'''
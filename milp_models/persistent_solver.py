@@ -0,0 +1,57 @@
+import time
+from pyomo.common.timing import HierarchicalTimer
+from pyomo.contrib.appsi.solvers import Gurobi, Highs
+
+
+# Solver che mantengono il modello in memoria fra una risoluzione e l'altra
+PERSISTENT_SOLVER_NAMES = ['appsi_gurobi', 'appsi_highs']
+
+
+def get_persistent_solver(solver_config: dict):
+    '''Funzione che crea un solver persistente con le opzioni della
+    configurazione. Il modello viene inviato al solver solo alla prima
+    risoluzione, mentre nelle successive vengono trasmessi solamente i vincoli
+    aggiunti o disattivati nel frattempo.'''
+
+    if solver_config['solver'] == 'appsi_gurobi':
+        opt = Gurobi()
+        if 'max_memory' in solver_config:
+            opt.gurobi_options['SoftMemLimit'] = solver_config['max_memory']
+    elif solver_config['solver'] == 'appsi_highs':
+        opt = Highs()
+
+    if 'time_limit' in solver_config:
+        opt.config.time_limit = solver_config['time_limit']
+
+    # La soluzione viene caricata solo se esiste (vedi
+    # 'solve_with_persistent_solver')
+    opt.config.load_solution = False
+
+    return opt
+
+
+def solve_with_persistent_solver(opt, model, log_file_path, warm_start: bool):
+    '''Funzione che aggiorna il modello nel solver persistente e lo risolve.
+    Ritorna la tripla (risultati, tempo di aggiornamento, tempo di
+    risoluzione), dove il primo tempo comprende la trasmissione del modello o
+    delle sue modifiche al solver. Se il solver si ferma al limite di tempo
+    senza una soluzione ammissibile le variabili non vengono modificate e
+    'best_feasible_objective' dei risultati è None.'''
+
+    opt.config.logfile = str(log_file_path)
+    opt.config.warmstart = warm_start
+
+    timer = HierarchicalTimer()
+
+    solving_start_time = time.perf_counter()
+    results = opt.solve(model, timer=timer)
+    if results.best_feasible_objective is not None:
+        results.solution_loader.load_vars()
+    solving_end_time = time.perf_counter()
+
+    update_time = 0.0
+    for timer_name in ['set_instance', 'update']:
+        if timer_name in timer.get_timers():
+            update_time += timer.get_total_time(timer_name)
+
+    return results, update_time, solving_end_time - solving_start_time - update_time
@@ -1,9 +1,13 @@
+import bisect
 import pyomo.environ as pyo
 
 
-def get_sol_perm_model(master_instance, prev_solution_matrix: dict[tuple[str, str], list[tuple[int, int]]]):
-    '''Funzione che ritorna il modello MILP del problema master senza
-    assegnazione dell'operatore.'''
+def get_sol_perm_model(master_instance):
+    '''Funzione che ritorna il modello MILP della ricerca di permutazioni
+    delle soluzioni dei sottoproblemi, inizialmente senza colonne. Le colonne
+    (soluzioni di un giorno in una certa iterazione) vengono aggiunte con
+    'add_sol_perm_column' man mano che i sottoproblemi vengono risolti, senza
+    ricostruire il modello.'''
 
     model = pyo.ConcreteModel()
 
@@ -15,34 +19,12 @@ def get_sol_perm_model(master_instance, prev_solution_matrix: dict[tuple[str, st
         day_indexes.add(int(day_name))
     model.days = pyo.Set(initialize=sorted(day_indexes))
 
-    # (day, iteration)
-    do_index = set()
+    # (day, iteration), popolato con le colonne
+    model.do_index = pyo.Set(dimen=2, ordered=True)
 
-    for day_iter_list in prev_solution_matrix.values():
-        do_index.update(day_iter_list)
-    model.do_index = pyo.Set(initialize=sorted(do_index))
-
-    # (patient, service, window_start, window_end)
-    sat_index = set()
-
-    # Ogni coppia (p, s) viene inserita assieme a tutte le finestre di p che
-    # includono almeno un qualche giorno nella matrice
-    for pat_srv, day_iters in prev_solution_matrix.items():
-        
-        patient_name = pat_srv[0]
-        service_name = pat_srv[1]
-        
-        # Giorni in cui è presente almeno una soluzione nella matrice
-        day_indexes = [day_index for day_index, _ in day_iters]
-        
-        # Aggiungi tutte le finestre del paziente che intersecano un qualche
-        # giorno in cui è presente una soluzione nella matrice
-        for window in master_instance['patients'][patient_name]['requests'][service_name]:
-            for day_index in range(window[0], window[1] + 1):
-                if day_index in day_indexes:
-                    sat_index.add((patient_name, service_name, window[0], window[1]))
-
-    model.sat_index = pyo.Set(initialize=sorted(sat_index))
+    # (patient, service, window_start, window_end), popolato con le finestre
+    # che includono almeno un giorno di una colonna contenente (p, s)
+    model.sat_index = pyo.Set(dimen=4, ordered=True)
 
     # VARIABILI ################################################################
 
@@ -57,26 +39,111 @@ def get_sol_perm_model(master_instance, prev_solution_matrix: dict[tuple[str, st
 
     # Se una richesta è soddisfatta, è soddisfatta al minimo da un giorno nella
     # sua finestra in una qualche iterazione
-    @model.Constraint(model.sat_index)
-    def link_do_to_sat(model, p, s, ws, we):
-        return pyo.quicksum(model.do[d, i] for d, i in prev_solution_matrix[p, s] if d >= ws and d <= we) >= model.sat[p, s, ws, we]
+    model.link_do_to_sat = pyo.Constraint(model.sat_index)
 
-    # Vincolo che obbliga ogni giorno a scegliere solo un'iterazione
-    @model.Constraint(model.days)
-    def max_one_iteration_per_day(model, d):
-        return pyo.quicksum(model.do[d, i] for dd, i in model.do_index if d == dd) == 1
+    # Vincolo che obbliga ogni giorno a scegliere solo un'iterazione (presente
+    # solo per i giorni con almeno una colonna)
+    model.max_one_iteration_per_day = pyo.Constraint(model.days)
 
     # FUNZIONE OBIETTIVO #######################################################
 
     # Massimizza il numero di richieste soddisfatte, pesate per la loro durata e
     # priorità del paziente
-    @model.Objective(sense=pyo.maximize)
-    def objective_function(model):
-        return pyo.quicksum(model.sat[p, s, ws, we] * master_instance['patients'][p]['priority'] * master_instance['services'][s]['duration'] for p, s, ws, we in model.sat_index)
+    model.objective_function = pyo.Objective(expr=0, sense=pyo.maximize)
 
     return model
 
 
+def get_sol_perm_columns() -> dict:
+    '''Funzione che ritorna l'archivio vuoto delle colonne del modello di
+    permutazione: l'iterazione di ogni soluzione vista, indicizzata da giorno
+    ed insieme delle coppie (p, s) schedulate, e per le sole colonne attive le
+    coppie (p, s) di ogni giorno ed iterazione e le colonne (day, iteration)
+    che contengono ogni coppia (p, s).'''
+
+    return {
+        'iteration_by_column': {},
+        'requests_by_day': {},
+        'columns_by_request': {}
+    }
+
+
+def add_sol_perm_column(model, sol_perm_columns: dict, master_instance, day_index: int, iteration_index: int, scheduled_requests) -> bool:
+    '''Funzione che aggiunge al modello di permutazione la soluzione di un
+    giorno in una iterazione, come insieme di coppie (p, s) schedulate. Una
+    soluzione contenuta in una colonna già presente dello stesso giorno non
+    viene aggiunta, mentre le colonne contenute in quella nuova vengono
+    eliminate (la variabile viene fissata a 0). Vengono aggiornati solo i
+    vincoli coinvolti e la soluzione di partenza rimane ammissibile. Ritorna
+    True se la colonna è stata aggiunta.'''
+
+    scheduled_requests = frozenset(scheduled_requests)
+
+    # Soluzione identica ad una già vista
+    if (day_index, scheduled_requests) in sol_perm_columns['iteration_by_column']:
+        return False
+    sol_perm_columns['iteration_by_column'][day_index, scheduled_requests] = iteration_index
+
+    if day_index not in sol_perm_columns['requests_by_day']:
+        sol_perm_columns['requests_by_day'][day_index] = {}
+    day_columns = sol_perm_columns['requests_by_day'][day_index]
+
+    # Colonna dominata da una soluzione già presente
+    if any(scheduled_requests <= other_requests for other_requests in day_columns.values()):
+        return False
+
+    # Vincoli di collegamento da aggiornare
+    changed_sat_indexes = set()
+
+    # La nuova colonna è scelta nella soluzione di partenza se il giorno non
+    # ne aveva o se sostituisce quella scelta
+    is_chosen = len(day_columns) == 0
+
+    for other_iteration_index, other_requests in list(day_columns.items()):
+        if other_requests < scheduled_requests:
+            
+            if model.do[day_index, other_iteration_index].value is not None and model.do[day_index, other_iteration_index].value > 0.5:
+                is_chosen = True
+            model.do[day_index, other_iteration_index].fix(0)
+            
+            del day_columns[other_iteration_index]
+            for patient_name, service_name in other_requests:
+                sol_perm_columns['columns_by_request'][patient_name, service_name].remove((day_index, other_iteration_index))
+                changed_sat_indexes.update((patient_name, service_name, window[0], window[1]) for window in master_instance['patients'][patient_name]['requests'][service_name] if window[0] <= day_index <= window[1])
+
+    day_columns[iteration_index] = scheduled_requests
+    model.do_index.add((day_index, iteration_index))
+    model.do[day_index, iteration_index].value = 1 if is_chosen else 0
+
+    # Finestre aggiunte al modello, i cui termini vanno aggiunti all'obiettivo
+    new_sat_indexes = []
+
+    for patient_name, service_name in sorted(scheduled_requests):
+
+        if (patient_name, service_name) not in sol_perm_columns['columns_by_request']:
+            sol_perm_columns['columns_by_request'][patient_name, service_name] = set()
+        sol_perm_columns['columns_by_request'][patient_name, service_name].add((day_index, iteration_index))
+
+        for window in master_instance['patients'][patient_name]['requests'][service_name]:
+            if window[0] <= day_index <= window[1]:
+                sat_index = (patient_name, service_name, window[0], window[1])
+                if sat_index not in model.sat_index:
+                    model.sat_index.add(sat_index)
+                    model.sat[sat_index].value = 0
+                    new_sat_indexes.append(sat_index)
+                changed_sat_indexes.add(sat_index)
+
+    for p, s, ws, we in sorted(changed_sat_indexes):
+        model.link_do_to_sat[p, s, ws, we] = pyo.quicksum(model.do[d, i] for d, i in sorted(sol_perm_columns['columns_by_request'][p, s]) if d >= ws and d <= we) >= model.sat[p, s, ws, we]
+
+    model.max_one_iteration_per_day[day_index] = pyo.quicksum(model.do[day_index, i] for i in sorted(day_columns.keys())) == 1
+
+    if len(new_sat_indexes) > 0:
+        model.objective_function.expr += pyo.quicksum(model.sat[p, s, ws, we] * master_instance['patients'][p]['priority'] * master_instance['services'][s]['duration'] for p, s, ws, we in new_sat_indexes)
+
+    return True
+
+
 def get_results_from_sol_perm_model(model):
     '''Funzione che ritorna un elenco di iterazioni in cui trovare la
     combinazione di soluzioni dei sottoprobemi atta a coprire le richieste del
@@ -97,26 +164,56 @@ def get_fixed_final_results(master_instance, all_subproblem_results):
     '''Funzione che elabora la soluzione finale aggregata e rimuove le eventuali
     richieste doppie all'interno della stessa finestra.'''
 
+    # Indice delle richieste schedulate: per ogni coppia (paziente, servizio)
+    # la prima occorrenza in ogni giorno
+    scheduled_requests_by_day = {}
+    for day_name, day_results in all_subproblem_results.items():
+        day_index = int(day_name)
+        for scheduled_request in day_results['scheduled']:
+            patient_service = (scheduled_request['patient'], scheduled_request['service'])
+            if patient_service not in scheduled_requests_by_day:
+                scheduled_requests_by_day[patient_service] = {}
+            if day_index not in scheduled_requests_by_day[patient_service]:
+                scheduled_requests_by_day[patient_service][day_index] = scheduled_request
+    
+    # Giorni ordinati in cui è schedulata ogni coppia (paziente, servizio)
+    scheduled_days = {patient_service: sorted(day_requests.keys()) for patient_service, day_requests in scheduled_requests_by_day.items()}
+
     satisfied_requests = set()
     rejected_requests = set()
 
     for patient_name, patient in master_instance['patients'].items():
         for service_name, windows in patient['requests'].items():
-            for window in windows:
-
-                is_request_satisfied = False
-                
-                # Cerca la prima occorrenza delle richieste soddisfatte
-                for day_index in range(window[0], window[1] + 1):
-                    for scheduled_request in all_subproblem_results[str(day_index)]['scheduled']:
-                        if scheduled_request['patient'] == patient_name and scheduled_request['service'] == service_name:
-                            satisfied_requests.add((patient_name, service_name, day_index, scheduled_request['care_unit'], scheduled_request['operator'], scheduled_request['time']))
-                            is_request_satisfied = True
-                            break
+            
+            patient_service = (patient_name, service_name)
+            days = scheduled_days.get(patient_service, [])
+            
+            # I giorni vengono considerati in ordine ed ognuno soddisfa tutte
+            # le finestre ancora aperte che lo contengono, come nel controllo
+            # dei risultati finali: con finestre sovrapposte i giorni successivi
+            # che non ricadono in una finestra aperta sono doppi e vengono
+            # scartati
+            open_windows = list(windows)
+            while len(open_windows) > 0:
+
+                # Primo giorno schedulato in una delle finestre aperte
+                first_day_index = None
+                for window in open_windows:
+                    day_position = bisect.bisect_left(days, window[0])
+                    if day_position < len(days) and days[day_position] <= window[1]:
+                        if first_day_index is None or days[day_position] < first_day_index:
+                            first_day_index = days[day_position]
+                if first_day_index is None:
+                    break
+
+                scheduled_request = scheduled_requests_by_day[patient_service][first_day_index]
+                satisfied_requests.add((patient_name, service_name, first_day_index, scheduled_request['care_unit'], scheduled_request['operator'], scheduled_request['time']))
+
+                open_windows = [window for window in open_windows if window[0] > first_day_index or window[1] < first_day_index]
                 
-                # Se la richiesta non esiste nei risultati allora è rigettata
-                if not is_request_satisfied:
-                    rejected_requests.add((patient_name, service_name, window[0], window[1]))
+            # Le finestre rimaste aperte sono rigettate
+            for window in open_windows:
+                rejected_requests.add((patient_name, service_name, window[0], window[1]))
 
     final_results = {
         'scheduled': {},
@@ -137,7 +234,7 @@ def get_fixed_final_results(master_instance, all_subproblem_results):
             'operator': request[4],
             'time': request[5]
         })
-    final_results['scheduled'] = dict(sorted((d, s) for d, s in final_results['scheduled'].items()))
+    final_results['scheduled'] = dict(sorted(final_results['scheduled'].items(), key=lambda t: int(t[0])))
     for satisfied_requests in final_results['scheduled'].values():
         satisfied_requests.sort(key=lambda t: (t['patient'], t['service'], t['care_unit'], t['operator'], t['time']))
 
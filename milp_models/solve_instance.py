@@ -1,8 +1,15 @@
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import copy
+import math
+import shutil
 import json
 import time
 import yaml
 import pyomo.environ as pyo
+from pyomo.contrib.appsi.base import TerminationCondition
 
 from checkers.master_instance_checker import check_master_instance
 from checkers.master_results_checker import check_master_results
@@ -14,13 +21,23 @@ from milp_models.master_model import get_fat_master_model, get_results_from_fat_
 from milp_models.master_model import get_slim_master_model, get_results_from_slim_master_model
 from milp_models.subproblem_model import get_fat_subproblem_model, get_results_from_fat_subproblem_model
 from milp_models.subproblem_model import get_slim_subproblem_model, get_results_from_slim_subproblem_model
+from milp_models.subproblem_model import get_fat_subproblem_matrix_model, get_slim_subproblem_matrix_model
 from milp_models.master_model import add_optimality_constraints
-from milp_models.sol_perm_model import get_sol_perm_model, get_results_from_sol_perm_model, get_fixed_final_results
-
-from cores.compute_cores import compute_generalist_cores, compute_basic_cores, compute_reduced_cores, aggregate_and_remove_duplicate_cores
-from cores.compute_cores import add_cores_constraint_class_to_master_model, add_cores_constraints_to_master_model
+from milp_models.sol_perm_model import get_sol_perm_model, get_sol_perm_columns, add_sol_perm_column, get_results_from_sol_perm_model, get_fixed_final_results
+
+from milp_models.subproblem_cache import get_subproblem_instance_hash, get_subproblem_cache_key
+from milp_models.subproblem_cache import load_subproblem_from_cache, store_subproblem_to_cache, evict_subproblem_cache
+from milp_models.persistent_solver import PERSISTENT_SOLVER_NAMES, get_persistent_solver, solve_with_persistent_solver
+from milp_models.matrix_backend import solve_matrix_model, add_matrix_objective_lower_bound, set_matrix_start_values
+from milp_models.feasibility_knowledge import add_fully_scheduled_day, find_feasibility_witness, get_subproblem_results_objective_value, get_closed_subproblem_solver_info
+from milp_models.subproblem_heuristic import get_subproblem_heuristic_results, get_subproblem_start_values
+
+from cores.compute_cores import compute_generalist_cores, compute_basic_cores, compute_reduced_cores, aggregate_and_remove_duplicate_cores, get_core_store
+from cores.compute_cores import add_cores_constraint_class_to_master_model, add_cores_constraints_to_master_model, get_cores_constraints_info
+from cores.minimize_cores import minimize_cores, enumerate_disjoint_cores
+from cores.core_cut_pool import get_core_cut_pool, add_cores_constraints_to_cut_pool, reactivate_violated_core_cuts, age_core_cuts
 from cores.expand_core_days import compute_expanded_days, expand_core_days, remove_core_days_without_exact_requests
-from cores.expand_core_patients_services import get_max_possible_master_requests, expand_core_patients_services
+from cores.expand_core_patients_services import get_max_possible_master_requests, get_master_request_availability, expand_core_patients_services
 
 
 def get_subproblem_results_value(master_instance, master_results, day_name):
@@ -78,15 +95,19 @@ def compute_subproblem_instance_from_master(master_instance, master_results, day
 
 
 def compose_final_results(master_instance, master_results, all_subproblem_results):
+    '''Funzione che unisce le schedulazioni dei sottoproblemi con le finestre
+    rigettate dal master e con quelle che contengono le richieste rigettate
+    dai sottoproblemi. Le finestre rigettate sono uniche e ordinate.'''
 
     all_scheduled_results = {}
     for day_name, subproblem_results in all_subproblem_results.items():
         all_scheduled_results[day_name] = subproblem_results['scheduled']
-    
-    final_results = {
-        'scheduled': all_scheduled_results,
-        'rejected': master_results['rejected']
-    }
+
+    # Insieme delle finestre rigettate come terne (paziente, servizio, inizio,
+    # fine), senza duplicati
+    rejected_windows = set()
+    for rejected_request in master_results['rejected']:
+        rejected_windows.add((rejected_request['patient'], rejected_request['service'], rejected_request['window'][0], rejected_request['window'][1]))
 
     for day_name, subproblem_results in all_subproblem_results.items():
         day_index = int(day_name)
@@ -95,45 +116,28 @@ def compose_final_results(master_instance, master_results, all_subproblem_result
             patient_name = rejected_request['patient']
             service_name = rejected_request['service']
 
-            windows_containing_rejected_request = []
             for window in master_instance['patients'][patient_name]['requests'][service_name]:
                 if window[0] <= day_index and window[1] >= day_index:
-                    windows_containing_rejected_request.append([window[0], window[1]])
-
-            for window in windows_containing_rejected_request:
-                final_results['rejected'].append({
-                    'patient': patient_name,
-                    'service': service_name,
-                    'window': [window[0], window[1]]
-                })
-
-    unique_rejected = []
-    for rejected_1 in final_results['rejected']:
-        already_present = False
-        for rejected_2 in unique_rejected:
-            if rejected_1['patient'] == rejected_2['patient'] and rejected_1['service'] == rejected_2['service'] and rejected_1['window'][0] == rejected_2['window'][0] and rejected_1['window'][1] == rejected_2['window'][1]:
-                already_present = True
-                break
-        if not already_present:
-            unique_rejected.append(rejected_1)
-    final_results['rejected'] = sorted(unique_rejected, key=lambda r: (r['patient'], r['service'], r['window'][0], r['window'][1]))
+                    rejected_windows.add((patient_name, service_name, window[0], window[1]))
 
-    return final_results
+    final_results = {
+        'scheduled': all_scheduled_results,
+        'rejected': [{
+            'patient': patient_name,
+            'service': service_name,
+            'window': [window_start, window_end]
+        } for patient_name, service_name, window_start, window_end in sorted(rejected_windows)]
+    }
 
+    return final_results
 
-def get_solver_info(model_results, model_name, log_file_path):
 
-    solution = model_results.solution[0]
-    lower_bound = float(model_results['problem'][0]['Lower bound'])
-    upper_bound = float(model_results['problem'][0]['Upper bound'])
-    gap = float(solution['gap'])
-    if gap <= 1e-5 and lower_bound != upper_bound:
-        gap = (upper_bound - lower_bound) / upper_bound
-    objective_value = float(solution['objective']['objective_function']['Value'])
+def get_solver_log_info(log_file_path):
+    '''Funzione che ritorna le informazioni ricavabili dal file di log del
+    solver (nodi esplorati, rilassamento alla radice, dimensioni del modello).'''
 
     solver_info = {}
 
-    # Parsing del file di log
     with open(log_file_path, 'r') as file:
         last_h_line = None
         for line in file.readlines():
@@ -162,6 +166,22 @@ def get_solver_info(model_results, model_name, log_file_path):
             tokens = last_h_line.split('%')
             solver_info['best_sol_time'] = float(tokens[1].split()[-1][:-1])
 
+    return solver_info
+
+
+def get_solver_info(model_results, model_name, log_file_path):
+
+    solution = model_results.solution[0]
+    lower_bound = float(model_results['problem'][0]['Lower bound'])
+    upper_bound = float(model_results['problem'][0]['Upper bound'])
+    gap = float(solution['gap'])
+    if gap <= 1e-5 and lower_bound != upper_bound:
+        gap = (upper_bound - lower_bound) / upper_bound
+    objective_value = float(solution['objective']['objective_function']['Value'])
+
+    # Parsing del file di log
+    solver_info = get_solver_log_info(log_file_path)
+
     solver_info['objective_function_value'] = objective_value,
     solver_info['solver_status'] = str(model_results.solver.status),
     solver_info['status'] = str(model_results.solver.termination_condition),
@@ -202,6 +222,340 @@ def get_solver_info(model_results, model_name, log_file_path):
     return solver_info 
 
 
+def get_bounds_solver_info(lower_bound: float, upper_bound: float, solver_status: str, status: str, solving_time: float, model_name, log_file_path):
+    '''Funzione che ritorna le stesse informazioni di 'get_solver_info' a
+    partire dai limiti della soluzione, per i solver i cui risultati non sono
+    nel formato di Pyomo. Il problema è sempre di massimizzazione.'''
+
+    gap_ratio = 0.0
+    if math.isinf(lower_bound) or math.isinf(upper_bound):
+        gap_ratio = math.inf
+    elif lower_bound != upper_bound:
+        gap_ratio = (upper_bound - lower_bound) / upper_bound
+
+    # Parsing del file di log
+    solver_info = get_solver_log_info(log_file_path)
+
+    solver_info['objective_function_value'] = lower_bound
+    solver_info['solver_status'] = solver_status
+    solver_info['status'] = status
+    solver_info['time'] = float(solving_time)
+    solver_info['gap_ratio'] = gap_ratio
+    solver_info['lower_bound'] = lower_bound
+    solver_info['upper_bound'] = upper_bound if upper_bound <= 1e9 else 'infinity'
+    solver_info['gap'] = upper_bound - lower_bound
+    solver_info['model'] = model_name
+
+    if 'root_relax' not in solver_info or solver_info['root_relax'] == 'cutoff':
+        solver_info['root_relax'] = solver_info['objective_function_value']
+    
+    if 'best_sol_time' not in solver_info:
+        solver_info['best_sol_time'] = -1
+
+    # Con un limite di tempo la soluzione trovata può avere valore nullo o
+    # non esistere
+    if math.isinf(lower_bound):
+        solver_info['best_obj_ratio_root_relax'] = 0.0
+    elif solver_info['root_relax'] != 0:
+        solver_info['best_obj_ratio_root_relax'] = solver_info['lower_bound'] / solver_info['root_relax']
+    else:
+        solver_info['best_obj_ratio_root_relax'] = 1.0
+
+    return solver_info
+
+
+def get_persistent_solver_info(model_results, model_name, log_file_path, solving_time):
+    '''Funzione analoga a 'get_solver_info' per i risultati dei solver
+    persistenti, che non contengono la soluzione né il tempo di risoluzione.
+    Se il solver non ha trovato una soluzione ammissibile (ad esempio al
+    limite di tempo) il limite inferiore è -infinito, come nei risultati di
+    Pyomo.'''
+
+    solver_status = 'ok' if model_results.termination_condition == TerminationCondition.optimal else 'aborted'
+
+    lower_bound = -math.inf
+    if model_results.best_feasible_objective is not None:
+        lower_bound = float(model_results.best_feasible_objective)
+    upper_bound = math.inf
+    if model_results.best_objective_bound is not None:
+        upper_bound = float(model_results.best_objective_bound)
+
+    return get_bounds_solver_info(lower_bound, upper_bound, solver_status,
+                                  model_results.termination_condition.name, solving_time, model_name, log_file_path)
+
+
+def get_matrix_solver_info(solving_outcome: dict, model_name, log_file_path):
+    '''Funzione analoga a 'get_solver_info' per l'esito di un modello del
+    backend matriciale.'''
+
+    solver_status = 'ok' if solving_outcome['termination_condition'] == 'optimal' else 'aborted'
+
+    return get_bounds_solver_info(solving_outcome['objective_value'], solving_outcome['objective_bound'], solver_status,
+                                  solving_outcome['termination_condition'], solving_outcome['time'], model_name, log_file_path)
+
+
+def set_subproblem_start_values(subproblem_model, subproblem_results, use_matrix_backend: bool) -> bool:
+    '''Funzione che imposta come soluzione iniziale del modello del
+    sottoproblema (Pyomo o matriciale) quella descritta dai risultati. Se un
+    valore è fuori dai limiti della sua variabile la soluzione non viene
+    impostata e la funzione ritorna False.'''
+
+    if use_matrix_backend:
+        variable_indices = {name: variable['index'] for name, variable in subproblem_model['variables'].items()}
+    else:
+        variable_indices = {variable.local_name: list(variable.keys()) for variable in subproblem_model.component_objects(pyo.Var)}
+
+    start_values = get_subproblem_start_values(subproblem_results, variable_indices)
+
+    if use_matrix_backend:
+        return set_matrix_start_values(subproblem_model, start_values)
+
+    for name, values in start_values.items():
+        variable = getattr(subproblem_model, name)
+        for key, value in values.items():
+            if (variable[key].lb is not None and value < variable[key].lb) or (variable[key].ub is not None and value > variable[key].ub):
+                return False
+
+    for name, values in start_values.items():
+        variable = getattr(subproblem_model, name)
+        for key, value in values.items():
+            variable[key].set_value(value)
+
+    return True
+
+
+def solve_subproblem(subproblem_instance, config: dict, log_file_path: Path, previous_subproblem_results=None):
+    '''Funzione che crea e risolve il modello MILP del sottoproblema di un
+    singolo giorno. Ritorna la coppia (risultati, informazioni del solver). La
+    funzione non dipende da alcuno stato esterno e può quindi essere eseguita
+    in un processo separato. 'previous_subproblem_results' sono gli ultimi
+    risultati dello stesso giorno, usati come soluzione iniziale se
+    'warm_start_subproblem' è attivo.'''
+
+    # Il backend matriciale costruisce direttamente la matrice dei vincoli e
+    # risolve il modello con HiGHS, senza passare dalle espressioni di Pyomo
+    use_matrix_backend = 'backend' in config['subproblem_config'] and config['subproblem_config']['backend'] == 'matrix'
+
+    # Euristica di scheduling a lista: se schedula tutte le richieste il
+    # solver non viene chiamato, altrimenti la sua soluzione è usata come
+    # soluzione iniziale e limite inferiore del modello
+    heuristic_results = None
+    if 'use_subproblem_heuristic' in config and config['use_subproblem_heuristic']:
+
+        heuristic_start_time = time.perf_counter()
+        heuristic_results = get_subproblem_heuristic_results(subproblem_instance)
+        heuristic_end_time = time.perf_counter()
+
+        try:
+            check_subproblem_results(subproblem_instance, heuristic_results)
+        except Exception as exception:
+            if config['checks_throw_exceptions']:
+                raise exception
+            print(exception)
+            heuristic_results = None
+
+    # Soluzione iniziale ricavata dall'ultima schedulazione dello stesso
+    # giorno: le richieste rimosse dal master vengono tolte e quelle nuove
+    # inserite dove possibile
+    warm_start_results = None
+    if 'warm_start_subproblem' in config and config['warm_start_subproblem'] and previous_subproblem_results is not None:
+
+        warm_start_results = get_subproblem_heuristic_results(subproblem_instance, previous_subproblem_results['scheduled'])
+
+        try:
+            check_subproblem_results(subproblem_instance, warm_start_results)
+        except Exception as exception:
+            if config['checks_throw_exceptions']:
+                raise exception
+            print(exception)
+            warm_start_results = None
+
+    if heuristic_results is not None and len(heuristic_results['rejected']) == 0:
+
+        subproblem_info = get_closed_subproblem_solver_info(subproblem_instance, heuristic_results, config['subproblem_config']['model'])
+        subproblem_info['subproblem_heuristic_time'] = heuristic_end_time - heuristic_start_time
+        subproblem_info['subproblem_heuristic_closed'] = True
+
+        with open(log_file_path, 'w') as file:
+            file.write('Solver not called: all requests are scheduled by the list scheduling heuristic.\n')
+
+        return heuristic_results, subproblem_info
+
+    if warm_start_results is not None and len(warm_start_results['rejected']) == 0:
+
+        subproblem_info = get_closed_subproblem_solver_info(subproblem_instance, warm_start_results, config['subproblem_config']['model'])
+        subproblem_info['subproblem_warm_start_closed'] = True
+        if heuristic_results is not None:
+            subproblem_info['subproblem_heuristic_time'] = heuristic_end_time - heuristic_start_time
+            subproblem_info['subproblem_heuristic_closed'] = False
+            subproblem_info['subproblem_heuristic_value'] = get_subproblem_results_objective_value(subproblem_instance, heuristic_results)
+
+        with open(log_file_path, 'w') as file:
+            file.write('Solver not called: all requests are scheduled by the repaired schedule of the previous iteration.\n')
+
+        return warm_start_results, subproblem_info
+
+    subproblem_model_creation_start_time = time.perf_counter()
+
+    if use_matrix_backend:
+        if config['subproblem_config']['model'] == 'fat-subproblem':
+            subproblem_model = get_fat_subproblem_matrix_model(subproblem_instance, config['additional_subproblem_info'])
+        elif config['subproblem_config']['model'] == 'slim-subproblem':
+            subproblem_model = get_slim_subproblem_matrix_model(subproblem_instance, config['additional_subproblem_info'])
+    elif config['subproblem_config']['model'] == 'fat-subproblem':
+        subproblem_model = get_fat_subproblem_model(subproblem_instance, config['additional_subproblem_info'])
+    elif config['subproblem_config']['model'] == 'slim-subproblem':
+        subproblem_model = get_slim_subproblem_model(subproblem_instance, config['additional_subproblem_info'])
+
+    heuristic_value = 0.0
+    if heuristic_results is not None:
+        heuristic_value = get_subproblem_results_objective_value(subproblem_instance, heuristic_results)
+    warm_start_value = 0.0
+    if warm_start_results is not None:
+        warm_start_value = get_subproblem_results_objective_value(subproblem_instance, warm_start_results)
+
+    # Viene usata come soluzione iniziale la migliore fra le due disponibili
+    start_results = None
+    start_value = 0.0
+    if heuristic_results is not None:
+        start_results = heuristic_results
+        start_value = heuristic_value
+    if warm_start_results is not None and warm_start_value > start_value:
+        start_results = warm_start_results
+        start_value = warm_start_value
+
+    # La soluzione iniziale viene usata solo se rispetta i limiti delle
+    # variabili del modello
+    is_start_accepted = False
+    if start_results is not None:
+        is_start_accepted = set_subproblem_start_values(subproblem_model, start_results, use_matrix_backend)
+
+    # La soluzione iniziale è un limite inferiore dell'ottimo
+    if is_start_accepted and start_value > 0:
+        if use_matrix_backend:
+            add_matrix_objective_lower_bound(subproblem_model, start_value)
+        else:
+            subproblem_model.start_lower_bound = pyo.Constraint(expr=subproblem_model.objective_function.expr >= start_value)
+
+    subproblem_model_creation_end_time = time.perf_counter()
+
+    if use_matrix_backend:
+
+        subproblem_solving_start_time = time.perf_counter()
+
+        subproblem_model, subproblem_solving_outcome = solve_matrix_model(subproblem_model, config['subproblem_config'], log_file_path)
+
+        subproblem_solving_end_time = time.perf_counter()
+
+        subproblem_info = get_matrix_solver_info(subproblem_solving_outcome, config['subproblem_config']['model'], log_file_path)
+
+    else:
+
+        subproblem_opt = pyo.SolverFactory(config['subproblem_config']['solver'])
+
+        if 'time_limit' in config['subproblem_config']:
+            if config['subproblem_config']['solver'] == 'glpk':
+                subproblem_opt.options['tmlim'] = config['subproblem_config']['time_limit']
+            elif config['subproblem_config']['solver'] == 'gurobi':
+                subproblem_opt.options['TimeLimit'] = config['subproblem_config']['time_limit']
+        if 'max_memory' in config['subproblem_config']:
+            subproblem_opt.options['SoftMemLimit'] = config['subproblem_config']['max_memory']
+        if 'threads' in config['subproblem_config']:
+            if config['subproblem_config']['solver'] == 'gurobi':
+                subproblem_opt.options['Threads'] = config['subproblem_config']['threads']
+
+        subproblem_solving_start_time = time.perf_counter()
+        
+        if is_start_accepted and subproblem_opt.warm_start_capable():
+            subproblem_model_results = subproblem_opt.solve(subproblem_model, tee=False, logfile=log_file_path, warmstart=True)
+        else:
+            subproblem_model_results = subproblem_opt.solve(subproblem_model, tee=False, logfile=log_file_path)
+
+        subproblem_solving_end_time = time.perf_counter()
+
+        # Ottenimento dei dati del solver
+        subproblem_model.solutions.store_to(subproblem_model_results)
+        subproblem_info = get_solver_info(subproblem_model_results, config['subproblem_config']['model'], log_file_path)
+
+    subproblem_info['subproblem_model_creation_time'] = subproblem_model_creation_end_time - subproblem_model_creation_start_time
+    subproblem_info['subproblem_external_solving_time'] = subproblem_solving_end_time - subproblem_solving_start_time
+
+    if heuristic_results is not None:
+        subproblem_info['subproblem_heuristic_time'] = heuristic_end_time - heuristic_start_time
+        subproblem_info['subproblem_heuristic_closed'] = False
+        subproblem_info['subproblem_heuristic_value'] = heuristic_value
+    if warm_start_results is not None:
+        subproblem_info['subproblem_warm_start_closed'] = False
+        subproblem_info['subproblem_warm_start_value'] = warm_start_value
+    if start_results is not None:
+        subproblem_info['subproblem_start_accepted'] = is_start_accepted
+
+    if config['subproblem_config']['model'] == 'fat-subproblem':
+        subproblem_results = get_results_from_fat_subproblem_model(subproblem_model)
+    elif config['subproblem_config']['model'] == 'slim-subproblem':
+        subproblem_results = get_results_from_slim_subproblem_model(subproblem_model)
+
+    # Il solver può terminare (ad esempio al limite di tempo) con una
+    # soluzione peggiore di quella iniziale, che in tal caso viene mantenuta
+    if start_results is not None and start_value > get_subproblem_results_objective_value(subproblem_instance, subproblem_results):
+        subproblem_results = start_results
+        subproblem_info['objective_function_value'] = start_value
+        subproblem_info['lower_bound'] = start_value
+        if type(subproblem_info['upper_bound']) is float:
+            subproblem_info['gap'] = subproblem_info['upper_bound'] - start_value
+            subproblem_info['gap_ratio'] = subproblem_info['gap'] / subproblem_info['upper_bound'] if subproblem_info['upper_bound'] != 0 else 0.0
+        subproblem_info['subproblem_start_kept'] = True
+
+    return subproblem_results, subproblem_info
+
+
+def get_parallel_subproblem_config(config: dict):
+    '''Funzione che ritorna la configurazione con cui risolvere l'istanza. Se
+    i sottoproblemi giornalieri sono risolti in parallelo e non è specificato
+    il numero di thread del solver di ogni sottoproblema, questi vengono divisi
+    equamente fra i processi in una copia della configurazione, senza
+    modificare quella ricevuta.'''
+
+    if 'subproblem_workers' not in config or config['subproblem_workers'] <= 1:
+        return config
+    if 'threads' in config['subproblem_config']:
+        return config
+
+    config = copy.copy(config)
+    config['subproblem_config'] = copy.copy(config['subproblem_config'])
+    config['subproblem_config']['threads'] = max(1, (os.cpu_count() or 1) // config['subproblem_workers'])
+
+    return config
+
+
+def get_subproblem_executor(config: dict):
+    '''Funzione che ritorna il pool di processi con cui risolvere in parallelo
+    i sottoproblemi giornalieri, oppure None se la risoluzione è seriale.'''
+
+    if 'subproblem_workers' not in config or config['subproblem_workers'] <= 1:
+        return None
+    
+    subproblem_workers = config['subproblem_workers']
+
+    # I processi figli vengono creati con 'fork' (dove disponibile) in modo da
+    # non dover reimportare lo script chiamante
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=subproblem_workers, mp_context=multiprocessing.get_context('fork'))
+    return ProcessPoolExecutor(max_workers=subproblem_workers)
+
+
+def get_expansion_executor(config: dict):
+    '''Funzione che ritorna il pool di processi con cui calcolare in parallelo
+    le espansioni dei core, oppure None se il calcolo è seriale.'''
+
+    if 'expansion_workers' not in config or config['expansion_workers'] <= 1:
+        return None
+    
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=config['expansion_workers'], mp_context=multiprocessing.get_context('fork'))
+    return ProcessPoolExecutor(max_workers=config['expansion_workers'])
+
+
 def solve_instance(master_instance, output_directory_path: Path, config: dict):
 
     if config['checks_throw_exceptions']:
@@ -230,6 +584,10 @@ def solve_instance(master_instance, output_directory_path: Path, config: dict):
     with open(master_instance_file_path, 'w') as file:
         json.dump(master_instance, file, indent=4)
 
+    # La configurazione salvata riporta il numero di thread effettivamente
+    # usato dai sottoproblemi risolti in parallelo
+    config = get_parallel_subproblem_config(config)
+
     config_file_path = output_directory_path.joinpath('solver_config.yaml')
     with open(config_file_path, 'w') as file:
         yaml.dump(config, file, default_flow_style=False, sort_keys=False)
@@ -237,11 +595,20 @@ def solve_instance(master_instance, output_directory_path: Path, config: dict):
     total_start_time = time.perf_counter()
 
     max_possible_master_requests = get_max_possible_master_requests(master_instance)
+    request_availability = get_master_request_availability(max_possible_master_requests)
 
-    # Matrice di caching delle soluzioni dei sottoproblemi passate. Indicizzata
-    # sulle righe da (patient, service) e sulle colonne da (day, iteration)
+    # Il modello di permutazione delle soluzioni passate dei sottoproblemi
+    # viene mantenuto fra le iterazioni, aggiungendo solo le nuove colonne; con
+    # un solver persistente viene inviato al solver una sola volta. L'archivio
+    # delle colonne le indicizza per giorno e insieme di coppie (patient,
+    # service) schedulate
     if 'use_solution_permutation' in config and config['use_solution_permutation']:
-        prev_solution_matrix = {}
+        sol_perm_model = get_sol_perm_model(master_instance)
+        sol_perm_columns = get_sol_perm_columns()
+        if config['master_config']['solver'] in PERSISTENT_SOLVER_NAMES:
+            sol_perm_opt = get_persistent_solver({'solver': config['master_config']['solver']})
+        else:
+            sol_perm_opt = pyo.SolverFactory(config['master_config']['solver'])
 
     if config['expand_core_days']:
         expanded_days = compute_expanded_days(master_instance)
@@ -262,447 +629,712 @@ def solve_instance(master_instance, output_directory_path: Path, config: dict):
     master_model_creation_end_time = time.perf_counter()
     print(f'ended ({round(master_model_creation_end_time - master_model_creation_start_time, 4)}s).')
 
-    master_opt = pyo.SolverFactory(config['master_config']['solver'])
+    # Con un solver persistente il modello del master viene inviato una sola
+    # volta e ad ogni iterazione vengono trasmessi solo i nuovi vincoli
+    use_persistent_master = config['master_config']['solver'] in PERSISTENT_SOLVER_NAMES
 
-    if 'time_limit' in config['master_config']:
-        if config['master_config']['solver'] == 'glpk':
-            master_opt.options['tmlim'] = config['master_config']['time_limit']
-        elif config['master_config']['solver'] == 'gurobi':
-            master_opt.options['TimeLimit'] = config['master_config']['time_limit']
-    if 'max_memory' in config['master_config']:
-        master_opt.options['SoftMemLimit'] = config['master_config']['max_memory']
+    if use_persistent_master:
+        master_opt = get_persistent_solver(config['master_config'])
+    else:
+        master_opt = pyo.SolverFactory(config['master_config']['solver'])
+
+        if 'time_limit' in config['master_config']:
+            if config['master_config']['solver'] == 'glpk':
+                master_opt.options['tmlim'] = config['master_config']['time_limit']
+            elif config['master_config']['solver'] == 'gurobi':
+                master_opt.options['TimeLimit'] = config['master_config']['time_limit']
+        if 'max_memory' in config['master_config']:
+            master_opt.options['SoftMemLimit'] = config['master_config']['max_memory']
+
+    # Memoria dei sottoproblemi già risolti durante l'esecuzione, indicizzata
+    # dall'identificativo dell'istanza.
+    use_subproblem_memo = 'use_subproblem_memo' in config and config['use_subproblem_memo']
+    subproblem_memo = {}
+
+    # Cache su disco dei sottoproblemi risolti all'ottimo, condivisa fra
+    # esecuzioni e configurazioni diverse.
+    subproblem_cache_directory_path = None
+    if 'subproblem_cache' in config and config['subproblem_cache'] is not None:
+        subproblem_cache_directory_path = Path(config['subproblem_cache']['directory']).resolve()
+        subproblem_cache_directory_path.mkdir(parents=True, exist_ok=True)
+        subproblem_cache_max_size = config['subproblem_cache']['max_size'] * 1024 * 1024
+    # Base di conoscenza con le soluzioni dei giorni completamente schedulati:
+    # ogni sottoinsieme delle loro richieste è risolvibile senza solver.
+    use_feasibility_witnesses = 'use_feasibility_witnesses' in config and config['use_feasibility_witnesses']
+    feasibility_knowledge = {}
+
+    total_subproblem_cache_info = {
+        'hits': 0,
+        'misses': 0,
+        'stored': 0,
+        'evicted': 0
+    }
+
+    # Euristica di scheduling a lista dei sottoproblemi: i giorni che schedula
+    # completamente non vengono passati al solver
+    use_subproblem_heuristic = 'use_subproblem_heuristic' in config and config['use_subproblem_heuristic']
+    total_subproblem_heuristic_info = {
+        'closed_days': 0,
+        'warm_started_days': 0
+    }
+
+    # Ultimi risultati di ogni giorno, usati come soluzione iniziale dei
+    # sottoproblemi delle iterazioni successive
+    latest_subproblem_results = {}
 
     iteration_index = 0
     max_iteration_number = config['max_iteration_number']
 
-    all_iterations_cores = []
+    all_iterations_cores = get_core_store()
+
+    # Pool dei vincoli dei core: i tagli dominati da core più piccoli vengono
+    # disattivati e, se richiesto, quelli non stringenti da troppe iterazioni
+    # vengono disattivati finché non tornano ad essere violati.
+    use_core_cut_pool = 'use_core_cut_pool' in config and config['use_core_cut_pool']
+    core_cut_max_slack_iterations = None
+    if 'core_cut_max_slack_iterations' in config:
+        core_cut_max_slack_iterations = config['core_cut_max_slack_iterations']
+    core_cut_pool = get_core_cut_pool()
+
+    # Motore con cui enumerare le espansioni dei core: 'matching' le calcola in
+    # memoria, 'clingo' con il programma ASP esterno.
+    core_expansion_engine = 'matching'
+    if 'core_expansion_engine' in config:
+        core_expansion_engine = config['core_expansion_engine']
+    expansion_workers = 1
+    if 'expansion_workers' in config and config['expansion_workers'] > 1:
+        expansion_workers = config['expansion_workers']
 
     best_final_results_file_path = results_directory_path.joinpath('best_final_results.json')
     best_final_results_value = None
 
-    while iteration_index < max_iteration_number:
+    # I pool di processi vengono chiusi anche quando un controllo solleva
+    # un'eccezione
+    subproblem_executor = get_subproblem_executor(config)
+    expansion_executor = get_expansion_executor(config)
+
+    try:
+        while iteration_index < max_iteration_number:
 
-        iteration_input_directory_path = input_directory_path.joinpath(f'iter_{iteration_index}')
-        iteration_input_directory_path.mkdir()
+            iteration_input_directory_path = input_directory_path.joinpath(f'iter_{iteration_index}')
+            iteration_input_directory_path.mkdir()
 
-        iteration_results_directory_path = results_directory_path.joinpath(f'iter_{iteration_index}')
-        iteration_results_directory_path.mkdir()
+            iteration_results_directory_path = results_directory_path.joinpath(f'iter_{iteration_index}')
+            iteration_results_directory_path.mkdir()
 
-        iteration_logs_directory_path = logs_directory_path.joinpath(f'iter_{iteration_index}')
-        iteration_logs_directory_path.mkdir()
+            iteration_logs_directory_path = logs_directory_path.joinpath(f'iter_{iteration_index}')
+            iteration_logs_directory_path.mkdir()
         
-        master_log_file_path = iteration_logs_directory_path.joinpath('master_log.log')
+            master_log_file_path = iteration_logs_directory_path.joinpath('master_log.log')
 
-        print(f'[iter {iteration_index}] Solving master... ', end='')
-        master_solving_start_time = time.perf_counter()
+            print(f'[iter {iteration_index}] Solving master... ', end='')
+            master_solving_start_time = time.perf_counter()
         
-        master_model_results = master_opt.solve(master_model, tee=False, warmstart=config['warm_start_master'], logfile=master_log_file_path)
+            # Se la soluzione viola dei tagli del pool disattivati per
+            # invecchiamento, questi vengono riattivati ed il master viene risolto
+            # nuovamente
+            master_resolve_number = 0
+            reactivated_core_cut_number = 0
+            total_master_model_update_time = 0.0
+            total_master_model_solving_time = 0.0
+
+            while True:
+
+                if use_persistent_master:
+                    master_model_results, master_model_update_time, master_model_solving_time = solve_with_persistent_solver(master_opt, master_model, master_log_file_path, config['warm_start_master'])
+                    total_master_model_update_time += master_model_update_time
+                    total_master_model_solving_time += master_model_solving_time
+                else:
+                    master_model_results = master_opt.solve(master_model, tee=False, warmstart=config['warm_start_master'], logfile=master_log_file_path)
 
-        master_solving_end_time = time.perf_counter()
-        print(f'ended ({master_solving_end_time - master_solving_start_time}s).')
+                # Senza una soluzione i tagli violati non possono essere verificati
+                has_master_solution = not use_persistent_master or master_model_results.best_feasible_objective is not None
 
-        # Ottenimento dei dati del solver
-        master_model.solutions.store_to(master_model_results)
-        master_info = get_solver_info(master_model_results, config['master_config']['model'], master_log_file_path)
+                if not use_core_cut_pool or not has_master_solution:
+                    break
+
+                violated_core_cut_number = reactivate_violated_core_cuts(core_cut_pool)
+                if violated_core_cut_number == 0:
+                    break
+
+                reactivated_core_cut_number += violated_core_cut_number
+                master_resolve_number += 1
 
-        master_info['master_external_solving_time'] = master_solving_end_time - master_solving_start_time
+            master_solving_end_time = time.perf_counter()
+            print(f'ended ({master_solving_end_time - master_solving_start_time}s).')
 
-        master_info_file_path = iteration_logs_directory_path.joinpath(f'master_info.json')
-        with open(master_info_file_path, 'w') as file:
-            json.dump(master_info, file, indent=4)
+            if master_resolve_number > 0:
+                print(f'[iter {iteration_index}] Reactivated {reactivated_core_cut_number} aged core cuts, master solved {master_resolve_number + 1} times.')
+
+            # Ottenimento dei dati del solver
+            if use_persistent_master:
+                master_info = get_persistent_solver_info(master_model_results, config['master_config']['model'], master_log_file_path, total_master_model_solving_time)
+                master_info['master_model_update_time'] = total_master_model_update_time
+            else:
+                master_model.solutions.store_to(master_model_results)
+                master_info = get_solver_info(master_model_results, config['master_config']['model'], master_log_file_path)
+
+            master_info['master_external_solving_time'] = master_solving_end_time - master_solving_start_time
+
+            # I tagli del pool che non sono stringenti da troppe iterazioni vengono
+            # disattivati
+            aged_core_cut_number = 0
+            if use_core_cut_pool:
+                master_info['master_resolve_number'] = master_resolve_number
+                if core_cut_max_slack_iterations is not None:
+                    aged_core_cut_number = age_core_cuts(core_cut_pool, core_cut_max_slack_iterations)
+
+            master_info_file_path = iteration_logs_directory_path.joinpath(f'master_info.json')
+            with open(master_info_file_path, 'w') as file:
+                json.dump(master_info, file, indent=4)
+
+            # Il solver persistente può fermarsi al limite di tempo senza avere
+            # trovato una soluzione del master
+            if not has_master_solution:
+                print(f'[iter {iteration_index}] [STOP] Master has no feasible solution ({master_info["status"]}): exiting iteration cycle.')
+                break
 
-        if config['master_config']['model'] == 'fat-master':
-            master_results = get_results_from_fat_master_model(master_model)
-        elif config['master_config']['model'] == 'slim-master':
-            master_results = get_results_from_slim_master_model(master_model)
+            if config['master_config']['model'] == 'fat-master':
+                master_results = get_results_from_fat_master_model(master_model)
+            elif config['master_config']['model'] == 'slim-master':
+                master_results = get_results_from_slim_master_model(master_model)
 
-        master_results_file_path = iteration_results_directory_path.joinpath('master_results.json')
-        with open(master_results_file_path, 'w') as file:
-            json.dump(master_results, file, indent=4)
+            master_results_file_path = iteration_results_directory_path.joinpath('master_results.json')
+            with open(master_results_file_path, 'w') as file:
+                json.dump(master_results, file, indent=4)
         
-        if config['checks_throw_exceptions']:
-            check_master_results(master_instance, master_results)
-        else:
-            try:
+            if config['checks_throw_exceptions']:
                 check_master_results(master_instance, master_results)
-            except Exception as exception:
-                print(exception)
+            else:
+                try:
+                    check_master_results(master_instance, master_results)
+                except Exception as exception:
+                    print(exception)
 
-        # Controllo della presenza di una combinazione di soluzioni precedenti
-        # che soddisfi delle richieste di valore pari al master
-        if 'use_solution_permutation' in config and config['use_solution_permutation'] and iteration_index > 1:
+            # Controllo della presenza di una combinazione di soluzioni precedenti
+            # che soddisfi delle richieste di valore pari al master
+            if 'use_solution_permutation' in config and config['use_solution_permutation'] and iteration_index > 1:
             
-            print(f'[iter {iteration_index}] Searching for a permutation of previous solutions')
+                print(f'[iter {iteration_index}] Searching for a permutation of previous solutions')
 
-            master_results_value = get_master_results_value(master_instance, master_results)
+                master_results_value = get_master_results_value(master_instance, master_results)
             
-            sol_perm_model = get_sol_perm_model(master_instance, prev_solution_matrix)
-            
-            opt = pyo.SolverFactory(config['master_config']['solver'])
-            sol_perm_start_time = time.perf_counter()
-            opt.solve(sol_perm_model, tee=False)
-            sol_perm_end_time = time.perf_counter()
-
-            sol_perm_solution_value = pyo.value(sol_perm_model.objective_function)
-            sol_perm_info = {
-                'sol_perm_external_solving_time': sol_perm_end_time - sol_perm_start_time,
-                'sol_perm_objective_function_value': sol_perm_solution_value,
-                'sol_perm_difference_between_master': master_results_value - sol_perm_solution_value,
-                'best_solution_value_so_far': best_final_results_value
-            }
-
-            with open(iteration_logs_directory_path.joinpath('sol_perm_info.json'), 'w') as file:
-                json.dump(sol_perm_info, file, indent=4)
-
-            # Per avere la soluzione ottima è necessario che il valore sia
-            # uguale a quello del master
-            if sol_perm_solution_value < master_results_value:
-                print(f'[iter {iteration_index}] Permutation not found ({sol_perm_solution_value} value, {master_results_value - sol_perm_solution_value} slots less than master, {best_final_results_value} is best subproblems so far).')
-            else:
-                print(f'[iter {iteration_index}] [STOP] Found a possible permutation of previous solution. Stopping the iterations.')
+                # La soluzione di partenza è la scelta dell'iterazione precedente,
+                # aggiornata con le nuove colonne
+                sol_perm_start_time = time.perf_counter()
+                if config['master_config']['solver'] in PERSISTENT_SOLVER_NAMES:
+                    solve_with_persistent_solver(sol_perm_opt, sol_perm_model, iteration_logs_directory_path.joinpath('sol_perm_log.log'), config['warm_start_master'])
+                else:
+                    sol_perm_opt.solve(sol_perm_model, tee=False, warmstart=config['warm_start_master'])
+                sol_perm_end_time = time.perf_counter()
+
+                sol_perm_solution_value = pyo.value(sol_perm_model.objective_function)
+                sol_perm_info = {
+                    'sol_perm_external_solving_time': sol_perm_end_time - sol_perm_start_time,
+                    'sol_perm_objective_function_value': sol_perm_solution_value,
+                    'sol_perm_difference_between_master': master_results_value - sol_perm_solution_value,
+                    'sol_perm_column_number': sum(len(day_columns) for day_columns in sol_perm_columns['requests_by_day'].values()),
+                    'best_solution_value_so_far': best_final_results_value
+                }
+
+                with open(iteration_logs_directory_path.joinpath('sol_perm_info.json'), 'w') as file:
+                    json.dump(sol_perm_info, file, indent=4)
+
+                # Per avere la soluzione ottima è necessario che il valore sia
+                # uguale a quello del master
+                if sol_perm_solution_value < master_results_value:
+                    print(f'[iter {iteration_index}] Permutation not found ({sol_perm_solution_value} value, {master_results_value - sol_perm_solution_value} slots less than master, {best_final_results_value} is best subproblems so far).')
+                else:
+                    print(f'[iter {iteration_index}] [STOP] Found a possible permutation of previous solution. Stopping the iterations.')
                 
-                sol_perm_results = get_results_from_sol_perm_model(sol_perm_model)
-
-                # Leggi i risultati dei sottoproblemi dei giorni selezionati
-                all_subproblem_results = {}
-                for day_name, i in sol_perm_results.items():
-                    subproblem_results_file_path = results_directory_path.joinpath(f'iter_{i}').joinpath(f'subproblem_day_{day_name}_results.json')
-                    with open(subproblem_results_file_path, 'r') as file:
-                        all_subproblem_results[day_name] = json.load(file)
+                    sol_perm_results = get_results_from_sol_perm_model(sol_perm_model)
+
+                    # Leggi i risultati dei sottoproblemi dei giorni selezionati
+                    all_subproblem_results = {}
+                    for day_name, i in sol_perm_results.items():
+                        subproblem_results_file_path = results_directory_path.joinpath(f'iter_{i}').joinpath(f'subproblem_day_{day_name}_results.json')
+                        with open(subproblem_results_file_path, 'r') as file:
+                            all_subproblem_results[day_name] = json.load(file)
                 
-                # Componi assieme le soluzioni dei sottoproblemi
-                # Rimozione di eventuali schedulazioni doppie e finestre risolte
-                final_results = get_fixed_final_results(master_instance, all_subproblem_results)
-
-                # Salvataggio file con i risultati
-                final_results_file_path = iteration_results_directory_path.joinpath('final_results.json')
-                with open(final_results_file_path, 'w') as file:
-                    json.dump(final_results, file, indent=4)
-                with open(best_final_results_file_path, 'w') as file:
-                    json.dump(final_results, file, indent=4)
+                    # Componi assieme le soluzioni dei sottoproblemi
+                    # Rimozione di eventuali schedulazioni doppie e finestre risolte
+                    final_results = get_fixed_final_results(master_instance, all_subproblem_results)
+
+                    # Salvataggio file con i risultati
+                    final_results_file_path = iteration_results_directory_path.joinpath('final_results.json')
+                    with open(final_results_file_path, 'w') as file:
+                        json.dump(final_results, file, indent=4)
+                    with open(best_final_results_file_path, 'w') as file:
+                        json.dump(final_results, file, indent=4)
                 
+                    if config['checks_throw_exceptions']:
+                        check_final_results(master_instance, final_results)
+                    else:
+                        try:
+                            check_final_results(master_instance, final_results)
+                        except Exception as exception:
+                            print(exception)
+
+                    # Soluzione ottima raggiunta
+                    break
+
+            # Creazione delle istanze dei sottoproblemi di ogni giorno
+            subproblem_instances = {}
+            for day_name in master_results['scheduled'].keys():
+            
+                subproblem_instance = compute_subproblem_instance_from_master(master_instance, master_results, day_name)
+            
+                subproblem_instance_file_path = iteration_input_directory_path.joinpath(f'subproblem_day_{day_name}.json')
+            
+                with open(subproblem_instance_file_path, 'w') as file:
+                    json.dump(subproblem_instance, file, indent=4)
+            
                 if config['checks_throw_exceptions']:
-                    check_final_results(master_instance, final_results)
+                    check_subproblem_instance(subproblem_instance)
                 else:
                     try:
-                        check_final_results(master_instance, final_results)
+                        check_subproblem_instance(subproblem_instance)
                     except Exception as exception:
                         print(exception)
 
-                # Soluzione ottima raggiunta
-                break
-
-        all_subproblem_results = {}
-        for day_name in master_results['scheduled'].keys():
-            
-            subproblem_instance = compute_subproblem_instance_from_master(master_instance, master_results, day_name)
-            
-            subproblem_instance_file_path = iteration_input_directory_path.joinpath(f'subproblem_day_{day_name}.json')
+                subproblem_instances[day_name] = subproblem_instance
+
+            # Risoluzione dei sottoproblemi: i giorni sono indipendenti fra loro e
+            # possono essere risolti in parallelo. Se un'istanza identica è già
+            # stata risolta (in questa o in una precedente iterazione) il solver
+            # non viene chiamato.
+            subproblem_outcomes = {}
+            subproblem_hashes = {}
+            subproblem_cache_keys = {}
+            cached_subproblems = {}
+            witnessed_subproblems = {}
+            subproblem_cache_info = {
+                'hits': 0,
+                'misses': 0,
+                'stored': 0,
+                'evicted': 0
+            }
+            subproblem_heuristic_info = {
+                'closed_days': 0,
+                'warm_started_days': 0
+            }
+            for day_name, subproblem_instance in subproblem_instances.items():
             
-            with open(subproblem_instance_file_path, 'w') as file:
-                json.dump(subproblem_instance, file, indent=4)
+                if use_subproblem_memo:
+                    subproblem_hash = get_subproblem_instance_hash(subproblem_instance)
+                    is_already_solved = subproblem_hash in subproblem_memo or subproblem_hash in subproblem_hashes.values()
+                    subproblem_hashes[day_name] = subproblem_hash
+                    if is_already_solved:
+                        continue
+
+                if subproblem_cache_directory_path is not None:
+                    subproblem_cache_key = get_subproblem_cache_key(subproblem_instance, config)
+                    subproblem_cache_keys[day_name] = subproblem_cache_key
+                    cached_subproblem = load_subproblem_from_cache(subproblem_cache_directory_path, subproblem_cache_key)
+                    if cached_subproblem is not None:
+                        cached_subproblems[day_name] = cached_subproblem
+                        subproblem_cache_info['hits'] += 1
+                        continue
+                    subproblem_cache_info['misses'] += 1
+
+                if use_feasibility_witnesses:
+                    feasibility_witness = find_feasibility_witness(feasibility_knowledge, master_instance, day_name, subproblem_instance)
+                    if feasibility_witness is not None:
+                        witnessed_subproblems[day_name] = feasibility_witness
+                        continue
+
+                subproblem_log_file_path = iteration_logs_directory_path.joinpath(f'subproblem_day_{day_name}_log.log')
             
-            if config['checks_throw_exceptions']:
-                check_subproblem_instance(subproblem_instance)
-            else:
-                try:
-                    check_subproblem_instance(subproblem_instance)
-                except Exception as exception:
-                    print(exception)
+                if subproblem_executor is None:
+                    subproblem_outcomes[day_name] = solve_subproblem(subproblem_instance, config, subproblem_log_file_path, latest_subproblem_results.get(day_name))
+                else:
+                    subproblem_outcomes[day_name] = subproblem_executor.submit(solve_subproblem, subproblem_instance, config, subproblem_log_file_path, latest_subproblem_results.get(day_name))
+
+            # I risultati vengono raccolti sempre nell'ordine dei giorni del master
+            all_subproblem_results = {}
+            for day_name, subproblem_instance in subproblem_instances.items():
+
+                subproblem_log_file_path = iteration_logs_directory_path.joinpath(f'subproblem_day_{day_name}_log.log')
+
+                if day_name in subproblem_outcomes:
+
+                    if subproblem_executor is None:
+                        subproblem_results, subproblem_info = subproblem_outcomes[day_name]
+                    else:
+                        subproblem_results, subproblem_info = subproblem_outcomes[day_name].result()
+
+                    if 'subproblem_heuristic_closed' in subproblem_info and subproblem_info['subproblem_heuristic_closed']:
+                        subproblem_heuristic_info['closed_days'] += 1
+                        print(f'[iter {iteration_index}] Day \'{day_name}\' is fully scheduled by the heuristic, solver not called.')
+                    elif 'subproblem_warm_start_closed' in subproblem_info and subproblem_info['subproblem_warm_start_closed']:
+                        print(f'[iter {iteration_index}] Day \'{day_name}\' is fully scheduled by its repaired previous schedule, solver not called.')
+                    else:
+                        if 'subproblem_heuristic_closed' in subproblem_info:
+                            subproblem_heuristic_info['warm_started_days'] += 1
+                        subproblem_model_creation_time = subproblem_info['subproblem_model_creation_time']
+                        subproblem_solving_time = subproblem_info['subproblem_external_solving_time']
+                        print(f'[iter {iteration_index}] Model creation for day \'{day_name}\'... ended ({round(subproblem_model_creation_time, 4)}s). ', end='')
+                        print(f'Solving... ended ({round(subproblem_solving_time, 4)}s).')
+
+                    if use_subproblem_memo:
+                        subproblem_memo[subproblem_hashes[day_name]] = (copy.deepcopy(subproblem_results), copy.deepcopy(subproblem_info), subproblem_log_file_path)
+
+                    # Solo le soluzioni ottime vengono salvate su disco, dato che
+                    # quelle interrotte dipendono dai limiti della configurazione
+                    if subproblem_cache_directory_path is not None and subproblem_info['status'] == 'optimal':
+                        with open(subproblem_log_file_path, 'r') as file:
+                            log_text = file.read()
+                        store_subproblem_to_cache(subproblem_cache_directory_path, subproblem_cache_keys[day_name], subproblem_results, subproblem_info, log_text)
+                        subproblem_cache_info['stored'] += 1
+
+                    if use_subproblem_memo or subproblem_cache_directory_path is not None:
+                        subproblem_info['cache_hit'] = False
+                        subproblem_info['cache_saved_time'] = 0.0
+
+                elif day_name in witnessed_subproblems:
+
+                    # Tutte le richieste sono schedulate da una soluzione passata
+                    witness_day_name, subproblem_results = witnessed_subproblems[day_name]
+                    subproblem_info = get_closed_subproblem_solver_info(subproblem_instance, subproblem_results, config['subproblem_config']['model'], witness_day_name)
+
+                    with open(subproblem_log_file_path, 'w') as file:
+                        file.write(f'Solver not called: all requests are scheduled by a previous solution of day {witness_day_name}.\n')
+
+                    if use_subproblem_memo:
+                        subproblem_memo[subproblem_hashes[day_name]] = (copy.deepcopy(subproblem_results), copy.deepcopy(subproblem_info), subproblem_log_file_path)
+                
+                    if use_subproblem_memo or subproblem_cache_directory_path is not None:
+                        subproblem_info['cache_hit'] = False
+                        subproblem_info['cache_saved_time'] = 0.0
 
-            print(f'[iter {iteration_index}] Model creation for day \'{day_name}\'... ', end='')
-            subproblem_model_creation_start_time = time.perf_counter()
+                    print(f'[iter {iteration_index}] Day \'{day_name}\' is fully scheduled by a previous solution of day \'{witness_day_name}\', solver not called.')
 
-            if config['subproblem_config']['model'] == 'fat-subproblem':
-                subproblem_model = get_fat_subproblem_model(subproblem_instance, config['additional_subproblem_info'])
-            elif config['subproblem_config']['model'] == 'slim-subproblem':
-                subproblem_model = get_slim_subproblem_model(subproblem_instance, config['additional_subproblem_info'])
+                else:
 
-            subproblem_model_creation_end_time = time.perf_counter()
-            print(f'ended ({round(subproblem_model_creation_end_time - subproblem_model_creation_start_time, 4)}s). ', end='')
+                    # Riutilizzo della soluzione di un sottoproblema identico,
+                    # risolto in questa esecuzione oppure presente nella cache
+                    if day_name in cached_subproblems:
+                        cached_results, cached_info, log_text = cached_subproblems[day_name]
+                        with open(subproblem_log_file_path, 'w') as file:
+                            file.write(log_text)
+                        if use_subproblem_memo:
+                            subproblem_memo[subproblem_hashes[day_name]] = (copy.deepcopy(cached_results), copy.deepcopy(cached_info), subproblem_log_file_path)
+                    else:
+                        cached_results, cached_info, cached_log_file_path = subproblem_memo[subproblem_hashes[day_name]]
+                        shutil.copyfile(cached_log_file_path, subproblem_log_file_path)
+                
+                    subproblem_results = copy.deepcopy(cached_results)
+                    subproblem_info = copy.deepcopy(cached_info)
+
+                    subproblem_info['cache_hit'] = True
+                    subproblem_info['cache_saved_time'] = cached_info['subproblem_model_creation_time'] + cached_info['subproblem_external_solving_time']
+                    subproblem_info['subproblem_model_creation_time'] = 0.0
+                    subproblem_info['subproblem_external_solving_time'] = 0.0
+
+                    if day_name in cached_subproblems:
+                        print(f'[iter {iteration_index}] Day \'{day_name}\' found in the subproblem cache, reusing its results.')
+                    else:
+                        print(f'[iter {iteration_index}] Day \'{day_name}\' is identical to an already solved subproblem, reusing its results.')
+
+                subproblem_info_file_path = iteration_logs_directory_path.joinpath(f'subproblem_info_day_{day_name}.json')
+                with open(subproblem_info_file_path, 'w') as file:
+                    json.dump(subproblem_info, file, indent=4)
+
+                subproblem_results_file_path = iteration_results_directory_path.joinpath(f'subproblem_day_{day_name}_results.json')
+                with open(subproblem_results_file_path, 'w') as file:
+                    json.dump(subproblem_results, file, indent=4)
+        
+                if config['checks_throw_exceptions']:
+                    check_subproblem_results(subproblem_instance, subproblem_results)
+                else:
+                    try:
+                        check_subproblem_results(subproblem_instance, subproblem_results)
+                    except Exception as exception:
+                        print(exception)
 
-            subproblem_opt = pyo.SolverFactory(config['subproblem_config']['solver'])
+                all_subproblem_results[day_name] = subproblem_results
+                latest_subproblem_results[day_name] = subproblem_results
 
-            if 'time_limit' in config['subproblem_config']:
-                if config['subproblem_config']['solver'] == 'glpk':
-                    subproblem_opt.options['tmlim'] = config['subproblem_config']['time_limit']
-                elif config['subproblem_config']['solver'] == 'gurobi':
-                    subproblem_opt.options['TimeLimit'] = config['subproblem_config']['time_limit']
-            if 'max_memory' in config['subproblem_config']:
-                subproblem_opt.options['SoftMemLimit'] = config['subproblem_config']['max_memory']
+                if use_feasibility_witnesses:
+                    add_fully_scheduled_day(feasibility_knowledge, day_name, subproblem_results, iteration_index)
 
-            subproblem_log_file_path = iteration_logs_directory_path.joinpath(f'subproblem_day_{day_name}_log.log')
+            if use_subproblem_heuristic:
 
-            print(f'Solving... ', end='')
-            subproblem_solving_start_time = time.perf_counter()
-            
-            subproblem_model_results = subproblem_opt.solve(subproblem_model, tee=False, logfile=subproblem_log_file_path)
+                for key_name, value in subproblem_heuristic_info.items():
+                    total_subproblem_heuristic_info[key_name] += value
 
-            subproblem_solving_end_time = time.perf_counter()
-            print(f'ended ({round(subproblem_solving_end_time - subproblem_solving_start_time, 4)}s).')
+                with open(iteration_logs_directory_path.joinpath('subproblem_heuristic_info.json'), 'w') as file:
+                    json.dump(subproblem_heuristic_info, file, indent=4)
 
-            # Ottenimento dei dati del solver
-            subproblem_model.solutions.store_to(subproblem_model_results)
-            subproblem_info = get_solver_info(subproblem_model_results, config['subproblem_config']['model'], subproblem_log_file_path)
+                print(f'[iter {iteration_index}] Subproblem heuristic: {subproblem_heuristic_info["closed_days"]} days closed, {subproblem_heuristic_info["warm_started_days"]} days warm started.')
 
-            subproblem_info['subproblem_model_creation_time'] = subproblem_model_creation_end_time - subproblem_model_creation_start_time
-            subproblem_info['subproblem_external_solving_time'] = subproblem_solving_end_time - subproblem_solving_start_time
+            if subproblem_cache_directory_path is not None:
 
-            subproblem_info_file_path = iteration_logs_directory_path.joinpath(f'subproblem_info_day_{day_name}.json')
-            with open(subproblem_info_file_path, 'w') as file:
-                json.dump(subproblem_info, file, indent=4)
+                subproblem_cache_info['evicted'] = evict_subproblem_cache(subproblem_cache_directory_path, subproblem_cache_max_size)
 
-            if config['subproblem_config']['model'] == 'fat-subproblem':
-                subproblem_results = get_results_from_fat_subproblem_model(subproblem_model)
-            elif config['subproblem_config']['model'] == 'slim-subproblem':
-                subproblem_results = get_results_from_slim_subproblem_model(subproblem_model)
+                for key_name, value in subproblem_cache_info.items():
+                    total_subproblem_cache_info[key_name] += value
 
-            subproblem_results_file_path = iteration_results_directory_path.joinpath(f'subproblem_day_{day_name}_results.json')
-            with open(subproblem_results_file_path, 'w') as file:
-                json.dump(subproblem_results, file, indent=4)
+                with open(iteration_logs_directory_path.joinpath('subproblem_cache_info.json'), 'w') as file:
+                    json.dump(subproblem_cache_info, file, indent=4)
+            
+                print(f'[iter {iteration_index}] Subproblem cache: {subproblem_cache_info["hits"]} hits, {subproblem_cache_info["misses"]} misses, {subproblem_cache_info["stored"]} stored, {subproblem_cache_info["evicted"]} evicted.')
         
+            final_results = compose_final_results(master_instance, master_results, all_subproblem_results)
+
+            final_results_file_path = iteration_results_directory_path.joinpath('final_results.json')
+            with open(final_results_file_path, 'w') as file:
+                json.dump(final_results, file, indent=4)
+        
+            final_results_value = get_final_results_value(master_instance, final_results)
+            if best_final_results_value is None or final_results_value > best_final_results_value:
+                best_final_results_value = final_results_value
+                with open(best_final_results_file_path, 'w') as file:
+                    json.dump(final_results, file, indent=4)
+
             if config['checks_throw_exceptions']:
-                check_subproblem_results(subproblem_instance, subproblem_results)
+                check_final_results(master_instance, final_results)
             else:
                 try:
-                    check_subproblem_results(subproblem_instance, subproblem_results)
+                    check_final_results(master_instance, final_results)
                 except Exception as exception:
                     print(exception)
 
-            all_subproblem_results[day_name] = subproblem_results
-        
-        final_results = compose_final_results(master_instance, master_results, all_subproblem_results)
-
-        final_results_file_path = iteration_results_directory_path.joinpath('final_results.json')
-        with open(final_results_file_path, 'w') as file:
-            json.dump(final_results, file, indent=4)
-        
-        final_results_value = get_final_results_value(master_instance, final_results)
-        if best_final_results_value is None or final_results_value > best_final_results_value:
-            best_final_results_value = final_results_value
-            with open(best_final_results_file_path, 'w') as file:
-                json.dump(final_results, file, indent=4)
+            # Ogni giorno risolto può diventare una nuova colonna della matrice di
+            # cache
+            if 'use_solution_permutation' in config and config['use_solution_permutation']:
+                for day_name, day_results in all_subproblem_results.items():
 
-        if config['checks_throw_exceptions']:
-            check_final_results(master_instance, final_results)
-        else:
-            try:
-                check_final_results(master_instance, final_results)
-            except Exception as exception:
-                print(exception)
+                    # Una soluzione già presente fra le colonne dello stesso giorno
+                    # o contenuta in una di esse non viene aggiunta, mentre le
+                    # colonne contenute nella nuova vengono eliminate
+                    if len(day_results['scheduled']) > 0:
+                        add_sol_perm_column(sol_perm_model, sol_perm_columns, master_instance, int(day_name), iteration_index, [(schedule['patient'], schedule['service']) for schedule in day_results['scheduled']])
 
-        # Ogni giorno risolto può diventare una nuova colonna della matrice di
-        # cache
-        if 'use_solution_permutation' in config and config['use_solution_permutation']:
+            # Elenco dei giorni con almeno una richiesta non soddisfatta
+            days_not_completely_solved = []
             for day_name, day_results in all_subproblem_results.items():
-
-                # Se i servizi accettati della soluzione del giorno corrente
-                # sono uguali a quelli di soluzioni passate (dello stesso giorno
-                # in iterazioni 0..iteration_index) allora si può evitare di
-                # aggiungere questa nuova soluzione
-                is_exactly_equal = True
-                for other_iteration_index in range(iteration_index):
-                    column_to_check = (day_name, other_iteration_index)
-                    
-                    # Controllo sull'esistenza di una soluzione identica a
-                    # quella corrente
-                    for schedule in day_results['scheduled']:
-                        
-                        p = schedule['patient']
-                        s = schedule['service']
-
-                        if (p, s) not in prev_solution_matrix:
-                            is_exactly_equal = False
-                            break
-                        
-                        if column_to_check not in prev_solution_matrix[p, s]:
-                            is_exactly_equal = False
-                            break
-                    if is_exactly_equal:
-                        break
-                if is_exactly_equal:
-                    continue
-                
-                # Se la soluzione non è già presente, aggiungila come colonna
-                # della matrice
-                for schedule in day_results['scheduled']:
-                    p = schedule['patient']
-                    s = schedule['service']
-                    if (p, s) not in prev_solution_matrix:
-                        prev_solution_matrix[p, s] = []
-                    prev_solution_matrix[p, s].append((int(day_name), iteration_index))
-
-        # Elenco dei giorni con almeno una richiesta non soddisfatta
-        days_not_completely_solved = []
-        for day_name, day_results in all_subproblem_results.items():
-            if len(day_results['rejected']) > 0:
-                days_not_completely_solved.append(day_name)
+                if len(day_results['rejected']) > 0:
+                    days_not_completely_solved.append(day_name)
         
-        # Se tutti i giorni sono completamente risolti termina le iterazioni
-        if len(days_not_completely_solved) == 0:
-            print(f'[iter {iteration_index}] [STOP] All days are solved: exiting iteration cycle.') 
-            break
-        else:
-            days_str = ', '.join(days_not_completely_solved)
-            print(f'[iter {iteration_index}] Days [{days_str}] are not completely solved')
+            # Se tutti i giorni sono completamente risolti termina le iterazioni
+            if len(days_not_completely_solved) == 0:
+                print(f'[iter {iteration_index}] [STOP] All days are solved: exiting iteration cycle.') 
+                break
+            else:
+                days_str = ', '.join(days_not_completely_solved)
+                print(f'[iter {iteration_index}] Days [{days_str}] are not completely solved')
 
-        if config['early_stop_percentage_between_master_and_subproblem'] > 0.0:
+            if config['early_stop_percentage_between_master_and_subproblem'] > 0.0:
             
-            master_results_value = get_master_results_value(master_instance, master_results)
+                master_results_value = get_master_results_value(master_instance, master_results)
             
-            subproblems_results_value = 0
-            for day_name, day_results in all_subproblem_results.items():
-                subproblems_results_value += get_subproblem_results_value(master_instance, final_results, day_name)
+                subproblems_results_value = 0
+                for day_name, day_results in all_subproblem_results.items():
+                    subproblems_results_value += get_subproblem_results_value(master_instance, final_results, day_name)
             
-            min_difference = config['early_stop_percentage_between_master_and_subproblem']
+                min_difference = config['early_stop_percentage_between_master_and_subproblem']
             
-            if (master_results_value - subproblems_results_value) / master_results_value <= min_difference:
-                print(f'[iter {iteration_index}] [STOP] Master and subproblems reached the minimum value difference ({min_difference}%): exiting iteration cycle.') 
-                break
+                if (master_results_value - subproblems_results_value) / master_results_value <= min_difference:
+                    print(f'[iter {iteration_index}] [STOP] Master and subproblems reached the minimum value difference ({min_difference}%): exiting iteration cycle.') 
+                    break
 
-        if 'use_optimality_constraints' in config['additional_master_info']:
-            add_optimality_constraints(master_model, master_instance, all_subproblem_results, max_possible_master_requests)
+            if 'use_optimality_constraints' in config['additional_master_info']:
+                add_optimality_constraints(master_model, master_instance, all_subproblem_results, request_availability)
             
-        cores_info = {}
-
-        core_creation_start_time = time.perf_counter()
-
-        # Calcola l'elenco di core a partire dalle richieste non schedulate:
-        # > Core generalist: tutto quanto è richiesto in un dato giorno,
-        # > Core basic: ogni singola richiesta non schedulata più tutte
-        #   quelle schedulate,
-        # > Core reduced: ogni singola richiesta non schedulata più tutte
-        #   quelle schedulate che hanno paziente o unità di cura
-        #   influenzate, anche a catena.
-        if config['core_type'] == 'generalist':
-            current_iteration_cores = compute_generalist_cores(all_subproblem_results)
-        elif config['core_type'] == 'basic':
-            current_iteration_cores = compute_basic_cores(all_subproblem_results)
-        elif config['core_type'] == 'reduced':
-            current_iteration_cores = compute_reduced_cores(all_subproblem_results, master_instance)
-
-        core_creation_end_time = time.perf_counter()
-        cores_info['core_creation_time'] = core_creation_end_time - core_creation_start_time
-
-        if  config['expand_core_days'] or config['expand_core_patients'] or config['expand_core_services']:
-            print(f'[iter {iteration_index}] {len(current_iteration_cores)} new cores are found.')
+            cores_info = {}
+
+            core_creation_start_time = time.perf_counter()
+
+            # Calcola l'elenco di core a partire dalle richieste non schedulate:
+            # > Core generalist: tutto quanto è richiesto in un dato giorno,
+            # > Core basic: ogni singola richiesta non schedulata più tutte
+            #   quelle schedulate,
+            # > Core reduced: ogni singola richiesta non schedulata più tutte
+            #   quelle schedulate che hanno paziente o unità di cura
+            #   influenzate, anche a catena.
+            if config['core_type'] == 'generalist':
+                current_iteration_cores = compute_generalist_cores(all_subproblem_results)
+            elif config['core_type'] == 'basic':
+                current_iteration_cores = compute_basic_cores(all_subproblem_results)
+            elif config['core_type'] == 'reduced':
+                current_iteration_cores = compute_reduced_cores(all_subproblem_results, master_instance)
+
+            core_creation_end_time = time.perf_counter()
+            cores_info['core_creation_time'] = core_creation_end_time - core_creation_start_time
+
+            # Se richiesto, da ogni giorno vengono estratti più conflitti
+            # disgiunti, ognuno ridotto ad un sottoinsieme minimale di richieste.
+            if 'enumerate_disjoint_cores' in config and config['enumerate_disjoint_cores']:
+
+                core_minimization_start_time = time.perf_counter()
+
+                current_iteration_cores, enumeration_info = enumerate_disjoint_cores(current_iteration_cores, master_instance, all_subproblem_results, config, solve_subproblem)
+
+                core_minimization_end_time = time.perf_counter()
+                cores_info['minimization_time'] = core_minimization_end_time - core_minimization_start_time
+                cores_info.update(enumeration_info)
+
+                print(f'[iter {iteration_index}] {enumeration_info["enumerated_cores"]} disjoint cores are enumerated.')
+
+            # Se richiesto, ogni core viene ridotto ad un sottoinsieme minimale di
+            # richieste che non possono essere schedulate assieme.
+            elif 'minimize_cores' in config and config['minimize_cores']:
+
+                core_minimization_start_time = time.perf_counter()
+
+                current_iteration_cores, minimization_info = minimize_cores(current_iteration_cores, master_instance, all_subproblem_results, config, solve_subproblem)
+
+                core_minimization_end_time = time.perf_counter()
+                cores_info['minimization_time'] = core_minimization_end_time - core_minimization_start_time
+                cores_info.update(minimization_info)
+
+                print(f'[iter {iteration_index}] {minimization_info["minimized_cores"]} cores are minimized ({minimization_info["removed_core_components"]} components removed).')
+
+            if  config['expand_core_days'] or config['expand_core_patients'] or config['expand_core_services']:
+                print(f'[iter {iteration_index}] {len(current_iteration_cores)} new cores are found.')
         
-        core_number = len(current_iteration_cores)
+            core_number = len(current_iteration_cores)
 
-        # Numero di core prima dell'eventuale espansione
-        cores_info['core_number_pre_expansion'] = core_number
+            # Numero di core prima dell'eventuale espansione
+            cores_info['core_number_pre_expansion'] = core_number
         
-        day_names = set()
-        for core in current_iteration_cores:
-            day_names.update(core['days'])
+            day_names = set()
+            for core in current_iteration_cores:
+                day_names.update(core['days'])
         
-        # Numero di giorni che hanno almeno un core
-        cores_info['day_with_cores_pre_expansion'] = len(day_names)
+            # Numero di giorni che hanno almeno un core
+            cores_info['day_with_cores_pre_expansion'] = len(day_names)
 
-        total_core_components_number = 0
-        for core in current_iteration_cores:
-            total_core_components_number += len(core['components'])
+            total_core_components_number = 0
+            for core in current_iteration_cores:
+                total_core_components_number += len(core['components'])
         
-        # Numero medio di componenti dei core
-        cores_info['average_core_size_pre_expansion'] = total_core_components_number / core_number
+            # Numero medio di componenti dei core
+            cores_info['average_core_size_pre_expansion'] = total_core_components_number / core_number
     
-        # Numero di core le cui componenti sono tutte quelle chieste dal master
-        cores_equal_to_master_request = 0
-        total_core_component_percentages = 0
+            # Numero di core le cui componenti sono tutte quelle chieste dal master
+            cores_equal_to_master_request = 0
+            total_core_component_percentages = 0
 
-        for core in current_iteration_cores:
+            for core in current_iteration_cores:
             
-            day_name = core['days'][0]
-            daily_results = all_subproblem_results[day_name]
+                day_name = core['days'][0]
+                daily_results = all_subproblem_results[day_name]
             
-            if len(core['components']) == len(daily_results['scheduled']) + len(daily_results['rejected']):
-                cores_equal_to_master_request += 1
+                if len(core['components']) == len(daily_results['scheduled']) + len(daily_results['rejected']):
+                    cores_equal_to_master_request += 1
             
-            total_core_component_percentages += len(core['components']) / (len(daily_results['scheduled']) + len(daily_results['rejected']))
+                total_core_component_percentages += len(core['components']) / (len(daily_results['scheduled']) + len(daily_results['rejected']))
 
-        cores_info['number_of_core_equal_to_master_request'] = cores_equal_to_master_request
-        cores_info['percentage_of_core_equal_to_master_request'] = cores_equal_to_master_request / core_number
-        cores_info['average_percentage_of_core_done_by_subproblem'] = total_core_component_percentages / core_number
+            cores_info['number_of_core_equal_to_master_request'] = cores_equal_to_master_request
+            cores_info['percentage_of_core_equal_to_master_request'] = cores_equal_to_master_request / core_number
+            cores_info['average_percentage_of_core_done_by_subproblem'] = total_core_component_percentages / core_number
 
-        # Se richiesto, aggiorna le liste dei giorni in cui i core sono
-        # attivi con tutti quei giorni 'minori o uguali' nelle unità di
-        # cura influenzate.
-        if config['expand_core_days']:
-            expand_core_days(master_instance, current_iteration_cores, expanded_days)
+            # Se richiesto, aggiorna le liste dei giorni in cui i core sono
+            # attivi con tutti quei giorni 'minori o uguali' nelle unità di
+            # cura influenzate.
+            if config['expand_core_days']:
+                expand_core_days(master_instance, current_iteration_cores, expanded_days)
 
-        total_day_number = 0
-        for core in current_iteration_cores:
-            total_day_number += len(core['days'])
+            total_day_number = 0
+            for core in current_iteration_cores:
+                total_day_number += len(core['days'])
         
-        # Numero medio di giorni in cui i core sono attivi,
-        # dopo l'espansione dei giorni. Questo valore è uguale al numero
-        # dei core se non è richiesta l'espansione dei giorni.
-        cores_info['average_day_number_per_core'] = total_day_number / len(current_iteration_cores)
-
-        # Se richiesta, effettua l'espansione dei nomi dei pazienti e/o
-        # servizi, aggiornando la lista dei core dell'iterazione corrente.
-        if config['expand_core_patients'] or config['expand_core_services']:
+            # Numero medio di giorni in cui i core sono attivi,
+            # dopo l'espansione dei giorni. Questo valore è uguale al numero
+            # dei core se non è richiesta l'espansione dei giorni.
+            cores_info['average_day_number_per_core'] = total_day_number / len(current_iteration_cores)
+
+            # Se richiesta, effettua l'espansione dei nomi dei pazienti e/o
+            # servizi, aggiornando la lista dei core dell'iterazione corrente.
+            if config['expand_core_patients'] or config['expand_core_services']:
             
-            core_expansion_start_time = time.perf_counter()
+                core_expansion_start_time = time.perf_counter()
             
-            current_iteration_cores.extend(expand_core_patients_services(current_iteration_cores, max_possible_master_requests, master_instance, config['expand_core_patients'], config['expand_core_services'], config['max_expansions_per_core']))
+                current_iteration_cores.extend(expand_core_patients_services(current_iteration_cores, max_possible_master_requests, master_instance, config['expand_core_patients'], config['expand_core_services'], config['max_expansions_per_core'], core_expansion_engine, expansion_executor, expansion_workers))
             
-            core_expansion_end_time = time.perf_counter()
-            cores_info['expansion_time'] = core_expansion_end_time - core_expansion_start_time
+                core_expansion_end_time = time.perf_counter()
+                cores_info['expansion_time'] = core_expansion_end_time - core_expansion_start_time
             
-            print(f'[iter {iteration_index}] {len(current_iteration_cores)} total new cores are present after expansion.')
+                print(f'[iter {iteration_index}] {len(current_iteration_cores)} total new cores are present after expansion.')
         
-        core_postproc_start_time = time.perf_counter()
+            core_postproc_start_time = time.perf_counter()
 
-        # Se sono presenti più giorni, è possibile che alcuni core siano
-        # relativi a richieste impossibili.
-        if config['expand_core_days']:
-            current_iteration_cores = remove_core_days_without_exact_requests(current_iteration_cores, max_possible_master_requests)
-            print(f'[iter {iteration_index}] {len(current_iteration_cores)} new cores are remaining after removing impossible ones.')
+            # Se sono presenti più giorni, è possibile che alcuni core siano
+            # relativi a richieste impossibili.
+            if config['expand_core_days']:
+                current_iteration_cores = remove_core_days_without_exact_requests(current_iteration_cores, request_availability)
+                print(f'[iter {iteration_index}] {len(current_iteration_cores)} new cores are remaining after removing impossible ones.')
 
-        # Calcola e aggiorna i core togliendo eventuali duplicati
-        current_iteration_cores, all_iterations_cores = aggregate_and_remove_duplicate_cores(current_iteration_cores, all_iterations_cores)
+            # Calcola e aggiorna i core togliendo eventuali duplicati
+            current_iteration_cores, all_iterations_cores = aggregate_and_remove_duplicate_cores(current_iteration_cores, all_iterations_cores)
         
-        core_postproc_end_time = time.perf_counter()
-        cores_info['postproc_time'] = core_postproc_end_time - core_postproc_start_time
+            core_postproc_end_time = time.perf_counter()
+            cores_info['postproc_time'] = core_postproc_end_time - core_postproc_start_time
 
-        print(f'[iter {iteration_index}] {len(current_iteration_cores)} cores remaining after removing duplicates.')
+            print(f'[iter {iteration_index}] {len(current_iteration_cores)} cores remaining after removing duplicates.')
         
-        # Numero di core dopo le eventuali espansioni.
-        cores_info['core_number_post_name_expansion'] = len(current_iteration_cores)
+            # Numero di core dopo le eventuali espansioni.
+            cores_info['core_number_post_name_expansion'] = len(current_iteration_cores)
 
-        if len(current_iteration_cores) > 0:
+            if len(current_iteration_cores) > 0:
             
-            total_core_components_number = 0
-            for core in  current_iteration_cores:
-                total_core_components_number += len(core['components'])
+                total_core_components_number = 0
+                for core in  current_iteration_cores:
+                    total_core_components_number += len(core['components'])
             
-            # Numero medio di componenti dei core
-            cores_info['average_core_size_post_name_expansion'] = total_core_components_number / len(current_iteration_cores)
+                # Numero medio di componenti dei core
+                cores_info['average_core_size_post_name_expansion'] = total_core_components_number / len(current_iteration_cores)
         
-            # Se è presente almeno un core, aggiungi i vincoli nel modello MILP
-            # del master.
-            add_cores_constraints_to_master_model(master_model, current_iteration_cores)
-
-        # Salvataggio su file dei core di questa iterazione.
-        cores_file_path = cores_directory_path.joinpath(f'iter_{iteration_index}_cores.json')
-        with open(cores_file_path, 'w') as file:
-            json.dump(current_iteration_cores, file, indent=4)
+                # Se è presente almeno un core, aggiungi i vincoli nel modello MILP
+                # del master.
+                if use_core_cut_pool:
+                    cores_info.update(add_cores_constraints_to_cut_pool(master_model, core_cut_pool, all_iterations_cores, current_iteration_cores))
+                else:
+                    add_cores_constraints_to_master_model(master_model, current_iteration_cores)
+
+            # Numero di vincoli dei core attivi e complessivi nel master
+            cores_info.update(get_cores_constraints_info(master_model))
+            if use_core_cut_pool:
+                cores_info['aged_core_cuts'] = aged_core_cut_number
+                cores_info['reactivated_core_cuts'] = reactivated_core_cut_number
+
+            # Salvataggio su file dei core di questa iterazione.
+            cores_file_path = cores_directory_path.joinpath(f'iter_{iteration_index}_cores.json')
+            with open(cores_file_path, 'w') as file:
+                json.dump(current_iteration_cores, file, indent=4)
         
-        print(f'[iter {iteration_index}] Added {len(current_iteration_cores)} new cores to the master problem.')
+            print(f'[iter {iteration_index}] Added {len(current_iteration_cores)} new cores to the master problem.')
         
-        # Salvataggio su file dell'analisi dei core di questa
-        # iterazione.
-        cores_analysis_file_path = iteration_logs_directory_path.joinpath('core_info.json')
-        with open(cores_analysis_file_path, 'w') as file:
-            json.dump(cores_info, file, indent=4)
+            # Salvataggio su file dell'analisi dei core di questa
+            # iterazione.
+            cores_analysis_file_path = iteration_logs_directory_path.joinpath('core_info.json')
+            with open(cores_analysis_file_path, 'w') as file:
+                json.dump(cores_info, file, indent=4)
 
-        iteration_index += 1
+            iteration_index += 1
 
-        if iteration_index < max_iteration_number:
-            print(f'[iter {iteration_index}] Iteration {iteration_index} finished.')
-        else:
-            print(f'[iter {iteration_index}] [STOP] Iteration maximum {iteration_index} reached.')
+            if iteration_index < max_iteration_number:
+                print(f'[iter {iteration_index}] Iteration {iteration_index} finished.')
+            else:
+                print(f'[iter {iteration_index}] [STOP] Iteration maximum {iteration_index} reached.')
+
+    finally:
+        if subproblem_executor is not None:
+            subproblem_executor.shutdown(cancel_futures=True)
+        if expansion_executor is not None:
+            expansion_executor.shutdown(cancel_futures=True)
+
+    if subproblem_cache_directory_path is not None:
+        with open(logs_directory_path.joinpath('subproblem_cache_info.json'), 'w') as file:
+            json.dump(total_subproblem_cache_info, file, indent=4)
+        print(f'Subproblem cache: {total_subproblem_cache_info["hits"]} hits, {total_subproblem_cache_info["misses"]} misses over the whole run.')
+
+    if use_subproblem_heuristic:
+        with open(logs_directory_path.joinpath('subproblem_heuristic_info.json'), 'w') as file:
+            json.dump(total_subproblem_heuristic_info, file, indent=4)
+        print(f'Subproblem heuristic: {total_subproblem_heuristic_info["closed_days"]} days closed over the whole run.')
 
     total_end_time = time.perf_counter()
     print(f'End total solving process. Time elapsed: {total_end_time - total_start_time} seconds.')
\ No newline at end of file
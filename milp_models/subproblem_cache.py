@@ -0,0 +1,118 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+
+
+def get_canonical_subproblem_instance(subproblem_instance):
+    '''Funzione che ritorna la forma canonica di un'istanza del sottoproblema:
+    pazienti con priorità e richieste ordinate, operatori del giorno e soli
+    servizi effettivamente richiesti. Due istanze con la stessa forma canonica
+    hanno lo stesso insieme di soluzioni.'''
+
+    requested_service_names = set()
+    for patient in subproblem_instance['patients'].values():
+        for request in patient['requests']:
+            if type(request) is dict:
+                requested_service_names.add(request['service'])
+            else:
+                requested_service_names.add(request)
+
+    return {
+        'patients': subproblem_instance['patients'],
+        'day': subproblem_instance['day'],
+        'services': {s: subproblem_instance['services'][s] for s in sorted(requested_service_names)}
+    }
+
+
+def get_subproblem_instance_hash(subproblem_instance) -> str:
+    '''Funzione che ritorna un identificativo dell'istanza del sottoproblema,
+    calcolato sulla sua forma canonica.'''
+
+    canonical_instance = get_canonical_subproblem_instance(subproblem_instance)
+    canonical_string = json.dumps(canonical_instance, sort_keys=True, separators=(',', ':'))
+
+    return hashlib.sha256(canonical_string.encode('utf-8')).hexdigest()
+
+
+def get_subproblem_cache_key(subproblem_instance, config: dict) -> str:
+    '''Funzione che ritorna la chiave di un sottoproblema nella cache su disco.
+    Oltre all'istanza canonica la chiave dipende dal modello utilizzato e dalle
+    informazioni aggiuntive del sottoproblema, in modo che configurazioni
+    diverse non condividano risultati non equivalenti.'''
+
+    cache_key_data = {
+        'instance': get_canonical_subproblem_instance(subproblem_instance),
+        'model': config['subproblem_config']['model'],
+        'additional_info': config['additional_subproblem_info']
+    }
+    cache_key_string = json.dumps(cache_key_data, sort_keys=True, separators=(',', ':'))
+
+    return hashlib.sha256(cache_key_string.encode('utf-8')).hexdigest()
+
+
+def load_subproblem_from_cache(cache_directory_path: Path, cache_key: str):
+    '''Funzione che legge dalla cache la tripla (risultati, informazioni del
+    solver, testo del log) associata alla chiave, oppure None se non presente.
+    La data di modifica del file viene aggiornata per l'eliminazione LRU.'''
+
+    cache_file_path = cache_directory_path.joinpath(f'{cache_key}.json')
+
+    # Il file può essere eliminato da un altro processo in qualsiasi momento:
+    # in quel caso la lettura viene considerata un fallimento.
+    try:
+        with open(cache_file_path, 'r') as file:
+            cache_entry = json.load(file)
+        os.utime(cache_file_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    return cache_entry['results'], cache_entry['info'], cache_entry['log']
+
+
+def store_subproblem_to_cache(cache_directory_path: Path, cache_key: str, subproblem_results, subproblem_info, log_text: str):
+    '''Funzione che salva nella cache i dati di un sottoproblema risolto. Il
+    file viene prima scritto con un nome temporaneo e poi rinominato, così che
+    processi concorrenti non possano mai leggere un file parziale.'''
+
+    cache_entry = {
+        'results': subproblem_results,
+        'info': subproblem_info,
+        'log': log_text
+    }
+
+    file_descriptor, temporary_file_name = tempfile.mkstemp(dir=cache_directory_path, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'w') as file:
+            json.dump(cache_entry, file)
+        os.replace(temporary_file_name, cache_directory_path.joinpath(f'{cache_key}.json'))
+    except Exception:
+        Path(temporary_file_name).unlink(missing_ok=True)
+        raise
+
+
+def evict_subproblem_cache(cache_directory_path: Path, max_size: int) -> int:
+    '''Funzione che elimina i file della cache usati meno recentemente fino a
+    che la dimensione complessiva non supera 'max_size' byte. Ritorna il
+    numero di file eliminati.'''
+
+    cache_files = []
+    total_size = 0
+    for cache_file_path in cache_directory_path.glob('*.json'):
+        try:
+            file_stat = cache_file_path.stat()
+        except FileNotFoundError:
+            continue
+        cache_files.append((file_stat.st_mtime, file_stat.st_size, cache_file_path))
+        total_size += file_stat.st_size
+
+    evicted_file_number = 0
+    for _, file_size, cache_file_path in sorted(cache_files):
+        if total_size <= max_size:
+            break
+        cache_file_path.unlink(missing_ok=True)
+        total_size -= file_size
+        evicted_file_number += 1
+
+    return evicted_file_number
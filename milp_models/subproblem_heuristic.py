@@ -0,0 +1,201 @@
+def get_request_candidate_operators(subproblem_instance, request) -> tuple:
+    '''Funzione che ritorna il servizio di una richiesta e la lista ordinata
+    delle coppie (care_unit, operator) che possono svolgerla. Nelle istanze
+    del sottoproblema con assegnazione la richiesta è il nome del servizio,
+    in quelle senza assegnazione contiene già unità di cura e operatore.'''
+
+    if type(request) is dict:
+        service_name = request['service']
+        care_unit_name = request['care_unit']
+        operator_names = [request['operator']] if request['operator'] in subproblem_instance['day'].get(care_unit_name, {}) else []
+    else:
+        service_name = request
+        care_unit_name = subproblem_instance['services'][service_name]['care_unit']
+        operator_names = sorted(subproblem_instance['day'].get(care_unit_name, {}).keys())
+
+    service_duration = subproblem_instance['services'][service_name]['duration']
+
+    candidate_operators = []
+    for operator_name in operator_names:
+        if subproblem_instance['day'][care_unit_name][operator_name]['duration'] >= service_duration:
+            candidate_operators.append((care_unit_name, operator_name))
+
+    return service_name, candidate_operators
+
+
+def get_earliest_start(busy_intervals: list, first_start: int, last_start: int, duration: int):
+    '''Funzione che ritorna il primo tempo di inizio in [first_start,
+    last_start] per cui l'intervallo di durata 'duration' non si sovrappone
+    a nessuno degli intervalli occupati (ordinati per inizio), oppure None.'''
+
+    start = first_start
+    for busy_start, busy_end in busy_intervals:
+        if busy_start >= start + duration:
+            break
+        if busy_end > start:
+            start = busy_end
+
+    if start > last_start:
+        return None
+    return start
+
+
+def get_subproblem_heuristic_results(subproblem_instance, fixed_schedule: list = None) -> dict:
+    '''Funzione che calcola una soluzione ammissibile del sottoproblema con uno
+    scheduling a lista: le richieste sono considerate in ordine decrescente di
+    durata pesata per la priorità del paziente ed ognuna viene inserita al
+    primo tempo di inizio possibile fra gli operatori candidati, senza
+    sovrapporsi ai servizi già assegnati all'operatore ed al paziente. Le
+    richieste che non trovano posto vengono rigettate. Se viene fornita una
+    schedulazione di partenza (ad esempio quella di un'iterazione precedente
+    dello stesso giorno), le sue assegnazioni delle richieste ancora presenti
+    vengono mantenute e solo le altre richieste sono inserite. I risultati
+    hanno lo stesso formato (ed ordinamento) di quelli dei modelli.'''
+
+    # Lista di tuple (peso, durata, p, s, operatori candidati)
+    requests = []
+    for patient_name, patient in subproblem_instance['patients'].items():
+        for request in patient['requests']:
+            service_name, candidate_operators = get_request_candidate_operators(subproblem_instance, request)
+            service_duration = subproblem_instance['services'][service_name]['duration']
+            requests.append((service_duration * patient['priority'], service_duration, patient_name, service_name, candidate_operators))
+
+    requests.sort(key=lambda r: (-r[0], -r[1], r[2], r[3]))
+
+    # Intervalli [inizio, fine) già occupati per operatore e paziente
+    operator_busy_intervals = {}
+    patient_busy_intervals = {}
+
+    scheduled_requests = []
+    rejected_requests = []
+
+    # Le assegnazioni della schedulazione di partenza sono mantenute solo se
+    # la richiesta è ancora presente con lo stesso operatore fra i candidati;
+    # togliere servizi non crea sovrapposizioni
+    if fixed_schedule is not None:
+
+        candidate_operators_by_request = {(patient_name, service_name): candidate_operators for _, _, patient_name, service_name, candidate_operators in requests}
+
+        for schedule in fixed_schedule:
+
+            patient_name = schedule['patient']
+            service_name = schedule['service']
+            if (schedule['care_unit'], schedule['operator']) not in candidate_operators_by_request.get((patient_name, service_name), []):
+                continue
+            del candidate_operators_by_request[patient_name, service_name]
+
+            end = schedule['time'] + subproblem_instance['services'][service_name]['duration']
+            operator_busy_intervals.setdefault((schedule['care_unit'], schedule['operator']), []).append((schedule['time'], end))
+            patient_busy_intervals.setdefault(patient_name, []).append((schedule['time'], end))
+
+            scheduled_requests.append(schedule.copy())
+
+        requests = [request for request in requests if (request[2], request[3]) in candidate_operators_by_request]
+
+    for _, service_duration, patient_name, service_name, candidate_operators in requests:
+
+        patient_intervals = patient_busy_intervals.get(patient_name, [])
+
+        best_assignment = None
+        for care_unit_name, operator_name in candidate_operators:
+
+            operator = subproblem_instance['day'][care_unit_name][operator_name]
+            busy_intervals = sorted(operator_busy_intervals.get((care_unit_name, operator_name), []) + patient_intervals)
+
+            start = get_earliest_start(busy_intervals, operator['start'], operator['start'] + operator['duration'] - service_duration, service_duration)
+            if start is None:
+                continue
+
+            if best_assignment is None or start < best_assignment[0]:
+                best_assignment = (start, care_unit_name, operator_name)
+
+        if best_assignment is None:
+            rejected_requests.append({
+                'patient': patient_name,
+                'service': service_name
+            })
+            continue
+
+        start, care_unit_name, operator_name = best_assignment
+
+        operator_busy_intervals.setdefault((care_unit_name, operator_name), []).append((start, start + service_duration))
+        patient_busy_intervals.setdefault(patient_name, []).append((start, start + service_duration))
+
+        scheduled_requests.append({
+            'patient': patient_name,
+            'service': service_name,
+            'care_unit': care_unit_name,
+            'operator': operator_name,
+            'time': start
+        })
+
+    # Ordina le chiavi
+    scheduled_requests.sort(key=lambda v: (v['patient'], v['service'], v['care_unit'], v['operator'], v['time']))
+    rejected_requests.sort(key=lambda v: (v['patient'], v['service']))
+
+    return {
+        'scheduled': scheduled_requests,
+        'rejected': rejected_requests
+    }
+
+
+def get_subproblem_start_values(subproblem_results, variable_indices: dict) -> dict:
+    '''Funzione che ritorna i valori iniziali delle variabili del modello del
+    sottoproblema corrispondenti ai risultati forniti, nella forma {nome della
+    variabile: {chiave: valore}}. 'variable_indices' contiene gli indici delle
+    variabili presenti nel modello (con assegnazione o senza); le variabili
+    ausiliarie di disgiunzione sono ricavate dall'ordine dei servizi.'''
+
+    # I tempi del modello sono spostati di uno rispetto ai risultati
+    scheduled_times = {}
+    scheduled_operators = {}
+    for schedule in subproblem_results['scheduled']:
+        scheduled_times[schedule['patient'], schedule['service']] = schedule['time'] + 1
+        scheduled_operators[schedule['patient'], schedule['service']] = (schedule['care_unit'], schedule['operator'])
+
+    def is_done(p, s, c, o) -> bool:
+        return scheduled_operators.get((p, s)) == (c, o)
+
+    def is_before(p, s, pp, ss) -> bool:
+        return scheduled_times[p, s] < scheduled_times[pp, ss]
+
+    start_values = {}
+    for name, index in variable_indices.items():
+
+        values = {}
+        for key in index:
+
+            if name == 'satisfy':
+                value = 1 if key in scheduled_times else 0
+
+            elif name == 'time' and len(key) == 2:
+                value = scheduled_times.get(key, 0)
+            elif name == 'time':
+                value = scheduled_times[key[:2]] if is_done(*key) else 0
+
+            elif name == 'do':
+                value = 1 if is_done(*key) else 0
+
+            # Il secondo servizio precede il primo oppure è l'unico svolto
+            elif name == 'patient_overlap':
+                p, s, ss = key
+                value = 1 if (p, ss) in scheduled_times and ((p, s) not in scheduled_times or is_before(p, s, p, ss)) else 0
+            elif name == 'overlap':
+                p, s, c, o, pp, ss, cc, oo = key
+                value = 1 if is_done(pp, ss, cc, oo) and (not is_done(p, s, c, o) or is_before(p, s, pp, ss)) else 0
+
+            # Solo se entrambi i servizi sono svolti dall'operatore
+            elif name in ['operator_overlap_1', 'operator_overlap_2']:
+                p, s, pp, ss, c, o = key
+                value = 0
+                if is_done(p, s, c, o) and is_done(pp, ss, c, o):
+                    value = 1 if is_before(p, s, pp, ss) == (name == 'operator_overlap_1') else 0
+
+            else:
+                continue
+
+            values[key] = value
+
+        start_values[name] = values
+
+    return start_values
@@ -1,30 +1,15 @@
 import pyomo.environ as pyo
+import numpy as np
 
+from milp_models.matrix_backend import get_matrix_model, add_matrix_variables, get_matrix_columns
+from milp_models.matrix_backend import add_matrix_constraints, add_matrix_sum_constraints, add_matrix_objective_terms
 
-def get_fat_subproblem_model(instance, additional_info):
-    '''Funzione che ritorna il modello MILP del sottoproblema con
-    assegnazione dell'operatore.'''
-
-    model = pyo.ConcreteModel()
-    
-    # INSIEMI ##################################################################
-   
-    # Nomi delle unità di cura
-    model.care_units = pyo.Set(initialize=sorted([c for c in instance['day'].keys()]))
-
-    # Tutte le coppie (care_unit, operator)
-    model.operators = pyo.Set(initialize=sorted([(c, o)
-        for c, cu in instance['day'].items()
-        for o in cu.keys()]))
-
-    # PARAMETRI ################################################################
-
-    # max_time[c] è il massimo tempo di fine degli operatori in c
-    @model.Param(model.care_units, domain=pyo.NonNegativeIntegers, mutable=False)
-    def max_time(model, c):
-        return max([o['start'] + o['duration'] for o in instance['day'][c].values()]) + 1
 
-    # INDICI ###################################################################
+def get_fat_subproblem_model_indices(instance, additional_info) -> dict:
+    '''Funzione che ritorna gli indici ordinati del sottoproblema con
+    assegnazione dell'operatore ed i raggruppamenti delle quadruple
+    (p, s, c, o) usati dai vincoli. Gli indici sono condivisi dal modello
+    Pyomo e da quello matriciale.'''
 
     # Coppie (p, s) per ogni richiesta
     satisfy_index = set()
@@ -38,6 +23,10 @@ def get_fat_subproblem_model(instance, additional_info):
     # Tuple (p1, s1, p2, s2, c, o)
     operator_overlap_index = set()
 
+    # Tuple (p1, s1, p2, s2, c, o) delle coppie che non possono essere svolte
+    # entrambe dall'operatore (la somma delle durate supera il suo turno)
+    operator_exclusion_index = set()
+
     for p, patient in instance['patients'].items():
         for s in patient['requests']:
             
@@ -69,24 +58,91 @@ def get_fat_subproblem_model(instance, additional_info):
                 
                 patient_overlap_index.add((p, s1, s2))
 
+    do_index = sorted(do_index)
+
+    # Raggruppamenti delle quadruple (p, s, c, o) nell'ordine dell'indice
+    # ordinato, usati dai vincoli al posto di scorrere tutto 'do_index'
+    assignments_by_request = {}
+    requests_by_operator = {}
     for p, s, c, o in do_index:
-        for pp, ss, cc, oo in do_index:
-            
-            # Deve essere lo stesso operatore
-            if c != cc or o != oo:
-                continue
-            
-            # Controllo sulla simmetria
-            if p >= pp or (p == pp and s >= ss):
-                continue
+        assignments_by_request.setdefault((p, s), []).append((c, o))
+        requests_by_operator.setdefault((c, o), []).append((p, s))
+
+    # Le coppie di richieste sono generate solo all'interno dello stesso
+    # operatore: essendo le richieste ordinate, si considerano solo le coppie
+    # (i, j) con i < j per evitare quelle simmetriche
+    for (c, o), requests in requests_by_operator.items():
+        
+        operator_duration = instance['day'][c][o]['duration']
+        
+        for i in range(len(requests) - 1):
+            p, s = requests[i]
             
-            operator_overlap_index.add((p, s, pp, ss, c, o))
+            for j in range(i + 1, len(requests)):
+                pp, ss = requests[j]
+
+                # Le richieste dello stesso paziente sono già disgiunte dai
+                # vincoli sul paziente
+                if p == pp:
+                    continue
+
+                # Se le due richieste non possono essere entrambe assegnate
+                # all'operatore, la disgiunzione è sostituita da un vincolo di
+                # mutua esclusione
+                if 'use_operator_overlap_filter' in additional_info and instance['services'][s]['duration'] + instance['services'][ss]['duration'] > operator_duration:
+                    operator_exclusion_index.add((p, s, pp, ss, c, o))
+                    continue
+                
+                operator_overlap_index.add((p, s, pp, ss, c, o))
+
+    return {
+        'satisfy_index': sorted(satisfy_index),
+        'do_index': do_index,
+        'patient_overlap_index': sorted(patient_overlap_index),
+        'operator_overlap_index': sorted(operator_overlap_index),
+        'operator_exclusion_index': sorted(operator_exclusion_index),
+        'assignments_by_request': assignments_by_request,
+        'requests_by_operator': requests_by_operator
+    }
+
+
+def get_fat_subproblem_model(instance, additional_info):
+    '''Funzione che ritorna il modello MILP del sottoproblema con
+    assegnazione dell'operatore.'''
+
+    model = pyo.ConcreteModel()
+    
+    # INSIEMI ##################################################################
+   
+    # Nomi delle unità di cura
+    model.care_units = pyo.Set(initialize=sorted([c for c in instance['day'].keys()]))
+
+    # Tutte le coppie (care_unit, operator)
+    model.operators = pyo.Set(initialize=sorted([(c, o)
+        for c, cu in instance['day'].items()
+        for o in cu.keys()]))
+
+    # PARAMETRI ################################################################
+
+    # max_time[c] è il massimo tempo di fine degli operatori in c
+    @model.Param(model.care_units, domain=pyo.NonNegativeIntegers, mutable=False)
+    def max_time(model, c):
+        return max([o['start'] + o['duration'] for o in instance['day'][c].values()]) + 1
 
-    model.satisfy_index = pyo.Set(initialize=sorted(satisfy_index))
-    model.do_index = pyo.Set(initialize=sorted(do_index))
-    model.patient_overlap_index = pyo.Set(initialize=sorted(patient_overlap_index))
-    model.operator_overlap_index = pyo.Set(initialize=sorted(operator_overlap_index))
-    del satisfy_index, do_index, patient_overlap_index, operator_overlap_index
+    # INDICI ###################################################################
+
+    indices = get_fat_subproblem_model_indices(instance, additional_info)
+
+    model.satisfy_index = pyo.Set(initialize=indices['satisfy_index'])
+    model.do_index = pyo.Set(initialize=indices['do_index'])
+    model.patient_overlap_index = pyo.Set(initialize=indices['patient_overlap_index'])
+    model.operator_overlap_index = pyo.Set(initialize=indices['operator_overlap_index'])
+    if 'use_operator_overlap_filter' in additional_info:
+        model.operator_exclusion_index = pyo.Set(initialize=indices['operator_exclusion_index'])
+
+    assignments_by_request = indices['assignments_by_request']
+    requests_by_operator = indices['requests_by_operator']
+    del indices
 
     def get_time_bounds(model, p: str, s: str) -> tuple[int, int]:
         '''Ritorna (0, T) dove T è l'ultimo slot temporale utile per svolgere
@@ -129,7 +185,7 @@ def get_fat_subproblem_model(instance, additional_info):
     # Se una richiesta viene soddisfatta, viene assegnata una volta sola
     @model.Constraint(model.satisfy_index)
     def link_satisfy_to_do_variables(model, p, s):
-        return model.satisfy[p, s] == pyo.quicksum([model.do[pp, ss, c, o] for pp, ss, c, o in model.do_index if p == pp and s == ss and c == instance['services'][s]['care_unit']])
+        return model.satisfy[p, s] == pyo.quicksum([model.do[p, s, c, o] for c, o in assignments_by_request.get((p, s), [])])
     
     # Rispetto dei tempi di attività degli operatori
     @model.Constraint(model.do_index)
@@ -191,13 +247,20 @@ def get_fat_subproblem_model(instance, additional_info):
     def operator_overlap_auxiliary_constraint_3(model, p, s, pp, ss, c, o):
         return model.do[pp, ss, c, o] >= model.operator_overlap_1[p, s, pp, ss, c, o] + model.operator_overlap_2[p, s, pp, ss, c, o]
 
+    # Coppie di richieste che non possono essere assegnate allo stesso
+    # operatore in quanto la somma delle loro durate supera il suo turno
+    if 'use_operator_overlap_filter' in additional_info:
+        @model.Constraint(model.operator_exclusion_index)
+        def operator_exclusion(model, p, s, pp, ss, c, o):
+            return model.do[p, s, c, o] + model.do[pp, ss, c, o] <= 1
+
     # La durata totale dei servizi assegnati ad un operatore non può superare la
     # durata di attività di quest'ultimo
     if 'use_redundant_operator_cut' in additional_info:
         @model.Constraint(model.operators)
         def respect_operator_duration(model, c, o):
             
-            tuples_affected = [(p, s) for p, s, cc, oo in model.do_index if cc == c and oo == o]
+            tuples_affected = requests_by_operator.get((c, o), [])
             
             if len(tuples_affected) == 0 or sum(instance['services'][s]['duration'] for _, s in tuples_affected) <= instance['day'][c][o]['duration']:
                 return pyo.Constraint.Skip
@@ -215,6 +278,145 @@ def get_fat_subproblem_model(instance, additional_info):
     return model
 
 
+def get_fat_subproblem_matrix_model(instance, additional_info):
+    '''Funzione che ritorna il modello matriciale del sottoproblema con
+    assegnazione dell'operatore, con la stessa formulazione del modello Pyomo
+    ma costruito direttamente per colonne e righe.'''
+
+    indices = get_fat_subproblem_model_indices(instance, additional_info)
+    satisfy_index = indices['satisfy_index']
+    do_index = indices['do_index']
+    patient_overlap_index = indices['patient_overlap_index']
+    operator_overlap_index = indices['operator_overlap_index']
+    operator_exclusion_index = indices['operator_exclusion_index']
+
+    # max_time[c] è il massimo tempo di fine degli operatori in c
+    max_time = {c: max([o['start'] + o['duration'] for o in instance['day'][c].values()]) + 1 for c in instance['day'].keys()}
+
+    duration = {s: service['duration'] for s, service in instance['services'].items()}
+    care_unit = {s: service['care_unit'] for s, service in instance['services'].items()}
+
+    model = get_matrix_model()
+
+    # VARIABILI ################################################################
+
+    # L'ultimo slot utile di ogni richiesta coincide con il limite superiore
+    # di 'time' del modello Pyomo
+    time_upper_bounds = np.array([max_time[care_unit[s]] - duration[s] for _, s in satisfy_index], dtype=np.float64)
+
+    add_matrix_variables(model, 'satisfy', satisfy_index, 0, 1, True)
+    add_matrix_variables(model, 'time', satisfy_index, 0, time_upper_bounds, True)
+    add_matrix_variables(model, 'do', do_index, 0, 1, True)
+    add_matrix_variables(model, 'patient_overlap', patient_overlap_index, 0, 1, True)
+    add_matrix_variables(model, 'operator_overlap_1', operator_overlap_index, 0, 1, True)
+    add_matrix_variables(model, 'operator_overlap_2', operator_overlap_index, 0, 1, True)
+
+    satisfy_columns = get_matrix_columns(model, 'satisfy', satisfy_index)
+    time_columns = get_matrix_columns(model, 'time', satisfy_index)
+    do_columns = get_matrix_columns(model, 'do', do_index)
+
+    # VINCOLI ##################################################################
+
+    # Vincoli che forzano 'time' ad essere un valore positivo se e solo se
+    # 'satisfy' è maggiore di zero
+    add_matrix_constraints(model, [(satisfy_columns, 1.0), (time_columns, -1.0)], -np.inf, 0.0)
+    add_matrix_constraints(model, [(time_columns, 1.0), (satisfy_columns, -time_upper_bounds)], -np.inf, 0.0)
+
+    # Se una richiesta viene soddisfatta, viene assegnata una volta sola
+    do_variable_columns = model['variables']['do']['columns']
+    rows = []
+    for p, s in satisfy_index:
+        columns = [do_variable_columns[p, s, c, o] for c, o in indices['assignments_by_request'].get((p, s), [])]
+        rows.append(([model['variables']['satisfy']['columns'][p, s]] + columns, [1.0] + [-1.0] * len(columns)))
+    add_matrix_sum_constraints(model, rows, 0.0, 0.0)
+
+    # Rispetto dei tempi di attività degli operatori
+    do_time_columns = get_matrix_columns(model, 'time', [(p, s) for p, s, _, _ in do_index])
+    operator_starts = np.array([instance['day'][c][o]['start'] for _, _, c, o in do_index], dtype=np.float64)
+    operator_durations = np.array([instance['day'][c][o]['duration'] for _, _, c, o in do_index], dtype=np.float64)
+    do_max_times = np.array([max_time[c] for _, _, c, _ in do_index], dtype=np.float64)
+    do_durations = np.array([duration[s] for _, s, _, _ in do_index], dtype=np.float64)
+
+    add_matrix_constraints(model, [(do_columns, operator_starts + 1), (do_time_columns, -1.0)], -np.inf, 0.0)
+    add_matrix_constraints(model, [(do_time_columns, 1.0), (do_columns, do_max_times)], -np.inf, operator_starts + 1 + operator_durations + do_max_times - do_durations)
+
+    # Disgiunzione dei servizi dello stesso paziente
+    first_satisfy_columns = get_matrix_columns(model, 'satisfy', [(p, s) for p, s, _ in patient_overlap_index])
+    second_satisfy_columns = get_matrix_columns(model, 'satisfy', [(p, ss) for p, _, ss in patient_overlap_index])
+    first_time_columns = get_matrix_columns(model, 'time', [(p, s) for p, s, _ in patient_overlap_index])
+    second_time_columns = get_matrix_columns(model, 'time', [(p, ss) for p, _, ss in patient_overlap_index])
+    patient_overlap_columns = get_matrix_columns(model, 'patient_overlap', patient_overlap_index)
+    first_durations = np.array([duration[s] for _, s, _ in patient_overlap_index], dtype=np.float64)
+    second_durations = np.array([duration[ss] for _, _, ss in patient_overlap_index], dtype=np.float64)
+    first_max_times = np.array([max_time[care_unit[s]] for _, s, _ in patient_overlap_index], dtype=np.float64)
+    second_max_times = np.array([max_time[care_unit[ss]] for _, _, ss in patient_overlap_index], dtype=np.float64)
+
+    add_matrix_constraints(model, [
+        (first_time_columns, 1.0), (first_satisfy_columns, first_durations),
+        (second_time_columns, -1.0), (patient_overlap_columns, first_max_times)
+    ], -np.inf, first_max_times)
+    add_matrix_constraints(model, [
+        (second_time_columns, 1.0), (second_satisfy_columns, second_durations),
+        (first_time_columns, -1.0), (patient_overlap_columns, -second_max_times)
+    ], -np.inf, 0.0)
+
+    # Vincoli ausilari che regolano le variabili 'patient_overlap'
+    add_matrix_constraints(model, [(patient_overlap_columns, 1.0), (second_satisfy_columns, -1.0)], -np.inf, 0.0)
+    add_matrix_constraints(model, [(second_satisfy_columns, 1.0), (first_satisfy_columns, -1.0), (patient_overlap_columns, -1.0)], -np.inf, 0.0)
+
+    # Disgiunzione dei servizi dello stesso operatore
+    first_do_columns = get_matrix_columns(model, 'do', [(p, s, c, o) for p, s, _, _, c, o in operator_overlap_index])
+    second_do_columns = get_matrix_columns(model, 'do', [(pp, ss, c, o) for _, _, pp, ss, c, o in operator_overlap_index])
+    first_time_columns = get_matrix_columns(model, 'time', [(p, s) for p, s, _, _, _, _ in operator_overlap_index])
+    second_time_columns = get_matrix_columns(model, 'time', [(pp, ss) for _, _, pp, ss, _, _ in operator_overlap_index])
+    operator_overlap_1_columns = get_matrix_columns(model, 'operator_overlap_1', operator_overlap_index)
+    operator_overlap_2_columns = get_matrix_columns(model, 'operator_overlap_2', operator_overlap_index)
+    first_durations = np.array([duration[s] for _, s, _, _, _, _ in operator_overlap_index], dtype=np.float64)
+    second_durations = np.array([duration[ss] for _, _, _, ss, _, _ in operator_overlap_index], dtype=np.float64)
+    operator_max_times = np.array([max_time[c] for _, _, _, _, c, _ in operator_overlap_index], dtype=np.float64)
+
+    add_matrix_constraints(model, [
+        (first_time_columns, 1.0), (first_do_columns, first_durations),
+        (second_time_columns, -1.0), (operator_overlap_1_columns, operator_max_times)
+    ], -np.inf, operator_max_times)
+    add_matrix_constraints(model, [
+        (second_time_columns, 1.0), (second_do_columns, second_durations),
+        (first_time_columns, -1.0), (operator_overlap_2_columns, operator_max_times)
+    ], -np.inf, operator_max_times)
+
+    # Vincoli ausilari che regolano le variabili 'operator_overlap'
+    add_matrix_constraints(model, [(first_do_columns, 1.0), (second_do_columns, 1.0), (operator_overlap_1_columns, -1.0), (operator_overlap_2_columns, -1.0)], -np.inf, 1.0)
+    add_matrix_constraints(model, [(operator_overlap_1_columns, 1.0), (operator_overlap_2_columns, 1.0), (first_do_columns, -1.0)], -np.inf, 0.0)
+    add_matrix_constraints(model, [(operator_overlap_1_columns, 1.0), (operator_overlap_2_columns, 1.0), (second_do_columns, -1.0)], -np.inf, 0.0)
+
+    # Coppie di richieste che non possono essere assegnate allo stesso
+    # operatore in quanto la somma delle loro durate supera il suo turno
+    if 'use_operator_overlap_filter' in additional_info:
+        add_matrix_constraints(model, [
+            (get_matrix_columns(model, 'do', [(p, s, c, o) for p, s, _, _, c, o in operator_exclusion_index]), 1.0),
+            (get_matrix_columns(model, 'do', [(pp, ss, c, o) for _, _, pp, ss, c, o in operator_exclusion_index]), 1.0)
+        ], -np.inf, 1.0)
+
+    # La durata totale dei servizi assegnati ad un operatore non può superare la
+    # durata di attività di quest'ultimo
+    if 'use_redundant_operator_cut' in additional_info:
+        rows = []
+        upper_bounds = []
+        for c, o in sorted([(c, o) for c, cu in instance['day'].items() for o in cu.keys()]):
+            tuples_affected = indices['requests_by_operator'].get((c, o), [])
+            if len(tuples_affected) == 0 or sum(duration[s] for _, s in tuples_affected) <= instance['day'][c][o]['duration']:
+                continue
+            rows.append(([do_variable_columns[p, s, c, o] for p, s in tuples_affected], [duration[s] for _, s in tuples_affected]))
+            upper_bounds.append(instance['day'][c][o]['duration'])
+        add_matrix_sum_constraints(model, rows, -np.inf, upper_bounds)
+
+    # FUNZIONE OBIETTIVO #######################################################
+
+    add_matrix_objective_terms(model, satisfy_columns, [duration[s] * instance['patients'][p]['priority'] for p, s in satisfy_index])
+
+    return model
+
+
 def get_results_from_fat_subproblem_model(model):
     '''Funzione che ritorna i risultati (inseriti e rigettati) contenuti nel
     modello del sottoproblema risolto.'''
@@ -252,30 +454,10 @@ def get_results_from_fat_subproblem_model(model):
     }
 
 
-def get_slim_subproblem_model(instance, additional_info):
-    '''Funzione che ritorna il modello MILP del sottoproblema senza
-    assegnazione dell'operatore.'''
-
-    model = pyo.ConcreteModel()
-    
-    # INSIEMI ##################################################################
-   
-    # Nomi delle unità di cura
-    model.care_units = pyo.Set(initialize=sorted([c for c in instance['day'].keys()]))
-
-    # Tutte le coppie (care_unit, operator)
-    model.operators = pyo.Set(initialize=sorted([(c, o)
-        for c, cu in instance['day'].items()
-        for o in cu.keys()]))
-
-    # PARAMETRI ################################################################
-
-    # max_time[c] è il massimo tempo di fine degli operatori in c
-    @model.Param(model.care_units, domain=pyo.NonNegativeIntegers, mutable=False)
-    def max_time(model, c):
-        return max([o['start'] + o['duration'] for o in instance['day'][c].values()]) + 1
-
-    # INDICI ###################################################################
+def get_slim_subproblem_model_indices(instance) -> dict:
+    '''Funzione che ritorna gli indici ordinati del sottoproblema senza
+    assegnazione dell'operatore. Gli indici sono condivisi dal modello Pyomo e
+    da quello matriciale.'''
 
     # Quadruple (p, s, c, o) per ogni possibile assegnamento valido
     do_index = set()
@@ -306,17 +488,51 @@ def get_slim_subproblem_model(instance, additional_info):
             
             overlap_index.add((p, s, c, o, pp, ss, cc, oo))
 
-    model.do_index = pyo.Set(initialize=sorted(do_index))
-    model.overlap_index = pyo.Set(initialize=sorted(overlap_index))
-    del do_index, overlap_index
+    return {
+        'do_index': sorted(do_index),
+        'overlap_index': sorted(overlap_index)
+    }
+
+
+def get_slim_subproblem_model(instance, additional_info):
+    '''Funzione che ritorna il modello MILP del sottoproblema senza
+    assegnazione dell'operatore.'''
+
+    model = pyo.ConcreteModel()
+    
+    # INSIEMI ##################################################################
+   
+    # Nomi delle unità di cura
+    model.care_units = pyo.Set(initialize=sorted([c for c in instance['day'].keys()]))
+
+    # Tutte le coppie (care_unit, operator)
+    model.operators = pyo.Set(initialize=sorted([(c, o)
+        for c, cu in instance['day'].items()
+        for o in cu.keys()]))
+
+    # PARAMETRI ################################################################
+
+    # max_time[c] è il massimo tempo di fine degli operatori in c
+    @model.Param(model.care_units, domain=pyo.NonNegativeIntegers, mutable=False)
+    def max_time(model, c):
+        return max([o['start'] + o['duration'] for o in instance['day'][c].values()]) + 1
+
+    # INDICI ###################################################################
+
+    indices = get_slim_subproblem_model_indices(instance)
+
+    model.do_index = pyo.Set(initialize=indices['do_index'])
+    model.overlap_index = pyo.Set(initialize=indices['overlap_index'])
+    del indices
 
     def get_time_bounds(model, p: str, s: str, c: str, o: str) -> tuple[int, int]:
         '''Ritorna (0, T) dove T è l'ultimo slot temporale utile per svolgere
-        il servizio da un operatore dell'unità di cura corretta.'''
+        il servizio con l'operatore (i tempi sono spostati di uno). Il limite
+        inferiore è zero perché 'time' vale zero se il servizio non è svolto.'''
 
         service_duration = instance['services'][s]['duration']
 
-        operator_end = instance['day'][c][o]['duration']
+        operator_end = instance['day'][c][o]['start'] + 1 + instance['day'][c][o]['duration']
         
         return (0, operator_end - service_duration)
 
@@ -377,6 +593,74 @@ def get_slim_subproblem_model(instance, additional_info):
     return model
 
 
+def get_slim_subproblem_matrix_model(instance, additional_info):
+    '''Funzione che ritorna il modello matriciale del sottoproblema senza
+    assegnazione dell'operatore, con la stessa formulazione del modello Pyomo
+    ma costruito direttamente per colonne e righe.'''
+
+    indices = get_slim_subproblem_model_indices(instance)
+    do_index = indices['do_index']
+    overlap_index = indices['overlap_index']
+
+    # max_time[c] è il massimo tempo di fine degli operatori in c
+    max_time = {c: max([o['start'] + o['duration'] for o in instance['day'][c].values()]) + 1 for c in instance['day'].keys()}
+
+    duration = {s: service['duration'] for s, service in instance['services'].items()}
+
+    model = get_matrix_model()
+
+    # VARIABILI ################################################################
+
+    operator_starts = np.array([instance['day'][c][o]['start'] for _, _, c, o in do_index], dtype=np.float64)
+    operator_durations = np.array([instance['day'][c][o]['duration'] for _, _, c, o in do_index], dtype=np.float64)
+    do_durations = np.array([duration[s] for _, s, _, _ in do_index], dtype=np.float64)
+
+    add_matrix_variables(model, 'time', do_index, 0, operator_starts + 1 + operator_durations - do_durations, True)
+    add_matrix_variables(model, 'do', do_index, 0, 1, True)
+    add_matrix_variables(model, 'overlap', overlap_index, 0, 1, True)
+
+    time_columns = get_matrix_columns(model, 'time', do_index)
+    do_columns = get_matrix_columns(model, 'do', do_index)
+
+    # VINCOLI ##################################################################
+
+    # Rispetto dei tempi di attività degli operatori
+    add_matrix_constraints(model, [(do_columns, operator_starts + 1), (time_columns, -1.0)], -np.inf, 0.0)
+    add_matrix_constraints(model, [(time_columns, 1.0), (do_columns, -(operator_starts + 1 + operator_durations - do_durations))], -np.inf, 0.0)
+
+    # Disgiunzione dei servizi dello stesso paziente o operatore
+    first_keys = [(p, s, c, o) for p, s, c, o, _, _, _, _ in overlap_index]
+    second_keys = [(pp, ss, cc, oo) for _, _, _, _, pp, ss, cc, oo in overlap_index]
+    first_time_columns = get_matrix_columns(model, 'time', first_keys)
+    second_time_columns = get_matrix_columns(model, 'time', second_keys)
+    first_do_columns = get_matrix_columns(model, 'do', first_keys)
+    second_do_columns = get_matrix_columns(model, 'do', second_keys)
+    overlap_columns = get_matrix_columns(model, 'overlap', overlap_index)
+    first_durations = np.array([duration[s] for _, s, _, _ in first_keys], dtype=np.float64)
+    second_durations = np.array([duration[ss] for _, ss, _, _ in second_keys], dtype=np.float64)
+    first_max_times = np.array([max_time[instance['services'][s]['care_unit']] for _, s, _, _ in first_keys], dtype=np.float64)
+    second_max_times = np.array([max_time[instance['services'][ss]['care_unit']] for _, ss, _, _ in second_keys], dtype=np.float64)
+
+    add_matrix_constraints(model, [
+        (first_time_columns, 1.0), (first_do_columns, first_durations),
+        (second_time_columns, -1.0), (overlap_columns, first_max_times)
+    ], -np.inf, first_max_times)
+    add_matrix_constraints(model, [
+        (second_time_columns, 1.0), (second_do_columns, second_durations),
+        (first_time_columns, -1.0), (overlap_columns, -second_max_times)
+    ], -np.inf, 0.0)
+
+    # Vincoli ausilari che regolano le variabili 'overlap'
+    add_matrix_constraints(model, [(overlap_columns, 1.0), (second_do_columns, -1.0)], -np.inf, 0.0)
+    add_matrix_constraints(model, [(second_do_columns, 1.0), (first_do_columns, -1.0), (overlap_columns, -1.0)], -np.inf, 0.0)
+
+    # FUNZIONE OBIETTIVO #######################################################
+
+    add_matrix_objective_terms(model, do_columns, [duration[s] * instance['patients'][p]['priority'] for p, s, _, _ in do_index])
+
+    return model
+
+
 def get_results_from_slim_subproblem_model(model):
     '''Funzione che ritorna i risultati (inseriti e rigettati) contenuti nel
     modello del sottoproblema risolto.'''
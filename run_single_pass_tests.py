@@ -19,8 +19,12 @@ from milp_models.master_model import get_slim_master_model, get_results_from_sli
 from milp_models.master_model import get_fat_master_model, get_results_from_fat_master_model
 from milp_models.subproblem_model import get_fat_subproblem_model, get_results_from_fat_subproblem_model
 from milp_models.subproblem_model import get_slim_subproblem_model, get_results_from_slim_subproblem_model
+from milp_models.monolithic_model import get_monolithic_matrix_model
+from milp_models.master_model import get_slim_master_matrix_model, get_fat_master_matrix_model
+from milp_models.subproblem_model import get_fat_subproblem_matrix_model, get_slim_subproblem_matrix_model
+from milp_models.matrix_backend import solve_matrix_model
 
-from milp_models.solve_instance import get_solver_info
+from milp_models.solve_instance import get_solver_info, get_matrix_solver_info
 
 
 # Questo programma può essere chiamato solo dalla linea di comando
@@ -222,8 +226,23 @@ for config_name, config_changes in configs['groups'].items():
             print(f'Model creation... ', end='')
             model_creation_start_time = time.perf_counter()
 
+            # Il backend matriciale costruisce direttamente la matrice dei
+            # vincoli e risolve il modello con HiGHS
+            use_matrix_backend = 'backend' in config and config['backend'] == 'matrix'
+
             # Creazione del modello
-            if config['model'] == 'monolithic':
+            if use_matrix_backend:
+                if config['model'] == 'monolithic':
+                    model = get_monolithic_matrix_model(instance, config['additional_info'])
+                elif config['model'] == 'slim-master':
+                    model = get_slim_master_matrix_model(instance, config['additional_info'])
+                elif config['model'] == 'fat-master':
+                    model = get_fat_master_matrix_model(instance, config['additional_info'])
+                elif config['model'] == 'fat-subproblem':
+                    model = get_fat_subproblem_matrix_model(instance, config['additional_info'])
+                elif config['model'] == 'slim-subproblem':
+                    model = get_slim_subproblem_matrix_model(instance, config['additional_info'])
+            elif config['model'] == 'monolithic':
                 model = get_monolithic_model(instance, config['additional_info'])
             elif config['model'] == 'slim-master':
                 model = get_slim_master_model(instance, config['additional_info'])
@@ -237,30 +256,46 @@ for config_name, config_changes in configs['groups'].items():
             model_creation_end_time = time.perf_counter()
             print(f'ended ({round(model_creation_end_time - model_creation_start_time, 4)}s). ', end='')
 
-            opt = pyo.SolverFactory(config['solver_config']['solver'])
+            log_file_path = logs_directory_path.joinpath(f'{instance_file_path.stem}_log.log')
 
-            if 'time_limit' in config['solver_config']:
-                if config['solver_config']['solver'] == 'glpk':
-                    opt.options['tmlim'] = config['solver_config']['time_limit']
-                elif config['solver_config']['solver'] == 'gurobi':
-                    opt.options['TimeLimit'] = config['solver_config']['time_limit']
-            if 'max_memory' in config['solver_config']:
-                opt.options['SoftMemLimit'] = config['solver_config']['max_memory']
+            if use_matrix_backend:
 
-            log_file_path = logs_directory_path.joinpath(f'{instance_file_path.stem}_log.log')
-            
-            print(f'Solving... ', end='')
-            solving_start_time = time.perf_counter()
-            
-            # Risoluzione dell'istanza
-            model_results = opt.solve(model, tee=False, logfile=log_file_path)
-            
-            solving_end_time = time.perf_counter()
-            print(f'ended ({round(solving_end_time - solving_start_time, 4)}s).')
+                print(f'Solving... ', end='')
+                solving_start_time = time.perf_counter()
+
+                # Risoluzione dell'istanza
+                model, solving_outcome = solve_matrix_model(model, config['solver_config'], log_file_path)
+
+                solving_end_time = time.perf_counter()
+                print(f'ended ({round(solving_end_time - solving_start_time, 4)}s).')
+
+                # Ottenimento dei dati del solver
+                solver_info = get_matrix_solver_info(solving_outcome, config['model'], log_file_path)
+
+            else:
 
-            # Ottenimento dei dati del solver
-            model.solutions.store_to(model_results)
-            solver_info = get_solver_info(model_results, config['model'], log_file_path)
+                opt = pyo.SolverFactory(config['solver_config']['solver'])
+
+                if 'time_limit' in config['solver_config']:
+                    if config['solver_config']['solver'] == 'glpk':
+                        opt.options['tmlim'] = config['solver_config']['time_limit']
+                    elif config['solver_config']['solver'] == 'gurobi':
+                        opt.options['TimeLimit'] = config['solver_config']['time_limit']
+                if 'max_memory' in config['solver_config']:
+                    opt.options['SoftMemLimit'] = config['solver_config']['max_memory']
+                
+                print(f'Solving... ', end='')
+                solving_start_time = time.perf_counter()
+                
+                # Risoluzione dell'istanza
+                model_results = opt.solve(model, tee=False, logfile=log_file_path)
+                
+                solving_end_time = time.perf_counter()
+                print(f'ended ({round(solving_end_time - solving_start_time, 4)}s).')
+
+                # Ottenimento dei dati del solver
+                model.solutions.store_to(model_results)
+                solver_info = get_solver_info(model_results, config['model'], log_file_path)
 
             # Salvataggio dei dati del solver su file
             info_file_path = logs_directory_path.joinpath(f'{instance_file_path.stem}_info.json')
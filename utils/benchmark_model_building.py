@@ -0,0 +1,89 @@
+from pathlib import Path
+import argparse
+import filecmp
+import json
+import time
+
+from milp_models.master_model import get_slim_master_model, get_fat_master_model
+from milp_models.monolithic_model import get_monolithic_model
+
+
+# Script che misura il tempo di creazione dei modelli Pyomo sulle istanze
+# generate e scrive i file LP corrispondenti (con i nomi simbolici delle
+# variabili). Se viene fornita una cartella di riferimento, scritta dallo
+# script con una versione precedente del codice, ogni file LP viene confrontato
+# byte per byte con quello di riferimento: una modifica alla costruzione dei
+# vincoli che non deve cambiare il modello produce file identici. Il rapporto
+# fra tempo di creazione e numero di tuple di 'do_index' permette di
+# verificare che la costruzione scali linearmente.
+
+# Funzioni di costruzione dei modelli Pyomo confrontabili
+MODEL_BUILDERS = {
+    'slim-master': get_slim_master_model,
+    'fat-master': get_fat_master_model,
+    'monolithic': get_monolithic_model
+}
+
+parser = argparse.ArgumentParser(prog='Benchmark model building', description='Measure model creation times and compare the LP files with a reference.')
+parser.add_argument('-i', '--input', type=Path, help='Directory with instances (searched recursively).', required=True)
+parser.add_argument('-o', '--output', type=Path, help='Directory where writing the LP files.', required=True)
+parser.add_argument('-m', '--model', choices=sorted(MODEL_BUILDERS.keys()), default='slim-master', help='Model to build.')
+parser.add_argument('-a', '--additional-info', nargs='*', default=['minimize_hospital_accesses'], help='Additional info passed to the model.')
+parser.add_argument('-r', '--reference', type=Path, help='Directory with the LP files to compare with.')
+args = parser.parse_args()
+
+input_directory_path = Path(args.input).resolve()
+output_directory_path = Path(args.output).resolve()
+reference_directory_path = Path(args.reference).resolve() if args.reference is not None else None
+
+# Controlli sulla validità degli argomenti da linea di comando
+if not input_directory_path.is_dir():
+    raise FileNotFoundError(f'Path \'{input_directory_path}\' is not a directory.')
+if reference_directory_path is not None and not reference_directory_path.is_dir():
+    raise FileNotFoundError(f'Path \'{reference_directory_path}\' is not a directory.')
+
+output_directory_path.mkdir(parents=True, exist_ok=True)
+
+different_file_number = 0
+instance_number = 0
+
+for instance_file_path in sorted(input_directory_path.rglob('*.json')):
+
+    with open(instance_file_path, 'r') as file:
+        instance = json.load(file)
+
+    # Sono considerate solo le istanze del master
+    if 'days' not in instance:
+        continue
+
+    model_creation_start_time = time.perf_counter()
+    model = MODEL_BUILDERS[args.model](instance, args.additional_info)
+    model_creation_end_time = time.perf_counter()
+
+    model_creation_time = model_creation_end_time - model_creation_start_time
+    tuple_number = len(model.do_index)
+
+    # Il nome del file LP contiene il percorso relativo dell'istanza
+    relative_name = '_'.join(instance_file_path.relative_to(input_directory_path).with_suffix('').parts)
+    lp_file_path = output_directory_path.joinpath(f'{relative_name}_{args.model}.lp')
+    model.write(str(lp_file_path), io_options={'symbolic_solver_labels': True})
+
+    comparison = ''
+    if reference_directory_path is not None:
+        reference_file_path = reference_directory_path.joinpath(lp_file_path.name)
+        if not reference_file_path.exists():
+            comparison = ' (no reference)'
+        elif filecmp.cmp(lp_file_path, reference_file_path, shallow=False):
+            comparison = ' (same LP)'
+        else:
+            comparison = ' (DIFFERENT LP)'
+            different_file_number += 1
+
+    instance_number += 1
+    print(f'{relative_name}: {tuple_number} do tuples, created in {round(model_creation_time, 4)}s ({round(model_creation_time / max(tuple_number, 1) * 1000, 4)}ms per tuple){comparison}.')
+
+print(f'Built {instance_number} \'{args.model}\' models.')
+
+if different_file_number > 0:
+    print(f'{different_file_number} LP files differ from the reference.')
+    exit(1)
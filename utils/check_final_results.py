@@ -0,0 +1,222 @@
+import argparse
+import random
+import copy
+import time
+
+from milp_models.solve_instance import compose_final_results
+from milp_models.sol_perm_model import get_fixed_final_results
+from checkers.tools import check_integrity_protocols_represented
+
+
+# Script che confronta 'compose_final_results' e 'get_fixed_final_results'
+# con le loro versioni di riferimento (con confronti a coppie e scansioni
+# complete dei giorni) su istanze casuali con rigetti duplicati del master,
+# finestre sovrapposte e richieste schedulate più volte, e verifica che ogni
+# finestra dei risultati corretti sia soddisfatta o rigettata una sola volta.
+# Al termine misura i tempi di entrambe le versioni su un'istanza grande.
+
+def compose_reference_final_results(master_instance, master_results, all_subproblem_results):
+    '''Versione di riferimento di 'compose_final_results'.'''
+
+    all_scheduled_results = {}
+    for day_name, subproblem_results in all_subproblem_results.items():
+        all_scheduled_results[day_name] = subproblem_results['scheduled']
+
+    final_results = {
+        'scheduled': all_scheduled_results,
+        'rejected': master_results['rejected']
+    }
+
+    for day_name, subproblem_results in all_subproblem_results.items():
+        day_index = int(day_name)
+        for rejected_request in subproblem_results['rejected']:
+
+            patient_name = rejected_request['patient']
+            service_name = rejected_request['service']
+
+            for window in master_instance['patients'][patient_name]['requests'][service_name]:
+                if window[0] <= day_index and window[1] >= day_index:
+                    final_results['rejected'].append({
+                        'patient': patient_name,
+                        'service': service_name,
+                        'window': [window[0], window[1]]
+                    })
+
+    unique_rejected = []
+    for rejected_1 in final_results['rejected']:
+        already_present = False
+        for rejected_2 in unique_rejected:
+            if rejected_1['patient'] == rejected_2['patient'] and rejected_1['service'] == rejected_2['service'] and rejected_1['window'][0] == rejected_2['window'][0] and rejected_1['window'][1] == rejected_2['window'][1]:
+                already_present = True
+                break
+        if not already_present:
+            unique_rejected.append(rejected_1)
+    final_results['rejected'] = sorted(unique_rejected, key=lambda r: (r['patient'], r['service'], r['window'][0], r['window'][1]))
+
+    return final_results
+
+
+def get_reference_fixed_final_results(master_instance, all_subproblem_results):
+    '''Versione di riferimento di 'get_fixed_final_results'.'''
+
+    satisfied_requests = set()
+    rejected_requests = set()
+
+    for patient_name, patient in master_instance['patients'].items():
+        for service_name, windows in patient['requests'].items():
+
+            remaining_windows = list(windows)
+
+            # Prima occorrenza della richiesta in ogni giorno, in ordine: il
+            # giorno soddisfa tutte le finestre rimaste che lo contengono
+            for day_index in sorted(int(day_name) for day_name in all_subproblem_results.keys()):
+                for scheduled_request in all_subproblem_results[str(day_index)]['scheduled']:
+                    if scheduled_request['patient'] == patient_name and scheduled_request['service'] == service_name:
+                        if any(window[0] <= day_index and window[1] >= day_index for window in remaining_windows):
+                            satisfied_requests.add((patient_name, service_name, day_index, scheduled_request['care_unit'], scheduled_request['operator'], scheduled_request['time']))
+                            remaining_windows = [window for window in remaining_windows if not (window[0] <= day_index and window[1] >= day_index)]
+                        break
+
+            for window in remaining_windows:
+                rejected_requests.add((patient_name, service_name, window[0], window[1]))
+
+    final_results = {
+        'scheduled': {},
+        'rejected': []
+    }
+
+    for request in satisfied_requests:
+        final_results['scheduled'].setdefault(str(request[2]), []).append({
+            'patient': request[0],
+            'service': request[1],
+            'care_unit': request[3],
+            'operator': request[4],
+            'time': request[5]
+        })
+    final_results['scheduled'] = dict(sorted(final_results['scheduled'].items()))
+    for scheduled_requests in final_results['scheduled'].values():
+        scheduled_requests.sort(key=lambda t: (t['patient'], t['service'], t['care_unit'], t['operator'], t['time']))
+
+    for request in rejected_requests:
+        final_results['rejected'].append({
+            'patient': request[0],
+            'service': request[1],
+            'window': [request[2], request[3]]
+        })
+    final_results['rejected'].sort(key=lambda t: (t['patient'], t['service'], t['window'][0], t['window'][1]))
+
+    return final_results
+
+
+def get_random_case(patient_number: int, service_number: int, day_number: int):
+    '''Funzione che genera un'istanza del master casuale insieme a dei
+    risultati del master e dei sottoproblemi compatibili con essa.'''
+
+    patients = {}
+    for patient_index in range(patient_number):
+        requests = {}
+        for service_index in random.sample(range(service_number), random.randint(1, service_number)):
+            windows = []
+            start = random.randint(0, day_number - 1)
+            for _ in range(random.randint(1, 3)):
+                if start >= day_number:
+                    break
+                end = min(day_number - 1, start + random.randint(0, 3))
+                windows.append([start, end])
+                # Finestre sovrapposte quando il passo è nullo
+                start = end + random.randint(0, 2)
+            if len(windows) > 0:
+                requests[f'srv{service_index:02}'] = windows
+        patients[f'pat{patient_index:03}'] = {'priority': 1, 'requests': requests}
+
+    master_instance = {
+        'days': {str(day_index): {} for day_index in range(day_number)},
+        'patients': patients
+    }
+
+    master_results = {'scheduled': {}, 'rejected': []}
+    all_subproblem_results = {str(day_index): {'scheduled': [], 'rejected': []} for day_index in range(day_number)}
+
+    for patient_name, patient in patients.items():
+        for service_name, windows in patient['requests'].items():
+            for window in windows:
+                for day_index in range(window[0], window[1] + 1):
+                    value = random.random()
+                    if value < 0.2:
+                        all_subproblem_results[str(day_index)]['scheduled'].append({
+                            'patient': patient_name,
+                            'service': service_name,
+                            'care_unit': 'cu00',
+                            'operator': f'op{random.randint(0, 2):02}',
+                            'time': random.randint(0, 50)
+                        })
+                    elif value < 0.3:
+                        all_subproblem_results[str(day_index)]['rejected'].append({
+                            'patient': patient_name,
+                            'service': service_name
+                        })
+                # Rigetti del master, a volte duplicati
+                if random.random() < 0.2:
+                    master_results['rejected'].append({'patient': patient_name, 'service': service_name, 'window': list(window)})
+                if random.random() < 0.1:
+                    master_results['rejected'].append({'patient': patient_name, 'service': service_name, 'window': list(window)})
+
+    return master_instance, master_results, all_subproblem_results
+
+
+parser = argparse.ArgumentParser(prog='Check final results', description='Compare the final results functions with their reference versions on random cases.')
+parser.add_argument('-n', '--cases', type=int, default=500, help='Number of random cases.')
+parser.add_argument('-s', '--seed', type=int, default=7, help='Random seed.')
+parser.add_argument('--timing-patients', type=int, default=600, help='Number of patients of the timing case.')
+parser.add_argument('--timing-days', type=int, default=365, help='Number of days of the timing case.')
+args = parser.parse_args()
+
+random.seed(args.seed)
+
+different_case_number = 0
+
+for case_index in range(args.cases):
+
+    master_instance, master_results, all_subproblem_results = get_random_case(random.randint(1, 8), random.randint(1, 4), random.randint(1, 10))
+
+    # Le funzioni possono modificare i risultati ricevuti
+    reference_results = compose_reference_final_results(master_instance, copy.deepcopy(master_results), copy.deepcopy(all_subproblem_results))
+    results = compose_final_results(master_instance, copy.deepcopy(master_results), copy.deepcopy(all_subproblem_results))
+    if results != reference_results:
+        different_case_number += 1
+        print(f'Case {case_index}: compose_final_results differs from the reference.')
+
+    reference_results = get_reference_fixed_final_results(master_instance, all_subproblem_results)
+    results = get_fixed_final_results(master_instance, all_subproblem_results)
+    if results != reference_results:
+        different_case_number += 1
+        print(f'Case {case_index}: get_fixed_final_results differs from the reference.')
+
+    # Ogni finestra deve essere soddisfatta da un solo giorno o rigettata
+    try:
+        check_integrity_protocols_represented(results, master_instance)
+    except ValueError as exception:
+        different_case_number += 1
+        print(f'Case {case_index}: get_fixed_final_results does not pass the final results check ({exception}).')
+
+print(f'Compared {args.cases} random cases.')
+
+master_instance, master_results, all_subproblem_results = get_random_case(args.timing_patients, 10, args.timing_days)
+
+for function_name, function, reference_function in [
+    ('compose_final_results', lambda: compose_final_results(master_instance, copy.deepcopy(master_results), all_subproblem_results), lambda: compose_reference_final_results(master_instance, copy.deepcopy(master_results), all_subproblem_results)),
+    ('get_fixed_final_results', lambda: get_fixed_final_results(master_instance, all_subproblem_results), lambda: get_reference_fixed_final_results(master_instance, all_subproblem_results))
+]:
+    start_time = time.perf_counter()
+    function()
+    function_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    reference_function()
+    reference_time = time.perf_counter() - start_time
+
+    print(f'{function_name} ({args.timing_patients} patients, {args.timing_days} days): {round(function_time, 4)}s, reference {round(reference_time, 4)}s.')
+
+if different_case_number > 0:
+    print(f'{different_case_number} comparisons differ from the reference.')
+    exit(1)
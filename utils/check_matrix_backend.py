@@ -0,0 +1,130 @@
+from pathlib import Path
+import argparse
+import tempfile
+import json
+import math
+import pyomo.environ as pyo
+
+from milp_models.master_model import get_slim_master_model, get_slim_master_matrix_model
+from milp_models.master_model import get_fat_master_model, get_fat_master_matrix_model
+from milp_models.monolithic_model import get_monolithic_model, get_monolithic_matrix_model
+from milp_models.subproblem_model import get_fat_subproblem_model, get_fat_subproblem_matrix_model
+from milp_models.subproblem_model import get_slim_subproblem_model, get_slim_subproblem_matrix_model
+from milp_models.matrix_backend import solve_matrix_model
+from milp_models.persistent_solver import get_persistent_solver, solve_with_persistent_solver
+
+
+# Script che costruisce ogni modello sia con Pyomo che con il backend
+# matriciale sulle istanze generate e confronta il numero di righe e di
+# colonne ed il valore ottimo. Entrambi i modelli sono risolti con HiGHS e si
+# verifica che gli intervalli fra la migliore soluzione ed il limite superiore
+# dei due modelli si sovrappongano, anche quando il limite di tempo viene
+# raggiunto.
+
+# Coppie (modello Pyomo, modello matriciale) per ogni tipo di istanza
+MASTER_MODEL_BUILDERS = {
+    'slim-master': (get_slim_master_model, get_slim_master_matrix_model),
+    'fat-master': (get_fat_master_model, get_fat_master_matrix_model),
+    'monolithic': (get_monolithic_model, get_monolithic_matrix_model)
+}
+SUBPROBLEM_MODEL_BUILDERS = {
+    'fat-subproblem': (get_fat_subproblem_model, get_fat_subproblem_matrix_model),
+    'slim-subproblem': (get_slim_subproblem_model, get_slim_subproblem_matrix_model)
+}
+
+parser = argparse.ArgumentParser(prog='Check matrix backend', description='Compare the Pyomo and matrix versions of the models.')
+parser.add_argument('-i', '--input', type=Path, help='Directory with master or subproblem instances (searched recursively).', required=True)
+parser.add_argument('-m', '--models', nargs='*', choices=sorted(list(MASTER_MODEL_BUILDERS.keys()) + list(SUBPROBLEM_MODEL_BUILDERS.keys())), help='Models to compare (all by default).')
+parser.add_argument('--master-info', nargs='*', default=['minimize_hospital_accesses'], help='Additional info passed to the master and monolithic models.')
+parser.add_argument('--subproblem-info', nargs='*', default=['use_redundant_operator_cut'], help='Additional info passed to the subproblem models.')
+parser.add_argument('-t', '--time-limit', type=float, default=60.0, help='Time limit of every solve, in seconds.')
+args = parser.parse_args()
+
+input_directory_path = Path(args.input).resolve()
+if not input_directory_path.is_dir():
+    raise FileNotFoundError(f'Path \'{input_directory_path}\' is not a directory.')
+
+solver_config = {
+    'solver': 'appsi_highs',
+    'time_limit': args.time_limit
+}
+
+different_model_number = 0
+model_number = 0
+
+with tempfile.TemporaryDirectory() as log_directory_name:
+
+    log_file_path = Path(log_directory_name).joinpath('solver_log.log')
+
+    for instance_file_path in sorted(input_directory_path.rglob('*.json')):
+
+        with open(instance_file_path, 'r') as file:
+            instance = json.load(file)
+
+        # Il tipo di modello dipende dall'istanza: nelle istanze del
+        # sottoproblema con l'operatore già scelto le richieste sono oggetti
+        if 'days' in instance:
+            model_builders = MASTER_MODEL_BUILDERS
+            additional_info = args.master_info
+        elif 'patients' in instance and 'day' in instance:
+            is_slim = any(type(request) is dict for patient in instance['patients'].values() for request in patient['requests'])
+            model_name = 'slim-subproblem' if is_slim else 'fat-subproblem'
+            model_builders = {model_name: SUBPROBLEM_MODEL_BUILDERS[model_name]}
+            additional_info = args.subproblem_info
+        else:
+            continue
+
+        relative_name = '/'.join(instance_file_path.relative_to(input_directory_path).parts)
+
+        for model_name, (get_pyomo_model, get_matrix_model) in model_builders.items():
+
+            if args.models is not None and model_name not in args.models:
+                continue
+
+            pyomo_model = get_pyomo_model(instance, additional_info)
+            matrix_model = get_matrix_model(instance, additional_info)
+
+            pyomo_row_number = sum(1 for _ in pyomo_model.component_data_objects(pyo.Constraint, active=True))
+            pyomo_column_number = sum(1 for _ in pyomo_model.component_data_objects(pyo.Var))
+            matrix_row_number = matrix_model['row_number']
+            matrix_column_number = matrix_model['column_number']
+
+            opt = get_persistent_solver(solver_config)
+            pyomo_results, _, _ = solve_with_persistent_solver(opt, pyomo_model, log_file_path, False)
+            _, matrix_outcome = solve_matrix_model(matrix_model, solver_config, log_file_path)
+
+            errors = []
+            if pyomo_row_number != matrix_row_number:
+                errors.append(f'rows {pyomo_row_number} != {matrix_row_number}')
+            if pyomo_column_number != matrix_column_number:
+                errors.append(f'columns {pyomo_column_number} != {matrix_column_number}')
+
+            # Entrambi i risolutori chiudono con il gap relativo predefinito di
+            # HiGHS, quindi anche due ottimi corretti possono differire: si
+            # verifica sempre che gli intervalli fra la migliore soluzione ed
+            # il limite superiore dei due modelli si sovrappongano
+            pyomo_lower_bound = pyomo_results.best_feasible_objective if pyomo_results.best_feasible_objective is not None else float('-inf')
+            pyomo_upper_bound = pyomo_results.best_objective_bound if pyomo_results.best_objective_bound is not None else float('inf')
+            matrix_lower_bound = matrix_outcome['objective_value']
+            matrix_upper_bound = matrix_outcome['objective_bound']
+            tolerance = 1e-6 * max(1.0, abs(matrix_lower_bound)) if math.isfinite(matrix_lower_bound) else 1e-6
+            if pyomo_lower_bound > matrix_upper_bound + tolerance or matrix_lower_bound > pyomo_upper_bound + tolerance:
+                errors.append(f'bounds [{pyomo_lower_bound}, {pyomo_upper_bound}] and [{matrix_lower_bound}, {matrix_upper_bound}] do not overlap')
+
+            if pyomo_results.termination_condition.name == 'optimal' and matrix_outcome['termination_condition'] == 'optimal':
+                value_string = f'optimum {round(matrix_lower_bound, 4)}'
+            else:
+                value_string = 'optimum not reached, bounds overlap'
+
+            model_number += 1
+            if len(errors) > 0:
+                different_model_number += 1
+                print(f'{relative_name} [{model_name}]: DIFFERENT, {", ".join(errors)}.')
+            else:
+                print(f'{relative_name} [{model_name}]: same, {matrix_row_number} rows, {matrix_column_number} columns, {value_string}.')
+
+print(f'Compared {model_number} models.')
+
+if different_model_number > 0:
+    print(f'{different_model_number} models differ between the backends.')
+    exit(1)